@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Storage savings and CPU cost of STORAGE_COMPRESSION=zstd.
+
+Chunk text is compressed one chunk at a time, without a dictionary and with dictionaries
+of each size trained on chunks of other fixture documents, since a dictionary is trained
+on stored chunks and then compresses new ones. Original files are compressed whole,
+without a dictionary. Run from the backend directory:
+
+    python -m benchmarks.compression                          # in memory
+    python -m benchmarks.compression --levels 1,3,9 --db      # also the bytes Postgres stores
+
+Throughput is MB of uncompressed data per second on one core. --db stores the chunks in
+temporary tables next to an embedding, as document_chunks does, so the plain-text row
+includes whatever TOAST compression Postgres applies by itself.
+"""
+import argparse
+import time
+from typing import Callable, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from benchmarks.fakes import fake_embedding
+from benchmarks.fixtures import SIZES, corpus, pii_text, prose
+from config import config
+from constants import DB_CONSTANTS, FILE_CONSTANTS
+from services.chunk import chunk_text
+from services.compression import NO_DICTIONARY, StorageCodec
+
+load_dotenv()
+
+
+def fixture_chunks(count: int, first_seed: int) -> List[bytes]:
+    """`count` chunks, alternately of prose and PII-dense fixtures seeded from first_seed on"""
+    chunks: List[bytes] = []
+    seed = first_seed
+    while len(chunks) < count:
+        text = prose(200_000, seed) if seed % 2 == 0 else pii_text(200_000, seed)
+        chunks.extend(chunk.encode("utf-8") for chunk in chunk_text(text, FILE_CONSTANTS["DEFAULT_CHUNK_SIZE"]))
+        seed += 1
+    return chunks[:count]
+
+
+def best_time(fn: Callable[[], object], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def make_codec(level: int) -> StorageCodec:
+    # Dictionaries are registered with use_dictionary, never loaded from a database
+    return StorageCodec(enabled=True, level=level, min_saving=DB_CONSTANTS["COMPRESSION_MIN_SAVING"],
+                        refresh_seconds=float("inf"), load_dictionary=lambda dict_id: None,
+                        load_newest_dictionary=lambda: None)
+
+
+def chunk_case(codec: StorageCodec, chunks: List[bytes], dict_id: int, repeat: int) -> Dict[str, float]:
+    compressed = [codec.compress(chunk, dict_id) for chunk in chunks]
+    raw = sum(len(chunk) for chunk in chunks)
+    stored = sum(len(frame) for frame in compressed)
+    compress_seconds = best_time(lambda: [codec.compress(chunk, dict_id) for chunk in chunks], repeat)
+    decompress_seconds = best_time(lambda: [codec.decompress(frame) for frame in compressed], repeat)
+    assert [codec.decompress(frame) for frame in compressed] == chunks
+    return {
+        "ratio": raw / stored,
+        "bytes_per_chunk": stored / len(chunks),
+        "compress_mb_s": raw / compress_seconds / 1e6,
+        "decompress_mb_s": raw / decompress_seconds / 1e6,
+        "compressed": compressed,
+    }
+
+
+def db_sizes(conn, chunks: List[bytes], compressed: List[bytes]) -> Dict[str, float]:
+    """Stored bytes per chunk and table size, for the plain and the compressed text"""
+    from psycopg2.extras import execute_values
+    
+    embeddings = ["[" + ",".join(f"{value:.6g}" for value in fake_embedding(str(i))) + "]" for i in range(len(chunks))]
+    cur = conn.cursor()
+    try:
+        cur.execute(f"CREATE TEMP TABLE plain_bench (content TEXT, embedding vector({config.EMBEDDING_DIMENSIONS}))")
+        cur.execute(f"CREATE TEMP TABLE zstd_bench (content_zstd BYTEA, embedding vector({config.EMBEDDING_DIMENSIONS}))")
+        execute_values(cur, "INSERT INTO plain_bench VALUES %s",
+                       [(chunk.decode("utf-8"), embedding) for chunk, embedding in zip(chunks, embeddings)])
+        execute_values(cur, "INSERT INTO zstd_bench VALUES %s",
+                       [(frame, embedding) for frame, embedding in zip(compressed, embeddings)])
+        cur.execute("""
+            SELECT (SELECT AVG(pg_column_size(content)) FROM plain_bench),
+                   (SELECT AVG(pg_column_size(content_zstd)) FROM zstd_bench),
+                   pg_total_relation_size('plain_bench'), pg_total_relation_size('zstd_bench')
+        """)
+        plain_column, zstd_column, plain_table, zstd_table = cur.fetchone()
+        return {
+            "plain_column": float(plain_column),
+            "zstd_column": float(zstd_column),
+            "plain_table_mb": plain_table / 1024 / 1024,
+            "zstd_table_mb": zstd_table / 1024 / 1024,
+        }
+    finally:
+        conn.rollback()
+        cur.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Storage savings and CPU cost of zstd storage compression")
+    parser.add_argument("--chunks", type=int, default=2000, help="Chunks compressed")
+    parser.add_argument("--training", type=int, default=DB_CONSTANTS["COMPRESSION_TRAINING_SAMPLES"] // 4,
+                        help="Chunks (of other documents) a dictionary is trained on")
+    parser.add_argument("--levels", default=str(config.COMPRESSION_LEVEL), help="Comma-separated zstd levels")
+    parser.add_argument("--dict-sizes", default=f"16384,{config.COMPRESSION_DICTIONARY_SIZE}",
+                        help="Comma-separated dictionary sizes in bytes")
+    parser.add_argument("--file-size", default="medium", help=f"Size of the file fixtures, from {list(SIZES)}")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per case (the best is kept)")
+    parser.add_argument("--db", action="store_true", help="Also measure the bytes Postgres stores (uses DATABASE_URL)")
+    args = parser.parse_args()
+    
+    levels = [int(level) for level in args.levels.split(",") if level.strip()]
+    dict_sizes = [int(size) for size in args.dict_sizes.split(",") if size.strip()]
+    chunks = fixture_chunks(args.chunks, first_seed=0)
+    training = fixture_chunks(args.training, first_seed=1000)
+    raw_per_chunk = sum(len(chunk) for chunk in chunks) / len(chunks)
+    
+    conn = None
+    if args.db:
+        from services.db import DatabaseService
+        conn = DatabaseService().get_connection()
+    
+    print(f"📄 {len(chunks)} chunks, {raw_per_chunk:.0f} bytes each on average; "
+          f"dictionaries trained on {len(training)} others")
+    codecs = []
+    for level in levels:
+        codec = make_codec(level)
+        dictionaries = [(NO_DICTIONARY, "no dictionary")]
+        for size in dict_sizes:
+            started = time.perf_counter()
+            dict_id, data = codec.train_dictionary(training, size)
+            codec.use_dictionary(dict_id, data)
+            print(f"🧠 Trained a {size // 1024} KiB dictionary at level {level} in {time.perf_counter() - started:.1f}s")
+            dictionaries.append((dict_id, f"{size // 1024} KiB dictionary"))
+        codecs.append((level, codec, dictionaries))
+    
+    header = f"\n{'chunks':<28} {'ratio':>6} {'bytes/chunk':>11} {'compress':>13} {'decompress':>13}"
+    if conn:
+        header += f" {'stored/chunk':>12} {'table MB':>9}"
+    print(header)
+    plain_sizes: Optional[Dict[str, float]] = None
+    for level, codec, dictionaries in codecs:
+        for dict_id, label in dictionaries:
+            result = chunk_case(codec, chunks, dict_id, args.repeat)
+            line = (f"{'zstd -' + str(level) + ', ' + label:<28} {result['ratio']:>5.2f}x {result['bytes_per_chunk']:>11.0f} "
+                    f"{result['compress_mb_s']:>8.0f} MB/s {result['decompress_mb_s']:>8.0f} MB/s")
+            if conn:
+                sizes = db_sizes(conn, chunks, result["compressed"])
+                plain_sizes = plain_sizes or sizes
+                line += f" {sizes['zstd_column']:>12.0f} {sizes['zstd_table_mb']:>9.1f}"
+            print(line)
+    if plain_sizes:
+        print(f"{'plain text (TOAST only)':<28} {'':>6} {raw_per_chunk:>11.0f} {'':>13} {'':>13} "
+              f"{plain_sizes['plain_column']:>12.0f} {plain_sizes['plain_table_mb']:>9.1f}")
+    
+    print(f"\n{'files (' + args.file_size + ')':<28} {'ratio':>6} {'stored as':>11} {'compress':>13} {'decompress':>13}")
+    for level in levels:
+        codec = make_codec(level)
+        for name, (content, _) in corpus(args.file_size).items():
+            compressed = codec.compress(content)
+            kept = codec.file_columns(content)[1] is not None
+            compress_seconds = best_time(lambda: codec.compress(content), args.repeat)
+            decompress_seconds = best_time(lambda: codec.decompress(compressed), args.repeat)
+            print(f"{name + ' (zstd -' + str(level) + ')':<28} {len(content) / len(compressed):>5.2f}x "
+                  f"{'zstd' if kept else 'plain':>11} {len(content) / compress_seconds / 1e6:>8.0f} MB/s "
+                  f"{len(content) / decompress_seconds / 1e6:>8.0f} MB/s")
+    
+    if conn:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+# benchmarks/fakes.py
+"""Deterministic stand-ins for the OpenAI embedding and chat APIs"""
+import hashlib
+import random
+from typing import List
+
+from config import config
+
+
+def fake_embedding(text: str, dimension: int = config.EMBEDDING_DIMENSIONS) -> List[float]:
+    """A unit-length pseudo-random vector seeded by the text, so equal texts embed equally"""
+    rnd = random.Random(hashlib.sha256(text.encode()).digest())
+    vector = [rnd.gauss(0, 1) for _ in range(dimension)]
+    norm = sum(v * v for v in vector) ** 0.5
+    return [v / norm for v in vector]
+
+
+def fake_embeddings(texts: List[str]) -> List[List[float]]:
+    return [fake_embedding(text) for text in texts]
+
+
+def fake_rag_answer(prompt: str) -> str:
+    """Echo a fixed-length answer derived from the prompt"""
+    digest = hashlib.sha256(prompt.encode()).hexdigest()
+    return f"Based on the context, the answer is {digest[:16]}."
@@ -0,0 +1,149 @@
+# benchmarks/fixtures.py
+"""
+Deterministic fixture corpora for the benchmarks. Every generator takes a target
+size in bytes and a seed, so the same arguments always produce the same bytes.
+"""
+import io
+import json
+import random
+import zipfile
+from typing import Dict, Tuple
+from xml.sax.saxutils import escape
+
+WORDS = (
+    "the quarterly report shows revenue growth across all regions while operating costs "
+    "remained stable our team delivered the migration ahead of schedule and customer "
+    "satisfaction improved significantly after the new onboarding process was introduced "
+    "according to the contract both parties agree to the terms described in this section"
+).split()
+
+FIRST_NAMES = ["John", "Maria", "Chen", "Aisha", "Lukas", "Sofia", "Omar", "Emma", "Ravi", "Giulia"]
+LAST_NAMES = ["Smith", "Rossi", "Wang", "Khan", "Müller", "Garcia", "Haddad", "Johnson", "Patel", "Bianchi"]
+CITIES = ["London", "Florence", "New York", "Berlin", "Tokyo", "Madrid", "Cairo", "Toronto"]
+ORGS = ["Acme Corp", "Globex", "Initech", "Umbrella Ltd", "Stark Industries", "Wayne Enterprises"]
+
+SIZES = {
+    "small": 10_000,
+    "medium": 100_000,
+    "large": 1_000_000,
+}
+
+
+def prose(size: int, seed: int = 0) -> str:
+    """Plain sentences of filler text"""
+    rnd = random.Random(seed)
+    parts = []
+    length = 0
+    while length < size:
+        sentence = " ".join(rnd.choice(WORDS) for _ in range(rnd.randint(8, 20))).capitalize() + "."
+        parts.append(sentence)
+        length += len(sentence) + 1
+    return " ".join(parts)[:size]
+
+
+def pii_text(size: int, seed: int = 0) -> str:
+    """Text where almost every sentence carries names, places, emails, phones or dates"""
+    rnd = random.Random(seed)
+    parts = []
+    length = 0
+    while length < size:
+        first, last = rnd.choice(FIRST_NAMES), rnd.choice(LAST_NAMES)
+        sentence = rnd.choice([
+            f"{first} {last} from {rnd.choice(ORGS)} met us in {rnd.choice(CITIES)} on {rnd.randint(1, 28)}/{rnd.randint(1, 12)}/2024.",
+            f"Contact {first} at {first.lower()}.{last.lower()}@example.com or 555-{rnd.randint(100, 999)}-{rnd.randint(1000, 9999)}.",
+            f"{first} {last} earned ${rnd.randint(40, 200)},000 which is {rnd.randint(1, 99)}% above the {rnd.choice(CITIES)} average.",
+            f"The SSN on file for {first} is {rnd.randint(100, 999)}-{rnd.randint(10, 99)}-{rnd.randint(1000, 9999)}.",
+        ])
+        parts.append(sentence)
+        length += len(sentence) + 1
+    return " ".join(parts)[:size]
+
+
+def csv_bytes(size: int, seed: int = 0) -> bytes:
+    rnd = random.Random(seed)
+    lines = ["id,name,city,company,amount"]
+    length = len(lines[0])
+    while length < size:
+        line = (f"{len(lines)},{rnd.choice(FIRST_NAMES)} {rnd.choice(LAST_NAMES)},"
+                f"{rnd.choice(CITIES)},{rnd.choice(ORGS)},{rnd.randint(100, 99999)}")
+        lines.append(line)
+        length += len(line) + 1
+    return "\n".join(lines).encode()
+
+
+def json_bytes(size: int, seed: int = 0) -> bytes:
+    rnd = random.Random(seed)
+    data = {}
+    length = 2
+    while length < size:
+        key = f"section_{len(data)}"
+        value = prose(rnd.randint(100, 400), seed=seed + len(data))
+        data[key] = value
+        length += len(key) + len(value) + 6
+    return json.dumps(data).encode()
+
+
+def pdf_bytes(size: int, seed: int = 0) -> bytes:
+    """A minimal multi-page PDF with Helvetica text, holding roughly `size` bytes of text"""
+    text = prose(size, seed)
+    line_width, lines_per_page = 90, 50
+    lines = [text[i:i + line_width] for i in range(0, len(text), line_width)]
+    pages = [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)] or [[]]
+    
+    objects = []
+    page_ids = [4 + 2 * i for i in range(len(pages))]
+    objects.append(b"<< /Type /Catalog /Pages 2 0 R >>")
+    objects.append(f"<< /Type /Pages /Kids [{' '.join(f'{pid} 0 R' for pid in page_ids)}] /Count {len(pages)} >>".encode())
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    for page_id, page_lines in zip(page_ids, pages):
+        escaped = [line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") for line in page_lines]
+        stream = "BT /F1 9 Tf 12 TL 36 800 Td " + " ".join(f"({line}) '" for line in escaped) + " ET"
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {page_id + 1} 0 R >>".encode())
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream".encode())
+    
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for offset in offsets:
+        out += f"{offset:010d} 00000 n \n".encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(out)
+
+
+def docx_bytes(size: int, seed: int = 0) -> bytes:
+    """A minimal .docx with a heading every ten paragraphs, holding roughly `size` bytes of text"""
+    namespace = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+    sentences = prose(size, seed).split(". ")
+    paragraphs = [". ".join(sentences[i:i + 4]) for i in range(0, len(sentences), 4)]
+    body = []
+    for number, paragraph in enumerate(paragraphs):
+        if number % 10 == 0:
+            body.append(f'<w:p><w:pPr><w:pStyle w:val="Heading1"/></w:pPr><w:r><w:t>Section {number // 10 + 1}</w:t></w:r></w:p>')
+        body.append(f'<w:p><w:r><w:t xml:space="preserve">{escape(paragraph)}</w:t></w:r></w:p>')
+    styles = (f'<w:styles xmlns:w="{namespace}"><w:style w:type="paragraph" w:styleId="Heading1">'
+              '<w:name w:val="heading 1"/></w:style></w:styles>')
+    document = f'<w:document xmlns:w="{namespace}"><w:body>{"".join(body)}<w:sectPr/></w:body></w:document>'
+    
+    out = io.BytesIO()
+    with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("word/styles.xml", styles)
+        archive.writestr("word/document.xml", document)
+    return out.getvalue()
+
+
+def corpus(size_name: str, seed: int = 0) -> Dict[str, Tuple[bytes, str]]:
+    """All fixture documents of one size, as {name: (file bytes, content type)}"""
+    size = SIZES[size_name]
+    return {
+        "pdf": (pdf_bytes(size, seed), "application/pdf"),
+        "csv": (csv_bytes(size, seed), "text/csv"),
+        "json": (json_bytes(size, seed), "application/json"),
+        "docx": (docx_bytes(size, seed), "application/vnd.openxmlformats-officedocument.wordprocessingml.document"),
+        "text": (prose(size, seed).encode(), "text/plain"),
+        "pii": (pii_text(size, seed).encode(), "text/plain"),
+    }
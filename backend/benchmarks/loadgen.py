@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Mixed-traffic load generator for the Unboxed API.
+
+Replays a weighted mix of /ingest, /ask, /files and /stats at a target request rate
+(open loop: requests are sent on schedule whether or not earlier ones finished) and
+reports throughput, latency percentiles, error rates and server RSS over time.
+
+Typical local setup:
+
+    python -m benchmarks.openai_stub --port 8100 --chat-latency 0.8 --rpm 3000
+    OPENAI_BASE_URL=http://localhost:8100/v1 OPENAI_API_KEY=stub \\
+        python -m uvicorn main:app --port 8000 --workers 2
+    python -m benchmarks.loadgen --rps 20 --duration 60 --mix ask=6,ingest=1,files=2,stats=1 \\
+        --server-pid $(pgrep -of "uvicorn main:app")
+
+--start-stub PORT runs the stub inside the load generator process instead.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import httpx
+
+from benchmarks.fixtures import FIRST_NAMES, LAST_NAMES, pii_text, prose
+
+QUESTIONS = [
+    "What does the quarterly report say about revenue growth?",
+    "Who delivered the migration and when?",
+    "How did customer satisfaction change after onboarding?",
+    "What are the terms both parties agreed to?",
+] + [f"What did {first} {last} work on?" for first in FIRST_NAMES[:4] for last in LAST_NAMES[:2]]
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def read_rss_mb(pid: Optional[int]) -> Optional[float]:
+    """Resident set size of a process in MB, via psutil when installed, else /proc"""
+    if not pid:
+        return None
+    try:
+        import psutil
+        return psutil.Process(pid).memory_info().rss / 1024 / 1024
+    except ImportError:
+        pass
+    except Exception:
+        return None
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+
+class LoadGenerator:
+    def __init__(self, base_url: str, rps: float, duration: float, mix: Dict[str, float],
+                 max_in_flight: int, server_pid: Optional[int], report_interval: float,
+                 anonymize_fraction: float, seed: int):
+        self.base_url = base_url.rstrip("/")
+        self.rps = rps
+        self.duration = duration
+        self.endpoints = list(mix)
+        self.weights = [mix[name] for name in self.endpoints]
+        self.max_in_flight = max_in_flight
+        self.server_pid = server_pid
+        self.report_interval = report_interval
+        self.anonymize_fraction = anonymize_fraction
+        self.rnd = random.Random(seed)
+        self.results: List[Dict] = []
+        self.rss_samples: List[Dict[str, float]] = []
+        self.in_flight = 0
+        self.skipped = 0
+        self.started = 0.0
+    
+    async def _send(self, client: httpx.AsyncClient, endpoint: str, seq: int):
+        if endpoint == "ask":
+            request = client.post(f"{self.base_url}/ask", json={"question": self.rnd.choice(QUESTIONS)})
+        elif endpoint == "ingest":
+            text = pii_text(4000, seed=seq) if self.rnd.random() < self.anonymize_fraction else prose(4000, seed=seq)
+            request = client.post(
+                f"{self.base_url}/ingest",
+                files={"file": (f"load_{seq}.txt", text.encode(), "text/plain")},
+                data={"anonymize": str(self.rnd.random() < self.anonymize_fraction).lower()}
+            )
+        elif endpoint == "files":
+            request = client.get(f"{self.base_url}/files", params={"limit": 50})
+        else:
+            request = client.get(f"{self.base_url}/stats")
+        
+        self.in_flight += 1
+        sent = time.perf_counter()
+        status, error = 0, None
+        try:
+            response = await request
+            status = response.status_code
+        except httpx.HTTPError as e:
+            error = type(e).__name__
+        finally:
+            self.in_flight -= 1
+        self.results.append({
+            "endpoint": endpoint,
+            "sent": sent - self.started,
+            "latency": time.perf_counter() - sent,
+            "status": status,
+            "ok": error is None and 200 <= status < 300,
+            "error": error
+        })
+    
+    async def _report(self):
+        last = 0
+        while True:
+            await asyncio.sleep(self.report_interval)
+            elapsed = time.perf_counter() - self.started
+            window = self.results[last:]
+            last = len(self.results)
+            rss = read_rss_mb(self.server_pid)
+            if rss is not None:
+                self.rss_samples.append({"t": round(elapsed, 1), "rss_mb": round(rss, 1)})
+            errors = sum(1 for r in window if not r["ok"])
+            latencies = [r["latency"] for r in window]
+            print(f"[{elapsed:6.1f}s] {len(window) / self.report_interval:6.1f} rps  "
+                  f"p50 {percentile(latencies, 0.5) * 1000:7.0f}ms  p95 {percentile(latencies, 0.95) * 1000:7.0f}ms  "
+                  f"errors {errors:4d}  in-flight {self.in_flight:4d}"
+                  + (f"  rss {rss:7.1f}MB" if rss is not None else ""))
+    
+    async def run(self):
+        limits = httpx.Limits(max_connections=self.max_in_flight, max_keepalive_connections=self.max_in_flight)
+        async with httpx.AsyncClient(timeout=httpx.Timeout(120.0), limits=limits) as client:
+            self.started = time.perf_counter()
+            reporter = asyncio.create_task(self._report())
+            tasks = []
+            total = int(self.rps * self.duration)
+            for seq in range(total):
+                # Open loop: each request has a fixed send time
+                delay = self.started + seq / self.rps - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                if self.in_flight >= self.max_in_flight:
+                    self.skipped += 1
+                    continue
+                endpoint = self.rnd.choices(self.endpoints, self.weights)[0]
+                tasks.append(asyncio.create_task(self._send(client, endpoint, seq)))
+            await asyncio.gather(*tasks)
+            reporter.cancel()
+        return self.summary(time.perf_counter() - self.started)
+    
+    def summary(self, elapsed: float) -> Dict:
+        by_endpoint = defaultdict(list)
+        for result in self.results:
+            by_endpoint[result["endpoint"]].append(result)
+        by_endpoint["all"] = self.results
+        
+        endpoints = {}
+        for name, results in by_endpoint.items():
+            latencies = [r["latency"] for r in results]
+            errors = [r for r in results if not r["ok"]]
+            error_kinds = defaultdict(int)
+            for r in errors:
+                error_kinds[r["error"] or str(r["status"])] += 1
+            endpoints[name] = {
+                "requests": len(results),
+                "throughput_rps": round(len(results) / elapsed, 2) if elapsed else 0.0,
+                "error_rate": round(len(errors) / len(results), 4) if results else 0.0,
+                "errors": dict(error_kinds),
+                "p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+                "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+                "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+                "max_ms": round(max(latencies, default=0.0) * 1000, 1),
+            }
+        return {
+            "target_rps": self.rps,
+            "duration_s": round(elapsed, 1),
+            "skipped_client_saturated": self.skipped,
+            "endpoints": endpoints,
+            "rss": self.rss_samples,
+        }
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ("ask", "ingest", "files", "stats"):
+            raise argparse.ArgumentTypeError(f"Unknown endpoint in mix: {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def print_summary(summary: Dict):
+    print(f"\n📊 {summary['duration_s']}s at target {summary['target_rps']} rps "
+          f"({summary['skipped_client_saturated']} requests skipped, client saturated)")
+    print(f"{'endpoint':<8} {'reqs':>6} {'rps':>7} {'err%':>6} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}")
+    for name, s in summary["endpoints"].items():
+        print(f"{name:<8} {s['requests']:>6} {s['throughput_rps']:>7.2f} {s['error_rate'] * 100:>5.1f}% "
+              f"{s['p50_ms']:>6.0f}ms {s['p95_ms']:>6.0f}ms {s['p99_ms']:>6.0f}ms {s['max_ms']:>6.0f}ms")
+        if s["errors"]:
+            print(f"{'':<8} errors: {s['errors']}")
+    if summary["rss"]:
+        rss = [sample["rss_mb"] for sample in summary["rss"]]
+        print(f"server RSS: start {rss[0]:.1f}MB, peak {max(rss):.1f}MB, end {rss[-1]:.1f}MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mixed-traffic load generator for the Unboxed API")
+    parser.add_argument("--url", default="http://localhost:8000", help="API base URL")
+    parser.add_argument("--rps", type=float, default=10.0, help="Target requests per second")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to send traffic for")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("ask=6,ingest=1,files=2,stats=1"),
+                        help="Weighted endpoint mix, e.g. ask=6,ingest=1,files=2,stats=1")
+    parser.add_argument("--max-in-flight", type=int, default=256, help="Cap on concurrent requests")
+    parser.add_argument("--anonymize-fraction", type=float, default=0.3, help="Share of ingests with anonymize=true")
+    parser.add_argument("--server-pid", type=int, help="PID of the API server, to sample its RSS")
+    parser.add_argument("--report-interval", type=float, default=5.0, help="Seconds between progress lines")
+    parser.add_argument("--start-stub", type=int, metavar="PORT", help="Also run the OpenAI stub on this port")
+    parser.add_argument("--stub-chat-latency", type=float, default=0.8)
+    parser.add_argument("--stub-embedding-latency", type=float, default=0.05)
+    parser.add_argument("--stub-rpm", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json-out", help="Write the summary as JSON to this file")
+    args = parser.parse_args()
+    
+    if args.start_stub:
+        from benchmarks.openai_stub import StubSettings, start_in_thread
+        start_in_thread(StubSettings(args.stub_embedding_latency, args.stub_chat_latency, rpm=args.stub_rpm),
+                        args.start_stub)
+        print(f"🧪 OpenAI stub listening on http://127.0.0.1:{args.start_stub}/v1")
+    
+    generator = LoadGenerator(args.url, args.rps, args.duration, args.mix, args.max_in_flight,
+                              args.server_pid, args.report_interval, args.anonymize_fraction, args.seed)
+    summary = asyncio.run(generator.run())
+    print_summary(summary)
+    
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
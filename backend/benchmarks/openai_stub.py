@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+A local OpenAI-compatible stub for load tests.
+
+Implements /v1/embeddings and /v1/chat/completions with deterministic outputs,
+configurable latency (optionally with a slow tail) and a requests-per-minute limit
+that answers 429 like the real API. Point the backend at it with OPENAI_BASE_URL=http://localhost:8100/v1.
+
+    python -m benchmarks.openai_stub --port 8100 --embedding-latency 0.05 --chat-latency 0.8 --rpm 3000
+    python -m benchmarks.openai_stub --chat-latency 0.8 --slow-fraction 0.05 --slow-factor 10   # tail latency
+"""
+import argparse
+import asyncio
+import base64
+import random
+import struct
+import threading
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from benchmarks.fakes import fake_embedding, fake_rag_answer
+
+
+class StubSettings:
+    def __init__(self, embedding_latency: float = 0.05, chat_latency: float = 0.8,
+                 jitter: float = 0.2, rpm: int = 0, dimension: int = 1536,
+                 slow_fraction: float = 0.0, slow_factor: float = 10.0, chat_latencies: dict = None):
+        self.embedding_latency = embedding_latency
+        self.chat_latency = chat_latency
+        self.jitter = jitter  # Latency is scaled by a uniform factor in [1 - jitter, 1 + jitter]
+        self.rpm = rpm  # 0 disables rate limiting
+        self.dimension = dimension
+        self.slow_fraction = slow_fraction  # Share of calls that take slow_factor times as long
+        self.slow_factor = slow_factor
+        self.chat_latencies = chat_latencies or {}  # Chat latency per model, overriding chat_latency
+
+
+class RateLimiter:
+    """Token bucket refilled at rpm / 60 requests per second"""
+    
+    def __init__(self, rpm: int):
+        self.rpm = rpm
+        self.tokens = float(rpm)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def allow(self) -> bool:
+        if self.rpm <= 0:
+            return True
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rpm, self.tokens + (now - self.updated) * self.rpm / 60)
+            self.updated = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+def create_app(settings: StubSettings) -> FastAPI:
+    app = FastAPI(title="OpenAI stub")
+    limiter = RateLimiter(settings.rpm)
+    
+    async def delay(latency: float):
+        if random.random() < settings.slow_fraction:
+            latency *= settings.slow_factor
+        await asyncio.sleep(max(0.0, latency * random.uniform(1 - settings.jitter, 1 + settings.jitter)))
+    
+    def rate_limited() -> JSONResponse:
+        return JSONResponse(
+            status_code=429,
+            headers={"retry-after": "1"},
+            content={"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}}
+        )
+    
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        if not limiter.allow():
+            return rate_limited()
+        body = await request.json()
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        dimension = body.get("dimensions") or settings.dimension
+        await delay(settings.embedding_latency)
+        
+        data = []
+        for index, text in enumerate(inputs):
+            vector = fake_embedding(str(text), dimension)
+            if body.get("encoding_format") == "base64":
+                vector = base64.b64encode(struct.pack(f"<{len(vector)}f", *vector)).decode()
+            data.append({"object": "embedding", "index": index, "embedding": vector})
+        tokens = sum(len(str(text).split()) for text in inputs)
+        return {
+            "object": "list",
+            "data": data,
+            "model": body.get("model", "stub-embedding"),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens}
+        }
+    
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        if not limiter.allow():
+            return rate_limited()
+        body = await request.json()
+        prompt = "\n".join(str(message.get("content", "")) for message in body.get("messages", []))
+        await delay(settings.chat_latencies.get(body.get("model"), settings.chat_latency))
+        
+        answer = fake_rag_answer(prompt)
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub-chat"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": answer},
+                "finish_reason": "stop"
+            }],
+            "usage": {
+                "prompt_tokens": len(prompt.split()),
+                "completion_tokens": len(answer.split()),
+                "total_tokens": len(prompt.split()) + len(answer.split())
+            }
+        }
+    
+    return app
+
+
+def start_in_thread(settings: StubSettings, port: int) -> uvicorn.Server:
+    """Run the stub in a daemon thread and return once it is accepting connections"""
+    server = uvicorn.Server(uvicorn.Config(create_app(settings), host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible stub")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--embedding-latency", type=float, default=0.05, help="Seconds per embeddings call")
+    parser.add_argument("--chat-latency", type=float, default=0.8, help="Seconds per chat completion")
+    parser.add_argument("--jitter", type=float, default=0.2, help="Relative latency jitter")
+    parser.add_argument("--rpm", type=int, default=0, help="Requests per minute before 429s (0 = unlimited)")
+    parser.add_argument("--dimension", type=int, default=1536, help="Default embedding dimension")
+    parser.add_argument("--slow-fraction", type=float, default=0.0, help="Share of calls in the slow tail")
+    parser.add_argument("--slow-factor", type=float, default=10.0, help="How many times slower tail calls are")
+    parser.add_argument("--model-latency", action="append", default=[], metavar="MODEL=SECONDS",
+                        help="Chat latency for one model, e.g. a fallback model (repeatable)")
+    args = parser.parse_args()
+    
+    chat_latencies = {model: float(seconds) for model, seconds in
+                      (item.split("=", 1) for item in args.model_latency)}
+    settings = StubSettings(args.embedding_latency, args.chat_latency, args.jitter, args.rpm, args.dimension,
+                            args.slow_fraction, args.slow_factor, chat_latencies)
+    uvicorn.run(create_app(settings), host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Recall and storage-size benchmark for shortened and half-precision embeddings.
+
+Ground truth is the exact cosine top-k over full-dimension float32 vectors. Every
+(dimension, storage) pair is scored by recall@k against it, next to the bytes each
+stored vector takes in pgvector. Run from the backend directory:
+
+    python -m benchmarks.recall                          # synthetic vectors, in memory
+    python -m benchmarks.recall --openai                 # real embeddings of the fixtures (needs an API key)
+    python -m benchmarks.recall --db                     # also build ivfflat indexes in temporary tables
+
+Synthetic vectors are clustered and put most of their variance in the leading
+dimensions, as models trained for shortening (text-embedding-3-*) do, so they give a
+rough picture only; use --openai for numbers that transfer. Shortening is simulated by
+truncating and re-normalizing, which is what the API's `dimensions` parameter does.
+"""
+import argparse
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+from config import config
+from constants import EMBEDDING_CONSTANTS
+
+load_dotenv()
+
+# Bytes pgvector stores per value, plus its per-vector header
+STORAGE_BYTES = {"vector": 4, "halfvec": 2}
+STORAGE_DTYPES = {"vector": np.float32, "halfvec": np.float16}
+VECTOR_HEADER_BYTES = 8
+
+
+def synthetic_vectors(count: int, queries: int, dimension: int, seed: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Clustered corpus vectors plus queries drawn near corpus points"""
+    rng = np.random.default_rng(seed)
+    scale = (np.arange(dimension) + 1.0) ** -0.5
+    centers = rng.standard_normal((max(count // 50, 1), dimension))
+    corpus = centers[rng.integers(len(centers), size=count)] + 0.6 * rng.standard_normal((count, dimension))
+    corpus *= scale
+    picked = corpus[rng.integers(count, size=queries)]
+    query_vectors = picked + 0.3 * rng.standard_normal((queries, dimension)) * scale
+    return corpus.astype(np.float32), query_vectors.astype(np.float32)
+
+
+def openai_vectors(count: int, queries: int, seed: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Full-size embeddings of fixture chunks, with each query taken from a chunk's first sentence"""
+    from benchmarks.fixtures import prose
+    from services.chunk import chunk_text
+    from services.embedding import client
+
+    rng = np.random.default_rng(seed)
+    chunks: List[str] = []
+    fixture_seed = 0
+    while len(chunks) < count:
+        chunks.extend(chunk_text(prose(200_000, fixture_seed), 1000))
+        fixture_seed += 1
+    chunks = chunks[:count]
+    questions = [chunks[i].split(". ")[0] for i in rng.integers(count, size=queries)]
+
+    def embed(texts: List[str]) -> np.ndarray:
+        vectors = []
+        for start in range(0, len(texts), 512):
+            response = client.embeddings.create(model=config.OPENAI_EMBEDDING_MODEL, input=texts[start:start + 512])
+            vectors.extend(item.embedding for item in sorted(response.data, key=lambda item: item.index))
+        return np.asarray(vectors, dtype=np.float32)
+
+    return embed(chunks), embed(questions)
+
+
+def shorten(vectors: np.ndarray, dimension: int, storage: str) -> np.ndarray:
+    """Truncate, re-normalize and round to the storage precision"""
+    shortened = vectors[:, :dimension]
+    shortened = shortened / np.linalg.norm(shortened, axis=1, keepdims=True)
+    return shortened.astype(STORAGE_DTYPES[storage]).astype(np.float32)
+
+
+def top_k(corpus: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    """Exact cosine top-k indices per query (rows of both are unit length)"""
+    scores = queries @ corpus.T
+    best = np.argpartition(-scores, k, axis=1)[:, :k]
+    order = np.take_along_axis(scores, best, axis=1).argsort(axis=1)[:, ::-1]
+    return np.take_along_axis(best, order, axis=1)
+
+
+def recall(found: np.ndarray, truth: np.ndarray) -> float:
+    k = truth.shape[1]
+    return float(np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)]))
+
+
+def to_literal(vector: np.ndarray) -> str:
+    return "[" + ",".join(f"{value:.6g}" for value in vector) + "]"
+
+
+def db_case(conn, corpus: np.ndarray, queries: np.ndarray, truth: np.ndarray,
+            dimension: int, storage: str, k: int, probes: int) -> Optional[Dict[str, float]]:
+    """Load one configuration into a temporary table, index it and time indexed searches"""
+    from psycopg2.extras import execute_values
+
+    if dimension > EMBEDDING_CONSTANTS["INDEX_MAX_DIMENSIONS"][storage]:
+        return None
+    opclass = EMBEDDING_CONSTANTS["STORAGE_OPCLASSES"][storage]
+    column_type = f"{storage}({dimension})"
+    shortened = shorten(corpus, dimension, storage)
+    shortened_queries = shorten(queries, dimension, "vector")
+
+    cur = conn.cursor()
+    try:
+        cur.execute(f"CREATE TEMP TABLE recall_bench (id INTEGER PRIMARY KEY, embedding {column_type})")
+        execute_values(cur, "INSERT INTO recall_bench (id, embedding) VALUES %s",
+                       [(i, to_literal(v)) for i, v in enumerate(shortened)], page_size=1000)
+        lists = max(int(len(corpus) ** 0.5), 1)
+        cur.execute(f"CREATE INDEX ON recall_bench USING ivfflat (embedding {opclass}) WITH (lists = {lists})")
+        cur.execute("ANALYZE recall_bench")
+        cur.execute(f"SET ivfflat.probes = {probes}")
+        cur.execute("SELECT pg_total_relation_size('recall_bench')")
+        total_bytes = cur.fetchone()[0]
+
+        found, durations = [], []
+        for query in shortened_queries:
+            started = time.perf_counter()
+            cur.execute(f"SELECT id FROM recall_bench ORDER BY embedding <=> %s::{storage} LIMIT %s",
+                        (to_literal(query), k))
+            durations.append(time.perf_counter() - started)
+            found.append([row[0] for row in cur.fetchall()])
+        return {
+            "recall": recall(np.asarray(found), truth),
+            "size_mb": total_bytes / 1024 / 1024,
+            "p50_ms": float(np.median(durations)) * 1000,
+        }
+    finally:
+        conn.rollback()
+        cur.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall of shortened / half-precision embeddings")
+    parser.add_argument("--count", type=int, default=20000, help="Corpus vectors")
+    parser.add_argument("--queries", type=int, default=200, help="Query vectors")
+    parser.add_argument("--k", type=int, default=10, help="Neighbours per query")
+    parser.add_argument("--dims", default="", help="Comma-separated dimensions to test (default: full, 1024, 512, 256)")
+    parser.add_argument("--openai", action="store_true", help="Embed fixtures with OPENAI_EMBEDDING_MODEL")
+    parser.add_argument("--db", action="store_true", help="Also measure ivfflat recall, size and latency (uses DATABASE_URL)")
+    parser.add_argument("--probes", type=int, default=10, help="ivfflat.probes for --db")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    full_dimension = EMBEDDING_CONSTANTS["MODEL_DIMENSIONS"].get(config.OPENAI_EMBEDDING_MODEL, 1536)
+    if args.openai:
+        print(f"🌐 Embedding {args.count} fixture chunks with {config.OPENAI_EMBEDDING_MODEL}...")
+        corpus, queries = openai_vectors(args.count, args.queries, args.seed)
+        full_dimension = corpus.shape[1]
+    else:
+        corpus, queries = synthetic_vectors(args.count, args.queries, full_dimension, args.seed)
+
+    dims = [int(d) for d in args.dims.split(",") if d.strip()] or [full_dimension, 1024, 512, 256]
+    dims = [d for d in dims if d <= full_dimension]
+    truth = top_k(shorten(corpus, full_dimension, "vector"), shorten(queries, full_dimension, "vector"), args.k)
+
+    conn = None
+    storages = list(STORAGE_BYTES)
+    if args.db:
+        from services.db import DatabaseService
+        conn = DatabaseService().get_connection()
+        cur = conn.cursor()
+        cur.execute("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+        version = cur.fetchone()[0]
+        cur.close()
+        if tuple(int(part) for part in version.split(".")[:2]) < (0, 7):
+            print(f"⚠️ pgvector {version} has no halfvec; DB columns are measured for vector only")
+
+    full_bytes = full_dimension * STORAGE_BYTES["vector"] + VECTOR_HEADER_BYTES
+    header = f"{'storage':<16} {'bytes/vec':>9} {'shrink':>7} {'recall@' + str(args.k):>10}"
+    if conn:
+        header += f" {'ivf recall':>10} {'size MB':>8} {'p50 ms':>7}"
+    print(header)
+    for dimension in dims:
+        for storage in storages:
+            bytes_per_vector = dimension * STORAGE_BYTES[storage] + VECTOR_HEADER_BYTES
+            exact = recall(top_k(shorten(corpus, dimension, storage), shorten(queries, dimension, "vector"), args.k), truth)
+            line = (f"{storage + '(' + str(dimension) + ')':<16} {bytes_per_vector:>9} "
+                    f"{full_bytes / bytes_per_vector:>6.1f}x {exact:>10.3f}")
+            if conn:
+                measured = None
+                if storage == "vector" or tuple(int(p) for p in version.split(".")[:2]) >= (0, 7):
+                    measured = db_case(conn, corpus, queries, truth, dimension, storage, args.k, args.probes)
+                if measured:
+                    line += f" {measured['recall']:>10.3f} {measured['size_mb']:>8.1f} {measured['p50_ms']:>7.2f}"
+                else:
+                    line += f" {'-':>10} {'-':>8} {'-':>7}"
+            print(line)
+
+    if conn:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Offline benchmarks for the ingest and ask hot paths.
+
+Everything runs against generated fixtures and deterministic fake embedding/LLM
+backends, so no OpenAI key or network access is needed. Run from the backend directory:
+
+    python -m benchmarks.run                       # CPU-only benchmarks
+    python -m benchmarks.run --db                  # also DB insert/search (writes to DATABASE_URL)
+    python -m benchmarks.run --save-baseline       # record benchmarks/baseline.json
+    python -m benchmarks.run --compare             # exit 1 if any case regressed vs the baseline
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Tuple
+
+from dotenv import load_dotenv
+
+from benchmarks.fakes import fake_embedding, fake_embeddings
+from benchmarks.fixtures import SIZES, corpus, pii_text
+from constants import FILE_CONSTANTS
+from services.chunk import chunk_text
+from services.file_processor import FileProcessor
+
+load_dotenv()
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+Case = Tuple[str, Callable[[], object]]
+
+
+def time_case(fn: Callable[[], object], repeat: int) -> Dict[str, float]:
+    """Run fn once to warm up, then `repeat` times, with its console output discarded"""
+    durations = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        fn()
+        for _ in range(repeat):
+            started = time.perf_counter()
+            fn()
+            durations.append(time.perf_counter() - started)
+    durations.sort()
+    return {
+        "median": statistics.median(durations),
+        "p95": durations[min(len(durations) - 1, int(round(0.95 * (len(durations) - 1))))],
+        "min": durations[0],
+        "runs": repeat,
+    }
+
+
+def import_app():
+    """Import the API in a fresh interpreter, as a server process does on startup"""
+    env = {**os.environ, "DATABASE_URL": os.getenv("DATABASE_URL", "postgresql://localhost/unboxed")}
+    subprocess.run([sys.executable, "-c", "import main"], env=env, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                   cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def cpu_cases(sizes: List[str]) -> List[Case]:
+    """Extraction, chunking and anonymization cases that need no external services"""
+    processor = FileProcessor()
+    cases: List[Case] = [("startup/import_main", import_app)]
+    
+    for size in sizes:
+        documents = corpus(size)
+        for name, (content, content_type) in documents.items():
+            cases.append((f"process_file/{name}/{size}",
+                          lambda c=content, t=content_type, n=name: processor.process_file(c, t, f"{n}.bin")))
+        text = documents["text"][0].decode()
+        cases.append((f"chunk_text/{size}",
+                      lambda t=text: chunk_text(t, FILE_CONSTANTS["DEFAULT_CHUNK_SIZE"])))
+    
+    try:
+        from services.ner_cache import NerCache
+        from services.spacy_anonymizer import SpacyAnonymizer
+        with contextlib.redirect_stdout(io.StringIO()):
+            # Repeated runs over the same text would all be cache hits, so time NER uncached,
+            # and separately with every segment already cached
+            anonymizer = SpacyAnonymizer(ner_cache=NerCache(0))
+            cached_anonymizer = SpacyAnonymizer(ner_cache=NerCache(1_000_000))
+    except Exception as e:
+        print(f"⚠️ Skipping anonymizer benchmarks, spaCy model unavailable: {e}")
+        return cases
+    
+    for size in sizes:
+        text = pii_text(SIZES[size])
+        cases.append((f"anonymize_text/{size}", lambda t=text: anonymizer.anonymize_text(t)))
+        cases.append((f"anonymize_text_cached/{size}", lambda t=text: cached_anonymizer.anonymize_text(t)))
+        
+        with contextlib.redirect_stdout(io.StringIO()):
+            anonymized, mapping = anonymizer.anonymize_text(text)
+        question = "What did John Smith from Acme Corp do in London and how much did Maria Rossi earn?"
+        answer = " ".join(list(mapping.values())[:50])
+        cases.append((f"anonymize_question/{size}",
+                      lambda q=question, m=mapping: anonymizer.anonymize_question(q, m)))
+        cases.append((f"deanonymize_answer/{size}",
+                      lambda a=answer, m=mapping: anonymizer.deanonymize_answer(a, m)))
+    
+    return cases
+
+
+@contextlib.contextmanager
+def db_cases(sizes: List[str]):
+    """DB insert and search cases; every file they create is deleted afterwards"""
+    from services.db import DatabaseService
+    
+    db = DatabaseService()
+    created_ids: List[int] = []
+    
+    def ingest(text: str) -> int:
+        chunks = chunk_text(text, FILE_CONSTANTS["DEFAULT_CHUNK_SIZE"])
+        file_id = db.insert_file_metadata(
+            filename="benchmark.txt", content_type="text/plain", file_size=len(text),
+            word_count=len(text.split()), original_file_bytes=text.encode(),
+            metadata=json.dumps({"source": "benchmark"})
+        )
+        created_ids.append(file_id)
+        db.insert_document_chunks(file_id, [
+            {"content": chunk, "embedding": fake_embedding(chunk), "index": i}
+            for i, chunk in enumerate(chunks)
+        ])
+        return file_id
+    
+    cases: List[Case] = []
+    for size in sizes:
+        text = corpus(size)["text"][0].decode()
+        cases.append((f"db_insert/{size}", lambda t=text: ingest(t)))
+    
+    # Seed a searchable corpus before timing the searches
+    with contextlib.redirect_stdout(io.StringIO()):
+        for seed in range(5):
+            ingest(corpus("medium", seed)["pii"][0].decode())
+    queries = [f"What happened with project number {i}?" for i in range(16)]
+    cases.append(("db_search", lambda: db.search_similar_chunks(fake_embedding(queries[0]), limit=5)))
+    cases.append(("db_search_batch/16", lambda: db.search_similar_chunks_batch(fake_embeddings(queries), limit=5)))
+    
+    try:
+        yield cases
+    finally:
+        db.delete_files(created_ids)
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+            tolerance: float) -> List[str]:
+    """Print each case against the baseline and return the names of regressed cases"""
+    regressions = []
+    print(f"\n{'case':<36} {'median':>10} {'baseline':>10} {'change':>8}")
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            print(f"{name:<36} {result['median'] * 1000:>8.2f}ms {'-':>10} {'new':>8}")
+            continue
+        change = result["median"] / base["median"] - 1 if base["median"] else 0.0
+        flag = ""
+        if change > tolerance:
+            regressions.append(name)
+            flag = "  ❌ REGRESSION"
+        print(f"{name:<36} {result['median'] * 1000:>8.2f}ms {base['median'] * 1000:>8.2f}ms {change:>+7.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the ingest and ask hot paths")
+    parser.add_argument("--sizes", default="small,medium", help=f"Comma-separated fixture sizes from {list(SIZES)}")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per case")
+    parser.add_argument("--filter", default="", help="Only run cases whose name contains this")
+    parser.add_argument("--db", action="store_true", help="Include DB insert/search cases (uses DATABASE_URL)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help="Write the results as the new baseline")
+    parser.add_argument("--compare", action="store_true", help="Exit non-zero if a case regressed")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed median slowdown before flagging")
+    args = parser.parse_args()
+    
+    sizes = [size.strip() for size in args.sizes.split(",") if size.strip()]
+    unknown = [size for size in sizes if size not in SIZES]
+    if unknown:
+        parser.error(f"Unknown sizes: {unknown}")
+    
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f).get("cases", {})
+    if args.compare and not baseline:
+        # Checked before running anything: a gate with nothing to compare against must not pass
+        parser.error(f"--compare needs a baseline, but {args.baseline} has none (record one with --save-baseline)")
+    
+    results: Dict[str, Dict[str, float]] = {}
+    
+    def run(cases: List[Case]):
+        for name, fn in cases:
+            if args.filter and args.filter not in name:
+                continue
+            results[name] = time_case(fn, args.repeat)
+            r = results[name]
+            print(f"⏱️  {name:<36} median {r['median'] * 1000:8.2f}ms  p95 {r['p95'] * 1000:8.2f}ms")
+    
+    run(cpu_cases(sizes))
+    if args.db:
+        with db_cases(sizes) as cases:
+            run(cases)
+    
+    regressions = compare(results, baseline, args.tolerance) if baseline else []
+    
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({
+                "meta": {
+                    "created_at": datetime.utcnow().isoformat(),
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                },
+                "cases": {**baseline, **results},
+            }, f, indent=2)
+        print(f"\n💾 Saved baseline to {args.baseline}")
+    
+    if regressions:
+        print(f"\n❌ {len(regressions)} case(s) regressed by more than {args.tolerance:.0%}")
+        if args.compare:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""
+Bulk ingestion of a directory or a zip/tar archive, for seeding a deployment without
+uploading files one at a time to /ingest. Run from the backend directory:
+
+    python bulk_ingest.py ./documents
+    python bulk_ingest.py corpus.tar.gz --collection contracts --anonymize --workers 8
+
+Files go through the same steps as /ingest, in four stages connected by bounded queues,
+so a slow stage holds back the ones before it instead of piling up work in memory:
+
+    read (main thread) -> extract, anonymize and chunk (process pool)
+        -> embed in batches (thread) -> write to Postgres in batches (thread)
+
+Each file is written with all of its chunks in one transaction, and files whose bytes
+are already in the collection are skipped, so an interrupted run is resumed by running
+the same command again.
+"""
+import argparse
+import json
+import mimetypes
+import os
+import queue
+import sys
+import tarfile
+import threading
+import time
+import zipfile
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from config import config
+from constants import DB_CONSTANTS, FILE_CONSTANTS
+from services import embedding
+from services.chunk import chunk_text, sanitize_text
+from services.db import DatabaseService, EmbeddingVersionMismatch, file_hash, validate_collection_name
+from services.embedding import get_embeddings
+from services.file_processor import FileProcessor
+from services.rate_limit import RateLimitTimeout
+
+load_dotenv()
+
+# Files (up to this many bytes in total) whose hashes are looked up per query when
+# checking which are already ingested
+RESUME_CHECK_BATCH = 100
+RESUME_CHECK_BYTES = 64 * 1024 * 1024
+PROGRESS_INTERVAL = 5.0  # seconds
+DONE = None  # Queue sentinel
+
+# Per-process state of the extraction workers
+_worker: Dict[str, Any] = {}
+
+
+def _init_worker(anonymize: bool):
+    _worker["processor"] = FileProcessor()
+    if anonymize:
+        # Each worker loads its own spaCy model; NER_CACHE_PATH lets them share cached entities
+        from services.spacy_anonymizer import SpacyAnonymizer
+        _worker["anonymizer"] = SpacyAnonymizer()
+
+
+def extract_document(name: str, content_type: str, data: bytes, anonymize: bool) -> Dict[str, Any]:
+    """Extract, anonymize and chunk one file (runs in a pool worker)"""
+    processed = _worker["processor"].process_file(data, content_type, name)
+    if processed['status'] == 'error':
+        return processed
+    
+    text = processed.pop('text')
+    mapping = None
+    if anonymize:
+        text, mapping = _worker["anonymizer"].anonymize_text(text)
+    
+    # Embedded as chunked, stored sanitized, like /ingest does
+    processed['chunks'] = [
+        {'index': i, 'text': chunk, 'content': sanitize_text(chunk)}
+        for i, chunk in enumerate(chunk_text(text, FILE_CONSTANTS["DEFAULT_CHUNK_SIZE"],
+                                             content_defined=config.CONTENT_DEFINED_CHUNKING,
+                                             paragraphs=processed['paragraphs']))
+        if chunk.strip()
+    ]
+    processed['anonymization_mapping'] = mapping or None
+    return processed
+
+
+def iter_sources(path: str) -> Iterator[Tuple[str, int, Callable[[], bytes]]]:
+    """(name, size, read) for every regular file in a directory, zip or tar archive"""
+    if os.path.isdir(path):
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for filename in sorted(files):
+                full_path = os.path.join(root, filename)
+                
+                def read(full_path=full_path) -> bytes:
+                    with open(full_path, "rb") as f:
+                        return f.read()
+                
+                yield os.path.relpath(full_path, path), os.path.getsize(full_path), read
+    elif zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            for info in archive.infolist():
+                if not info.is_dir():
+                    yield info.filename, info.file_size, lambda info=info: archive.read(info)
+    elif tarfile.is_tarfile(path):
+        # Members are read in archive order, so compressed tars are streamed once
+        with tarfile.open(path, "r:*") as archive:
+            for member in archive:
+                if member.isfile():
+                    yield member.name, member.size, lambda member=member: archive.extractfile(member).read()
+    else:
+        raise ValueError(f"{path} is not a directory, zip or tar archive")
+
+
+class Progress:
+    """Counters shared by the stages, reported as files and chunks per second"""
+    
+    def __init__(self):
+        self.started = time.monotonic()
+        self.lock = threading.Lock()
+        self.counts = {"files": 0, "chunks": 0, "skipped": 0, "unsupported": 0, "failed": 0}
+        self.last_report = self.started
+    
+    def add(self, **counts: int):
+        with self.lock:
+            for key, value in counts.items():
+                self.counts[key] += value
+    
+    def line(self) -> str:
+        with self.lock:
+            counts = dict(self.counts)
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        return (f"{counts['files']} files ({counts['files'] / elapsed:.1f}/s), "
+                f"{counts['chunks']} chunks ({counts['chunks'] / elapsed:.1f}/s), "
+                f"{counts['skipped']} already ingested, {counts['unsupported']} unsupported, "
+                f"{counts['failed']} failed in {elapsed:.1f}s")
+    
+    def maybe_report(self):
+        now = time.monotonic()
+        if now - self.last_report >= PROGRESS_INTERVAL:
+            self.last_report = now
+            print(f"📈 {self.line()}")
+
+
+class BulkIngester:
+    def __init__(self, db_service: DatabaseService, collection: str, anonymize: bool, workers: int,
+                 embed_batch: int, write_batch: int, queue_size: int, metadata: Optional[str] = None):
+        self.db = db_service
+        self.collection = collection
+        self.anonymize = anonymize
+        self.workers = workers
+        self.embed_batch = embed_batch
+        self.write_batch = write_batch
+        self.metadata = metadata
+        self.progress = Progress()
+        self.supported_types = set(config.ALLOWED_FILE_TYPES) & set(FileProcessor().supported_types)
+        # Submitted extractions, in order; bounds the files in flight in the pool
+        self.extracted: "queue.Queue[Optional[Tuple[Future, bytes]]]" = queue.Queue(maxsize=queue_size)
+        # Embedded files waiting to be written
+        self.embedded: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(maxsize=queue_size)
+    
+    def run(self, path: str) -> Dict[str, int]:
+        self.db.ensure_collection(self.collection)
+        version = self.db.get_active_embedding_version()
+        if version:
+            embedding.set_active_version(version['version'], version['model'], version['dimensions'])
+            self.db.embedding_type = version['storage']
+        
+        embedder = threading.Thread(target=self._embed_stage, name="embed", daemon=True)
+        writer = threading.Thread(target=self._write_stage, name="write", daemon=True)
+        embedder.start()
+        writer.start()
+        with ProcessPoolExecutor(self.workers, initializer=_init_worker, initargs=(self.anonymize,)) as pool:
+            try:
+                self._read_stage(path, pool)
+            finally:
+                self.extracted.put(DONE)
+                embedder.join()
+                writer.join()
+        print(f"✅ Bulk ingest finished: {self.progress.line()}")
+        # A new collection's ANN index was built on an empty partition; rebuild it on the data now
+        try:
+            for collection in self.db.refresh_collection_indexes():
+                print(f"🏗️ Rebuilt the ANN index of collection {collection}")
+        except Exception as e:
+            print(f"⚠️ Could not rebuild the ANN index, the server will retry: {e}")
+        return dict(self.progress.counts)
+    
+    def _read_stage(self, path: str, pool: ProcessPoolExecutor):
+        seen = set()
+        pending: List[Tuple[str, str, bytes, bytes]] = []
+        
+        def submit_new():
+            # Resuming: files already in the collection were written completely, skip them
+            done = self.db.find_ingested_hashes([digest for _, _, _, digest in pending],
+                                                self.anonymize, self.collection)
+            for name, content_type, data, digest in pending:
+                if digest in done:
+                    self.progress.add(skipped=1)
+                    continue
+                future = pool.submit(extract_document, name, content_type, data, self.anonymize)
+                self.extracted.put((future, data))  # Blocks while the later stages catch up
+            pending.clear()
+        
+        for name, size, read in iter_sources(path):
+            content_type = mimetypes.guess_type(name)[0]
+            if content_type not in self.supported_types or size > config.MAX_FILE_SIZE:
+                self.progress.add(unsupported=1)
+                continue
+            data = read()
+            digest = file_hash(data)
+            if digest in seen:
+                self.progress.add(skipped=1)
+                continue
+            seen.add(digest)
+            pending.append((name, content_type, data, digest))
+            if len(pending) >= RESUME_CHECK_BATCH or sum(len(item[2]) for item in pending) >= RESUME_CHECK_BYTES:
+                submit_new()
+        submit_new()
+    
+    def _embed_stage(self):
+        batch: List[Dict[str, Any]] = []
+        finished = False
+        try:
+            while not finished:
+                item = self.extracted.get()
+                if item is DONE:
+                    finished = True
+                else:
+                    document = self._collect(*item)
+                    if document:
+                        batch.append(document)
+                # Fill a whole embeddings call when files are waiting, else don't hold them back
+                chunks = sum(len(document['chunks']) for document in batch)
+                if batch and (finished or chunks >= self.embed_batch or self.extracted.empty()):
+                    for document in self._embed(batch):
+                        self.embedded.put(document)
+                    batch = []
+        finally:
+            self.embedded.put(DONE)
+    
+    def _collect(self, future: Future, data: bytes) -> Optional[Dict[str, Any]]:
+        try:
+            document = future.result()
+        except Exception as e:
+            print(f"❌ Extraction failed: {e}")
+            self.progress.add(failed=1)
+            return None
+        if document['status'] == 'error':
+            print(f"❌ Could not process {document['filename']}: {document.get('error')}")
+            self.progress.add(failed=1)
+            return None
+        document['original_file_bytes'] = data
+        return document
+    
+    def _embed(self, documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Embed the chunks of these files in as few calls as possible; returns the files that succeeded"""
+        chunks = [chunk for document in documents for chunk in document['chunks']]
+        embeddings = []
+        try:
+            for start in range(0, len(chunks), self.embed_batch):
+                texts = [chunk['text'] for chunk in chunks[start:start + self.embed_batch]]
+                batch_embeddings = get_embeddings(texts, priority="bulk")
+                if len(batch_embeddings) != len(texts):
+                    raise RuntimeError("embeddings call failed")
+                embeddings.extend(batch_embeddings)
+        except (RateLimitTimeout, RuntimeError) as e:
+            # Left out of this run; the next run picks them up again
+            print(f"❌ Embedding {len(documents)} files failed: {e}")
+            self.progress.add(failed=len(documents))
+            return []
+        for chunk, chunk_embedding in zip(chunks, embeddings):
+            chunk['embedding'] = chunk_embedding
+        version = embedding.active_version["version"]
+        for document in documents:
+            document['embedding_version'] = version
+        return documents
+    
+    def _write_stage(self):
+        batch: List[Dict[str, Any]] = []
+        finished = False
+        while not finished:
+            try:
+                document = self.embedded.get(timeout=PROGRESS_INTERVAL)
+            except queue.Empty:
+                self.progress.maybe_report()
+                continue
+            if document is DONE:
+                finished = True
+            else:
+                batch.append(document)
+            if batch and (finished or len(batch) >= self.write_batch or self.embedded.empty()):
+                self._write(batch)
+                batch = []
+            self.progress.maybe_report()
+    
+    def _write(self, documents: List[Dict[str, Any]]):
+        # One embedding version per transaction; a switch mid-run only affects the later files
+        for version in {document['embedding_version'] for document in documents}:
+            files = [
+                {**document, 'anonymized': self.anonymize, 'metadata': self.metadata, 'collection': self.collection}
+                for document in documents if document['embedding_version'] == version
+            ]
+            try:
+                try:
+                    self.db.insert_files_with_chunks(files, version)
+                except EmbeddingVersionMismatch as e:
+                    # A re-embedding job switched models during the run: redo these with the new one
+                    print(f"🔁 Embedding version changed to {e.active['version']}, re-embedding {len(files)} files")
+                    embedding.set_active_version(e.active['version'], e.active['model'], e.active['dimensions'])
+                    self.db.embedding_type = e.active['storage']
+                    files = self._embed(files)
+                    self.db.insert_files_with_chunks(files, e.active['version'])
+            except Exception as e:
+                print(f"❌ Writing {len(files)} files failed: {e}")
+                self.progress.add(failed=len(files))
+                continue
+            self.progress.add(files=len(files), chunks=sum(len(file['chunks']) for file in files))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest a directory or zip/tar archive of documents")
+    parser.add_argument("path", help="Directory, .zip or .tar(.gz/.bz2/.xz) archive")
+    parser.add_argument("--collection", default=DB_CONSTANTS["DEFAULT_COLLECTION"],
+                        help="Collection to add the documents to (created if new)")
+    parser.add_argument("--anonymize", action="store_true", help="Anonymize sensitive data before embedding")
+    parser.add_argument("--metadata", help="Metadata JSON stored with every file")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Processes extracting, anonymizing and chunking (default: one per CPU)")
+    parser.add_argument("--embed-batch", type=int, default=100, help="Chunks per embeddings call")
+    parser.add_argument("--write-batch", type=int, default=20, help="Files per database transaction")
+    parser.add_argument("--queue-size", type=int, default=None,
+                        help="Files buffered between stages (default: twice the workers)")
+    args = parser.parse_args()
+    
+    try:
+        validate_collection_name(args.collection)
+        if args.metadata:
+            json.loads(args.metadata)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(2)
+    
+    ingester = BulkIngester(
+        DatabaseService(),
+        collection=args.collection,
+        anonymize=args.anonymize,
+        workers=args.workers,
+        embed_batch=args.embed_batch,
+        write_batch=args.write_batch,
+        queue_size=args.queue_size or 2 * args.workers,
+        metadata=args.metadata,
+    )
+    try:
+        counts = ingester.run(args.path)
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}")
+        sys.exit(2)
+    except BrokenProcessPool as e:
+        print(f"❌ Extraction workers failed (e.g. the spaCy model is missing): {e}")
+        sys.exit(1)
+    sys.exit(1 if counts["failed"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 import os
 from dotenv import load_dotenv
+from constants import EMBEDDING_CONSTANTS
 
 load_dotenv()
 
@@ -11,13 +12,85 @@ class Config:
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
     OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
     OPENAI_EMBEDDING_MODEL = os.getenv("OPENAI_EMBEDDING_MODEL", "text-embedding-ada-002")
+    # Defaults to the model's native size; text-embedding-3-* models can return shortened vectors
+    EMBEDDING_DIMENSIONS = int(os.getenv(
+        "EMBEDDING_DIMENSIONS",
+        str(EMBEDDING_CONSTANTS["MODEL_DIMENSIONS"].get(OPENAI_EMBEDDING_MODEL, 1536))
+    ))
+    EMBEDDING_STORAGE = os.getenv("EMBEDDING_STORAGE", "vector").lower()  # vector (float32) or halfvec (float16)
+    
+    # OpenAI rate limits, enforced client-side before calls are sent (0 disables a limit)
+    OPENAI_EMBEDDING_REQUESTS_PER_MINUTE = int(os.getenv("OPENAI_EMBEDDING_REQUESTS_PER_MINUTE", "3000"))
+    OPENAI_EMBEDDING_TOKENS_PER_MINUTE = int(os.getenv("OPENAI_EMBEDDING_TOKENS_PER_MINUTE", "1000000"))
+    OPENAI_CHAT_REQUESTS_PER_MINUTE = int(os.getenv("OPENAI_CHAT_REQUESTS_PER_MINUTE", "3500"))
+    OPENAI_CHAT_TOKENS_PER_MINUTE = int(os.getenv("OPENAI_CHAT_TOKENS_PER_MINUTE", "200000"))
+    OPENAI_RATE_BURST_SECONDS = float(os.getenv("OPENAI_RATE_BURST_SECONDS", "10"))  # Budget that may be spent at once
+    # Processes sending calls with the key (gunicorn.conf.py sets it to its worker count): each
+    # process enforces its own limiters, so each gets this share of the limits above
+    OPENAI_RATE_LIMIT_PROCESSES = max(1, int(os.getenv("OPENAI_RATE_LIMIT_PROCESSES", "1")))
+    OPENAI_INTERACTIVE_DEADLINE = float(os.getenv("OPENAI_INTERACTIVE_DEADLINE", "15"))  # Max seconds /ask calls queue
+    OPENAI_BULK_DEADLINE = float(os.getenv("OPENAI_BULK_DEADLINE", "600"))  # Max seconds ingestion calls queue
+    OPENAI_BULK_THREADS = int(os.getenv("OPENAI_BULK_THREADS", "4"))  # Threads ingestion's calls queue in, apart from /ask's
+    
+    # Chat completions
+    LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))  # Max seconds for an answer, across all attempts
+    LLM_HEDGING = os.getenv("LLM_HEDGING", "false").lower() == "true"  # Second attempt when the first is slower than p95
+    LLM_HEDGE_DELAY = float(os.getenv("LLM_HEDGE_DELAY", "3"))  # Seconds before hedging until a p95 is known
+    # Faster model for attempts started with less time left than OPENAI_MODEL's p95 (empty disables)
+    OPENAI_FALLBACK_MODEL = os.getenv("OPENAI_FALLBACK_MODEL", "")
     
     # File Processing
     MAX_CHUNK_SIZE = int(os.getenv("MAX_CHUNK_SIZE", "1000"))
     MAX_FILE_SIZE = int(os.getenv("MAX_FILE_SIZE", "10485760"))  # 10MB
+    # Let content pick chunk boundaries, so replacing an edited file only re-embeds the chunks around the
+    # edits; worth it for corpora whose files are replaced often (PUT /files/{id})
+    CONTENT_DEFINED_CHUNKING = os.getenv("CONTENT_DEFINED_CHUNKING", "false").lower() == "true"
+    # What /ingest does with a byte-identical upload: reuse (return the existing file),
+    # alias (add a file row sharing its chunks) or ingest (process it again)
+    DUPLICATE_UPLOADS = os.getenv("DUPLICATE_UPLOADS", "reuse").lower()
+    
+    # Storage compression of chunk text and original files: none or zstd. Rows already
+    # stored stay readable whatever this is set to.
+    STORAGE_COMPRESSION = os.getenv("STORAGE_COMPRESSION", "none").lower()
+    COMPRESSION_LEVEL = int(os.getenv("COMPRESSION_LEVEL", "3"))  # zstd level, 1 (fastest) to 19
+    COMPRESSION_DICTIONARY_SIZE = int(os.getenv("COMPRESSION_DICTIONARY_SIZE", "65536"))  # Bytes of the trained chunk dictionary
+    
+    # Anonymization
+    NER_CACHE_SIZE = int(os.getenv("NER_CACHE_SIZE", "50000"))  # Text segments whose entities are kept, 0 disables
+    NER_CACHE_PATH = os.getenv("NER_CACHE_PATH")  # Optional SQLite file to persist the NER cache across restarts
     
     # API Settings
     CONTEXT_LIMIT_DEFAULT = int(os.getenv("CONTEXT_LIMIT_DEFAULT", "5"))
+    MMR_FETCH_MULTIPLIER = int(os.getenv("MMR_FETCH_MULTIPLIER", "4"))  # Candidates fetched per chunk kept
+    BATCH_ASK_CONCURRENCY = int(os.getenv("BATCH_ASK_CONCURRENCY", "4"))  # Parallel LLM calls per /ask/batch
+    BATCH_ASK_MAX_QUESTIONS = int(os.getenv("BATCH_ASK_MAX_QUESTIONS", "100"))  # Questions per /ask/batch (one embeddings call)
+    CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))  # Max context tokens in the RAG prompt
+    BINARY_PREFILTER = os.getenv("BINARY_PREFILTER", "false").lower() == "true"  # Exact re-rank (Hamming shortlist, cosine order) instead of the ANN index; full scan, small collections only
+    BINARY_PREFILTER_OVERSAMPLING = int(os.getenv("BINARY_PREFILTER_OVERSAMPLING", "10"))  # Shortlisted chunks per result the exact re-rank scores
+    # Identical concurrent /ask requests (same anonymized question, options and corpus version) share one answer
+    ASK_COALESCING = os.getenv("ASK_COALESCING", "true").lower() == "true"
+    
+    # Background jobs
+    STATS_RECONCILE_INTERVAL = int(os.getenv("STATS_RECONCILE_INTERVAL", "3600"))  # seconds, 0 disables
+    DELETE_PURGE_INTERVAL = int(os.getenv("DELETE_PURGE_INTERVAL", "30"))  # seconds, 0 disables
+    ANN_REINDEX_INTERVAL = int(os.getenv("ANN_REINDEX_INTERVAL", "600"))  # seconds, 0 disables
+    EMBEDDING_VERSION_REFRESH = int(os.getenv("EMBEDDING_VERSION_REFRESH", "10"))  # seconds, 0 disables
+    
+    # Re-embedding (background migration to another embedding model)
+    REEMBED_REQUESTS_PER_MINUTE = int(os.getenv("REEMBED_REQUESTS_PER_MINUTE", "60"))  # 0 disables the limit
+    REEMBED_TOKENS_PER_MINUTE = int(os.getenv("REEMBED_TOKENS_PER_MINUTE", "100000"))  # 0 disables the limit
+    REEMBED_BATCH_SIZE = int(os.getenv("REEMBED_BATCH_SIZE", "100"))  # Chunks per embeddings call
+    REEMBED_AUTO_RESUME = os.getenv("REEMBED_AUTO_RESUME", "true").lower() == "true"  # Resume an unfinished job on startup
+    
+    # Startup
+    WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "true").lower() == "true"  # Load models in the background after startup
+    
+    # Admin & profiling
+    ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")  # When set, /admin endpoints require X-Admin-Token
+    PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+    PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", "0"))
+    PROFILING_MAX_STORED = int(os.getenv("PROFILING_MAX_STORED", "20"))
+    PROFILE_DIR = os.getenv("PROFILE_DIR")  # Optional directory to also write .pstats files to
     
     # Allowed file types
     ALLOWED_FILE_TYPES = [
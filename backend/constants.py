@@ -5,18 +5,55 @@ MESSAGES = {
     "FILE_TYPE_NOT_SUPPORTED": "File type {file_type} not supported. Allowed types: {allowed_types}",
     "PROCESSING_ERROR": "Failed to process file: {error}",
     "EMBEDDING_ERROR": "Failed to generate embedding",
-    "RAG_ERROR": "Sorry, I encountered an error while generating the answer."
+    "RAG_ERROR": "Sorry, I encountered an error while generating the answer.",
+    "DUPLICATE_UPLOAD": "Identical document already ingested; reused its chunks"
 }
 
 # Database
 DB_CONSTANTS = {
     "DEFAULT_LIMIT": 5,
-    "EMBEDDING_DIMENSION": 1536,  # OpenAI ada-002 dimension
+    "FILES_PAGE_SIZE": 100,
+    "FILES_PAGE_SIZE_MAX": 500,
+    "DELETE_BATCH_SIZE": 1000,  # Chunks removed per transaction by the background purge
+    "EMBEDDING_SWITCH_LOCK_TIMEOUT_MS": 5000,  # Give up a version switch stuck behind long queries; the job retries it
+    "COLLECTION_DDL_LOCK_TIMEOUT_MS": 5000,  # Same for creating or dropping a collection's partition
+    "FILE_LIST_FIELDS": ["id", "filename", "content_type", "file_size", "word_count", "anonymized", "collection", "created_at"],
+    "DEFAULT_COLLECTION": "default",
+    "COLLECTION_NAME_PATTERN": r"^[a-z0-9][a-z0-9_-]{0,62}$",  # Lowercase, fits a Postgres identifier
+    "ANN_REINDEX_MIN_CHUNKS": 1000,  # A partition's ANN index is first rebuilt (from empty) at this size
+    "ANN_REINDEX_GROWTH": 2.0,  # ... and again whenever the partition has grown by this factor since
+    "ANN_REINDEX_LOCK_KEY": 0x756E626F79,  # Advisory lock: one reindexing process at a time
+    "STORAGE_COMPRESSION_CODECS": ["none", "zstd"],
+    "COMPRESSION_TRAINING_SAMPLES": 20000,  # Chunks sampled to train a dictionary
+    "COMPRESSION_MIN_SAMPLES": 100,  # Fewer chunks than this can't make a useful dictionary
+    "COMPRESSION_MIN_SAVING": 0.05,  # Original files that compress by less are stored as they are
+    "COMPRESSION_DICTIONARY_REFRESH": 60,  # Seconds before other processes start using a new dictionary
+    "COMPRESSION_BATCH_SIZE": 500,  # Rows compressed per transaction when compressing stored data
+}
+
+# Embeddings
+EMBEDDING_CONSTANTS = {
+    # Native output size of the OpenAI embedding models
+    "MODEL_DIMENSIONS": {
+        "text-embedding-ada-002": 1536,
+        "text-embedding-3-small": 1536,
+        "text-embedding-3-large": 3072,
+    },
+    # Models that accept a `dimensions` argument to shorten their output
+    "SHORTENABLE_MODELS": {"text-embedding-3-small", "text-embedding-3-large"},
+    # pgvector column types the chunk embeddings can be stored as, with their cosine index opclass
+    "STORAGE_OPCLASSES": {
+        "vector": "vector_cosine_ops",    # float32, 4 bytes per dimension
+        "halfvec": "halfvec_cosine_ops",  # float16, 2 bytes per dimension (pgvector >= 0.7.0)
+    },
+    # Most dimensions an ivfflat index supports per storage type
+    "INDEX_MAX_DIMENSIONS": {"vector": 2000, "halfvec": 4000},
 }
 
 # File Processing
 FILE_CONSTANTS = {
     "DEFAULT_CHUNK_SIZE": 1000,
+    "EMBEDDING_BATCH_SIZE": 100,  # Chunks per embeddings call when replacing a file
     "MAX_TOKENS": 500,
     "TEMPERATURE": 0.7,
 }
@@ -4,6 +4,19 @@
 -- Enable the pgvector extension for vector operations
 CREATE EXTENSION IF NOT EXISTS vector;
 
+-- Collections keep the documents of different teams apart. Each one stores its chunks in
+-- its own partition of document_chunks, with its own ANN index; the DatabaseService
+-- creates partitions on first use, rebuilds their ANN index once they have filled (an
+-- ivfflat index built on an empty partition has no useful lists) and drops them with the
+-- collection.
+CREATE TABLE IF NOT EXISTS collections (
+    name VARCHAR(63) PRIMARY KEY,
+    partition_name VARCHAR(63) NOT NULL UNIQUE,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+INSERT INTO collections (name, partition_name) VALUES ('default', 'document_chunks_default')
+ON CONFLICT (name) DO NOTHING;
+
 -- Files table to store metadata about uploaded files
 CREATE TABLE IF NOT EXISTS files (
     id SERIAL PRIMARY KEY,
@@ -12,28 +25,176 @@ CREATE TABLE IF NOT EXISTS files (
     file_size INTEGER NOT NULL,
     word_count INTEGER DEFAULT 0,
     original_file BYTEA, -- Store the original file as binary data
+    original_file_zstd BYTEA, -- Or compressed, with original_file NULL
     anonymized BOOLEAN DEFAULT FALSE,
     anonymization_mapping JSONB, -- Store the mapping of original values to aliases
     metadata JSONB,
+    chunk_count INTEGER NOT NULL DEFAULT 0, -- Maintained on chunk insert so deletes need no count
+    deleted_at TIMESTAMP WITH TIME ZONE, -- Tombstone: set by background delete, purged later
+    content_hash BYTEA, -- SHA-256 of the uploaded bytes, to recognise repeated uploads
+    alias_of INTEGER REFERENCES files(id) ON DELETE CASCADE, -- Duplicate upload sharing this file's chunks
+    collection VARCHAR(63) NOT NULL DEFAULT 'default' REFERENCES collections(name),
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
+ALTER TABLE files ADD COLUMN IF NOT EXISTS chunk_count INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE files ADD COLUMN IF NOT EXISTS deleted_at TIMESTAMP WITH TIME ZONE;
+ALTER TABLE files ADD COLUMN IF NOT EXISTS content_hash BYTEA;
+ALTER TABLE files ADD COLUMN IF NOT EXISTS alias_of INTEGER REFERENCES files(id) ON DELETE CASCADE;
+ALTER TABLE files ADD COLUMN IF NOT EXISTS collection VARCHAR(63) NOT NULL DEFAULT 'default' REFERENCES collections(name);
+ALTER TABLE files ADD COLUMN IF NOT EXISTS original_file_zstd BYTEA;
 
--- Document chunks table to store text chunks with embeddings
+-- Document chunks table to store text chunks with embeddings, partitioned by collection
 CREATE TABLE IF NOT EXISTS document_chunks (
-    id SERIAL PRIMARY KEY,
+    id SERIAL,
+    collection VARCHAR(63) NOT NULL DEFAULT 'default',
     file_id INTEGER REFERENCES files(id) ON DELETE CASCADE,
-    content TEXT NOT NULL,
-    embedding vector(1536), -- OpenAI ada-002 embedding dimension
+    content TEXT, -- NULL when the text is stored compressed in content_zstd
+    content_zstd BYTEA, -- zstd frame, with the compression_dictionaries entry whose ID it records
+    embedding vector(1536), -- Converted to EMBEDDING_STORAGE(EMBEDDING_DIMENSIONS) by setup_database.py
     chunk_index INTEGER DEFAULT 0,
+    embedding_bq BIT VARYING, -- Sign bit of each embedding dimension, maintained by trigger
+    content_hash BYTEA, -- SHA-256 of content, to find unchanged chunks when a file is replaced
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (collection, id)
+) PARTITION BY LIST (collection);
+ALTER TABLE document_chunks ADD COLUMN IF NOT EXISTS embedding_bq BIT VARYING;
+ALTER TABLE document_chunks ADD COLUMN IF NOT EXISTS content_hash BYTEA;
+ALTER TABLE document_chunks ADD COLUMN IF NOT EXISTS content_zstd BYTEA;
+ALTER TABLE document_chunks ALTER COLUMN content DROP NOT NULL;
+
+-- Databases created before collections have a plain document_chunks table: turn it into
+-- the partition of the default collection in place, without copying any rows
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_class WHERE relname = 'document_chunks' AND relkind = 'r') THEN
+        DROP VIEW IF EXISTS chunk_with_file_info;
+        DROP TRIGGER IF EXISTS quantize_document_chunks_embedding ON document_chunks;
+        ALTER TABLE document_chunks RENAME TO document_chunks_default;
+        ALTER TABLE document_chunks_default DROP CONSTRAINT IF EXISTS document_chunks_file_id_fkey;
+        ALTER TABLE document_chunks_default DROP CONSTRAINT IF EXISTS document_chunks_pkey;
+        ALTER TABLE document_chunks_default ADD COLUMN collection VARCHAR(63) NOT NULL DEFAULT 'default';
+        -- Partition index names, so the parent's indexes adopt these instead of building new ones
+        ALTER INDEX IF EXISTS idx_document_chunks_embedding RENAME TO document_chunks_default_embedding_idx;
+        ALTER INDEX IF EXISTS idx_document_chunks_embedding_next RENAME TO document_chunks_default_embedding_next_idx;
+        ALTER INDEX IF EXISTS idx_document_chunks_file_id RENAME TO document_chunks_default_file_id_idx;
+        CREATE TABLE document_chunks (LIKE document_chunks_default INCLUDING DEFAULTS)
+            PARTITION BY LIST (collection);
+        ALTER SEQUENCE document_chunks_id_seq OWNED BY document_chunks.id;
+        ALTER TABLE document_chunks ADD PRIMARY KEY (collection, id);
+        ALTER TABLE document_chunks ADD FOREIGN KEY (file_id) REFERENCES files(id) ON DELETE CASCADE;
+        ALTER TABLE document_chunks ATTACH PARTITION document_chunks_default FOR VALUES IN ('default');
+    END IF;
+END $$;
+CREATE TABLE IF NOT EXISTS document_chunks_default PARTITION OF document_chunks FOR VALUES IN ('default');
+
+-- zstd dictionaries trained on chunk text. The newest one compresses new chunks; older ones
+-- are kept, since chunks compressed with them need them to be read.
+CREATE TABLE IF NOT EXISTS compression_dictionaries (
+    id BIGINT PRIMARY KEY, -- zstd dictionary ID, as recorded in each compressed frame
+    data BYTEA NOT NULL,
+    samples INTEGER NOT NULL, -- Chunks it was trained on
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
 
+-- Embedding model versions. Exactly one is 'active' (the model document_chunks.embedding
+-- holds); a re-embedding job fills embedding_next for a 'building' version, checkpointing
+-- the last chunk id it finished, and then switches it to active in one transaction.
+CREATE TABLE IF NOT EXISTS embedding_versions (
+    version VARCHAR(200) PRIMARY KEY, -- model:dimensions:storage
+    model VARCHAR(100) NOT NULL,
+    dimensions INTEGER NOT NULL,
+    storage VARCHAR(20) NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'building', -- building | active | retired | cancelled
+    last_chunk_id INTEGER NOT NULL DEFAULT 0,
+    embedded_chunks BIGINT NOT NULL DEFAULT 0,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    activated_at TIMESTAMP WITH TIME ZONE
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_embedding_versions_active ON embedding_versions((status = 'active')) WHERE status = 'active';
+CREATE UNIQUE INDEX IF NOT EXISTS idx_embedding_versions_building ON embedding_versions((status = 'building')) WHERE status = 'building';
+
+-- Single-row table of corpus counters maintained by the application in the same
+-- transaction as every insert/delete, so /stats and listing totals are O(1) reads.
+-- DatabaseService.reconcile_corpus_stats() periodically corrects any drift.
+CREATE TABLE IF NOT EXISTS corpus_stats (
+    id SMALLINT PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+    file_count BIGINT NOT NULL DEFAULT 0,
+    chunk_count BIGINT NOT NULL DEFAULT 0,
+    total_words BIGINT NOT NULL DEFAULT 0
+);
+ALTER TABLE corpus_stats ADD COLUMN IF NOT EXISTS chunk_count BIGINT NOT NULL DEFAULT 0;
+ALTER TABLE corpus_stats ADD COLUMN IF NOT EXISTS total_words BIGINT NOT NULL DEFAULT 0;
+-- Bumped by every change to the corpus, so identical questions can share one answer per version
+ALTER TABLE corpus_stats ADD COLUMN IF NOT EXISTS version BIGINT NOT NULL DEFAULT 0;
+
+-- Same counters broken down by content type and anonymization
+CREATE TABLE IF NOT EXISTS corpus_stats_breakdown (
+    content_type VARCHAR(100) NOT NULL,
+    anonymized BOOLEAN NOT NULL,
+    file_count BIGINT NOT NULL DEFAULT 0,
+    chunk_count BIGINT NOT NULL DEFAULT 0,
+    total_words BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (content_type, anonymized)
+);
+
+-- Same counters per collection (no foreign key, so updating them never locks the collections
+-- row that DatabaseService.drop_collection holds). indexed_chunks is the partition's chunk count
+-- when its ANN index was last built: it starts out built on an empty partition and is rebuilt
+-- once the partition has grown enough for better centroids.
+CREATE TABLE IF NOT EXISTS collection_stats (
+    collection VARCHAR(63) PRIMARY KEY,
+    file_count BIGINT NOT NULL DEFAULT 0,
+    chunk_count BIGINT NOT NULL DEFAULT 0,
+    indexed_chunks BIGINT NOT NULL DEFAULT 0
+);
+
+-- Backfill per-file chunk counts for rows created before the column existed
+UPDATE files f SET chunk_count = c.chunk_count
+FROM (SELECT file_id, COUNT(*) AS chunk_count FROM document_chunks GROUP BY file_id) c
+WHERE c.file_id = f.id AND f.chunk_count <> c.chunk_count;
+
+-- Backfill content hashes for chunks stored before the column existed
+UPDATE document_chunks SET content_hash = sha256(convert_to(content, 'UTF8'))
+WHERE content_hash IS NULL;
+
+-- Backfill upload hashes for files stored before the column existed
+UPDATE files SET content_hash = sha256(original_file)
+WHERE content_hash IS NULL AND original_file IS NOT NULL AND alias_of IS NULL;
+
+-- Seed the counters from any existing data
+INSERT INTO corpus_stats (id, file_count, chunk_count, total_words)
+SELECT 1,
+       (SELECT COUNT(*) FROM files WHERE deleted_at IS NULL),
+       (SELECT COALESCE(SUM(chunk_count), 0) FROM files WHERE deleted_at IS NULL),
+       (SELECT COALESCE(SUM(word_count), 0) FROM files WHERE deleted_at IS NULL)
+ON CONFLICT (id) DO NOTHING;
+-- (the ANN index of a partition that already holds chunks counts as built on all of them, so
+-- upgrading doesn't rebuild the index of every existing collection at once)
+INSERT INTO collection_stats (collection, file_count, chunk_count, indexed_chunks)
+SELECT c.name, COUNT(f.id), COALESCE(SUM(f.chunk_count), 0), COALESCE(SUM(f.chunk_count), 0)
+FROM collections c
+LEFT JOIN files f ON f.collection = c.name AND f.deleted_at IS NULL
+GROUP BY c.name
+ON CONFLICT (collection) DO NOTHING;
+
 -- Create indexes for better performance
 CREATE INDEX IF NOT EXISTS idx_files_created_at ON files(created_at);
+-- Keyset pagination index for the /files listing (ORDER BY created_at DESC, id DESC),
+-- restricted to live files so tombstones never show up in it
+DROP INDEX IF EXISTS idx_files_created_at_id;
+CREATE INDEX IF NOT EXISTS idx_files_live_created_at_id ON files(created_at DESC, id DESC) WHERE deleted_at IS NULL;
+CREATE INDEX IF NOT EXISTS idx_files_deleted_at ON files(deleted_at) WHERE deleted_at IS NOT NULL;
 CREATE INDEX IF NOT EXISTS idx_document_chunks_file_id ON document_chunks(file_id);
-CREATE INDEX IF NOT EXISTS idx_document_chunks_embedding ON document_chunks USING ivfflat (embedding vector_cosine_ops) WITH (lists = 100);
+-- Chunk ids are unique across partitions (one sequence); the re-embedding job walks them in order
+CREATE INDEX IF NOT EXISTS idx_document_chunks_id ON document_chunks(id);
+CREATE INDEX IF NOT EXISTS idx_files_collection_live ON files(collection, created_at DESC, id DESC) WHERE deleted_at IS NULL;
+-- Duplicate lookup on upload; only live files that own their chunks can be reused
+CREATE INDEX IF NOT EXISTS idx_files_content_hash ON files(content_hash) WHERE deleted_at IS NULL AND alias_of IS NULL;
+CREATE INDEX IF NOT EXISTS idx_files_alias_of ON files(alias_of) WHERE alias_of IS NOT NULL;
+-- The ANN index on document_chunks.embedding (idx_document_chunks_embedding) depends on the
+-- configured storage type and dimension, so setup_database.py creates it after this script
 
 -- Create a function to update the updated_at timestamp
 CREATE OR REPLACE FUNCTION update_updated_at_column()
@@ -45,12 +206,44 @@ END;
 $$ LANGUAGE plpgsql;
 
 -- Create trigger to automatically update updated_at
+DROP TRIGGER IF EXISTS update_files_updated_at ON files;
 CREATE TRIGGER update_files_updated_at 
     BEFORE UPDATE ON files 
     FOR EACH ROW 
     EXECUTE FUNCTION update_updated_at_column();
 
+-- Binary-quantize every stored embedding (1 bit per dimension: positive or not) for the exact
+-- re-rank search mode (BINARY_PREFILTER), which shortlists chunks by Hamming distance over this
+-- copy, 32x smaller than the float32 vector, before ordering them by cosine distance.
+-- There is no index on it: that mode scans every chunk searched (small collections only)
+CREATE OR REPLACE FUNCTION quantize_embedding(embedding REAL[])
+RETURNS BIT VARYING AS $$
+    SELECT string_agg(CASE WHEN x > 0 THEN '1' ELSE '0' END, '' ORDER BY i)::BIT VARYING
+    FROM unnest(embedding) WITH ORDINALITY AS t(x, i)
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION quantize_chunk_embedding()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.embedding_bq = quantize_embedding(NEW.embedding::REAL[]);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS quantize_document_chunks_embedding ON document_chunks;
+CREATE TRIGGER quantize_document_chunks_embedding
+    BEFORE INSERT OR UPDATE OF embedding ON document_chunks
+    FOR EACH ROW
+    EXECUTE FUNCTION quantize_chunk_embedding();
+
+-- Backfill the quantized copy for chunks stored before the trigger existed
+UPDATE document_chunks SET embedding = embedding
+WHERE embedding IS NOT NULL AND embedding_bq IS NULL;
+
 -- Create a view for easy querying of chunks with file information
+-- (content is NULL for chunks stored compressed: their text is in content_zstd instead, zstd
+-- frames possibly made with a dictionary from compression_dictionaries, which
+-- StorageCodec.chunk_text decompresses)
 CREATE OR REPLACE VIEW chunk_with_file_info AS
 SELECT 
     dc.id,
@@ -61,9 +254,11 @@ SELECT
     f.content_type,
     f.file_size,
     f.word_count,
-    dc.created_at
+    dc.created_at,
+    dc.content_zstd
 FROM document_chunks dc
-JOIN files f ON dc.file_id = f.id;
+JOIN files f ON dc.file_id = f.id
+WHERE f.deleted_at IS NULL;
 
 -- Insert some sample data for testing (optional)
 -- INSERT INTO files (filename, content_type, file_size, word_count, metadata) 
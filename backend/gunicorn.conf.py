@@ -0,0 +1,51 @@
+# gunicorn.conf.py
+#
+# Multi-worker deployment that loads the spaCy model once and shares it between workers.
+# The app is imported in the master (preload_app), the model is loaded there, and workers
+# are forked afterwards, so they share the model's memory copy-on-write instead of each
+# loading their own copy. Run from the backend directory:
+#
+#     gunicorn main:app -c gunicorn.conf.py
+import gc
+import glob
+import os
+import tempfile
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+worker_class = "uvicorn_worker.UvicornWorker"
+preload_app = True
+timeout = int(os.getenv("WORKER_TIMEOUT", "120"))
+
+# Every worker rate-limits its OpenAI calls on its own, so each takes its share of the quota
+os.environ.setdefault("OPENAI_RATE_LIMIT_PROCESSES", str(workers))
+
+# Every worker also has its own Prometheus metrics: they write them to files in this
+# directory, which /metrics adds up. It must be set before prometheus_client is imported,
+# and emptied of the files of a previous run.
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "unboxed-prometheus"))
+os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+for path in glob.glob(os.path.join(os.environ["PROMETHEUS_MULTIPROC_DIR"], "*.db")):
+    os.remove(path)
+
+
+def when_ready(server):
+    """Load the shared model in the master before any worker is forked"""
+    import main
+
+    try:
+        main.anonymizer.get()
+    except Exception as e:
+        server.log.error(f"❌ spaCy model preload failed, workers will load it on demand: {e}")
+
+    # Move everything loaded so far out of the collector's reach: otherwise the first
+    # GC pass in each worker writes to these objects' headers and un-shares their pages
+    gc.freeze()
+    server.log.info("✅ Preloaded spaCy model; workers will share it copy-on-write")
+
+
+def child_exit(server, worker):
+    """Drop the live gauges (in-flight requests, queue depth) of a worker that exited"""
+    from prometheus_client import multiprocess
+    
+    multiprocess.mark_process_dead(worker.pid)
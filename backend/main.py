@@ -1,35 +1,195 @@
-from fastapi import FastAPI, File, UploadFile, Form, HTTPException
+import time
+_import_started = time.perf_counter()
+
+from fastapi import FastAPI, File, UploadFile, Form, HTTPException, Query, Request, Header, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from typing import Optional
+from fastapi.responses import StreamingResponse, Response, PlainTextResponse
+from contextlib import asynccontextmanager
+from typing import Optional, List
 
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import json
+import math
 import uvicorn
 
 # Import our organized modules
 
-from models.api_models import HealthResponse, IngestResponse, QuestionRequest, QuestionResponse, StatsResponse, FilesResponse
+from models.api_models import (
+    HealthResponse, IngestResponse, QuestionRequest, QuestionResponse, StatsResponse, FilesResponse,
+    BulkDeleteRequest, BulkDeleteResponse, BatchQuestionRequest, ProfilingSettings, ProfileInfo,
+    ReembedRequest, ReembedStatus, RecompressStatus, ReplaceFileResponse, CollectionInfo
+)
 from config import config
-from constants import MESSAGES, DB_CONSTANTS, FILE_CONSTANTS
+from constants import MESSAGES, DB_CONSTANTS, FILE_CONSTANTS, EMBEDDING_CONSTANTS
 
 # Import services
-from services.db import DatabaseService
-from services.chunk import chunk_text, sanitize_text
-from services.embedding import get_embedding
+from services.db import DatabaseService, EmbeddingVersionMismatch, FileChangedError, file_hash, validate_collection_name
+from services.chunk import chunk_text, sanitize_text, diff_chunks
+from services.embedding import get_embedding, get_embeddings, active_version as active_embedding_version
 from services.file_processor import FileProcessor
-from services.rag import create_rag_prompt, generate_rag_answer
+from services.rag import create_rag_prompt, generate_rag_answer, pack_context
+from services.mmr import mmr_rerank
+from services.metrics import stage_timer, render_metrics, CHUNKS_EMBEDDED, CHUNKS_REUSED, REQUESTS_IN_FLIGHT, STARTUP_SECONDS, COMPONENT_LOAD_SECONDS
+from services.profiling import RequestProfiler
+from prometheus_client import CONTENT_TYPE_LATEST
 from services.spacy_anonymizer import SpacyAnonymizer
+from services.lazy import Lazy
+from services.reembed import ReembeddingJob
+from services.recompress import RecompressionJob
+from services.rate_limit import RateLimitTimeout, embedding_limiter, chat_limiter
+from services.singleflight import SingleFlight
+from services import embedding, rag
 
 
 
 # Initialize services
 file_processor = FileProcessor()
 db_service = DatabaseService()
-anonymizer = SpacyAnonymizer()
+# Concurrent identical questions share one embedding, search and LLM call
+ask_flights = SingleFlight("ask")
+# The spaCy model takes seconds to load, so it is built on first use (or by the warm-up task)
+anonymizer = Lazy(SpacyAnonymizer, "spaCy anonymizer")
+request_profiler = RequestProfiler(
+    enabled=config.PROFILING_ENABLED,
+    sample_rate=config.PROFILING_SAMPLE_RATE,
+    max_stored=config.PROFILING_MAX_STORED,
+    profile_dir=config.PROFILE_DIR
+)
+reembedding_job = ReembeddingJob(db_service)
+reembedding_tasks = set()
+# Ingestion's OpenAI calls can queue in the rate limiter for minutes; they wait in threads of
+# their own, so that they can't take up every thread of the default executor /ask relies on
+bulk_executor = ThreadPoolExecutor(max_workers=config.OPENAI_BULK_THREADS, thread_name_prefix="bulk")
+recompression_job = RecompressionJob(db_service)
+recompression_tasks = set()
+
+async def reconcile_stats_periodically():
+    """Correct drift in the maintained corpus counters at a fixed interval"""
+    while True:
+        try:
+            await asyncio.to_thread(db_service.reconcile_corpus_stats)
+        except Exception as e:
+            print(f"❌ Corpus stats reconcile failed: {e}")
+        await asyncio.sleep(config.STATS_RECONCILE_INTERVAL)
+
+async def purge_deleted_files_periodically():
+    """Remove chunks and rows of files deleted in the background, in bounded batches"""
+    while True:
+        try:
+            await asyncio.to_thread(db_service.purge_deleted_files)
+        except Exception as e:
+            print(f"❌ Purge of deleted files failed: {e}")
+        await asyncio.sleep(config.DELETE_PURGE_INTERVAL)
+
+async def refresh_collection_indexes_periodically():
+    """Rebuild collection ANN indexes that were built on too few chunks"""
+    while True:
+        try:
+            await asyncio.to_thread(db_service.refresh_collection_indexes)
+        except Exception as e:
+            print(f"❌ Collection index refresh failed: {e}")
+        await asyncio.sleep(config.ANN_REINDEX_INTERVAL)
+
+def apply_embedding_version(version: dict):
+    """Embed and search with this embedding version from now on"""
+    embedding.set_active_version(version['version'], version['model'], version['dimensions'])
+    db_service.embedding_type = version['storage']
+
+async def refresh_embedding_version_periodically():
+    """Follow the active embedding version, which a re-embedding job (in any worker) can switch"""
+    while True:
+        try:
+            version = await asyncio.to_thread(db_service.get_active_embedding_version)
+            if version:
+                apply_embedding_version(version)
+        except Exception as e:
+            print(f"❌ Embedding version refresh failed: {e}")
+        await asyncio.sleep(config.EMBEDDING_VERSION_REFRESH)
+
+def start_reembedding(model: str, dimensions: int, storage: str, requests_per_minute: int,
+                      tokens_per_minute: int, batch_size: int) -> asyncio.Task:
+    """Run the re-embedding job in a worker thread and pick up its version once it switches"""
+    async def run():
+        state = await asyncio.to_thread(
+            reembedding_job.run, model, dimensions, storage,
+            requests_per_minute, tokens_per_minute, batch_size
+        )
+        print(f"🔁 Re-embedding finished with status {state['status']}")
+        if state['status'] == "completed":
+            version = await asyncio.to_thread(db_service.get_active_embedding_version)
+            if version:
+                apply_embedding_version(version)
+    task = asyncio.create_task(run())
+    # The event loop only keeps weak references to tasks
+    reembedding_tasks.add(task)
+    task.add_done_callback(reembedding_tasks.discard)
+    return task
+
+async def resume_reembedding():
+    """Resume a re-embedding job that was stopped by a restart"""
+    try:
+        versions = await asyncio.to_thread(db_service.get_embedding_versions)
+    except Exception as e:
+        print(f"❌ Could not check for an unfinished re-embedding job: {e}")
+        return
+    for version in versions:
+        if version['status'] == "building":
+            print(f"🔁 Resuming re-embedding into {version['version']}")
+            await start_reembedding(
+                version['model'], version['dimensions'], version['storage'],
+                config.REEMBED_REQUESTS_PER_MINUTE, config.REEMBED_TOKENS_PER_MINUTE, config.REEMBED_BATCH_SIZE
+            )
+
+# Components loaded on first use, warmed up in the background after startup when enabled
+LAZY_COMPONENTS = {
+    "anonymizer": anonymizer,
+    "embedding_client": embedding.client,
+    "chat_client": rag.client,
+}
+
+async def warm_up_components():
+    """Load lazy components off the event loop so the first requests don't pay for it"""
+    for name, component in LAZY_COMPONENTS.items():
+        try:
+            await asyncio.to_thread(component.get)
+            COMPONENT_LOAD_SECONDS.labels(name).set(component.load_seconds or 0)
+        except Exception as e:
+            print(f"❌ Warm-up of {name} failed: {e}")
+    STARTUP_SECONDS.labels("warm").set(time.perf_counter() - _import_started)
+    print(f"🔥 Warm-up finished {time.perf_counter() - _import_started:.2f}s after import")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start background jobs on startup and cancel them on shutdown"""
+    STARTUP_SECONDS.labels("ready").set(time.perf_counter() - _import_started)
+    print(f"🚀 Ready to serve {time.perf_counter() - _import_started:.2f}s after import")
+    background_tasks = []
+    if config.WARMUP_ON_STARTUP:
+        background_tasks.append(asyncio.create_task(warm_up_components()))
+    if config.STATS_RECONCILE_INTERVAL > 0:
+        background_tasks.append(asyncio.create_task(reconcile_stats_periodically()))
+    if config.DELETE_PURGE_INTERVAL > 0:
+        background_tasks.append(asyncio.create_task(purge_deleted_files_periodically()))
+    if config.ANN_REINDEX_INTERVAL > 0:
+        background_tasks.append(asyncio.create_task(refresh_collection_indexes_periodically()))
+    if config.EMBEDDING_VERSION_REFRESH > 0:
+        background_tasks.append(asyncio.create_task(refresh_embedding_version_periodically()))
+    if config.REEMBED_AUTO_RESUME:
+        background_tasks.append(asyncio.create_task(resume_reembedding()))
+    yield
+    reembedding_job.stop()
+    recompression_job.stop()
+    bulk_executor.shutdown(wait=False, cancel_futures=True)
+    for task in background_tasks:
+        task.cancel()
 
 # Initialize FastAPI app
 app = FastAPI(
     title="Unboxed API",
     description="Unbox your documents. Talk to your knowledge.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -41,6 +201,53 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Endpoints whose in-flight requests are tracked individually; everything else is "other"
+TRACKED_ENDPOINTS = {"/ask", "/ask/batch", "/ingest"}
+
+@app.middleware("http")
+async def track_in_flight(request: Request, call_next):
+    """Keep the in-flight request gauge up to date"""
+    endpoint = request.url.path if request.url.path in TRACKED_ENDPOINTS else "other"
+    gauge = REQUESTS_IN_FLIGHT.labels(endpoint)
+    gauge.inc()
+    try:
+        return await call_next(request)
+    finally:
+        gauge.dec()
+
+# Endpoints that can be profiled on demand
+PROFILED_ENDPOINTS = {"/ask", "/ingest"}
+
+@app.middleware("http")
+async def profile_request(request: Request, call_next):
+    """Wrap a single /ask or /ingest in cProfile when asked to; a no-op otherwise"""
+    if request.url.path not in PROFILED_ENDPOINTS or not request_profiler.should_profile(request.headers):
+        return await call_next(request)
+    
+    started = time.perf_counter()
+    profiler = request_profiler.start()
+    if profiler is None:
+        # Another request in this process is being profiled
+        return await call_next(request)
+    try:
+        response = await call_next(request)
+    finally:
+        profile_id = request_profiler.finish(profiler, request.method, request.url.path, started)
+    response.headers["X-Profile-Id"] = profile_id
+    return response
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Guard admin endpoints with ADMIN_TOKEN when one is configured"""
+    if config.ADMIN_TOKEN and x_admin_token != config.ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+def rate_limited(error: RateLimitTimeout) -> HTTPException:
+    """503 for a call the OpenAI rate limiter couldn't admit in time, with a hint when to retry"""
+    return HTTPException(
+        status_code=503,
+        detail=f"OpenAI rate limit reached, please retry later ({error})",
+        headers={"Retry-After": str(max(1, math.ceil(error.retry_after)))}
+    )
 
 
 # Health check endpoint
@@ -63,88 +270,286 @@ async def root():
         "endpoints": {
             "health": "/health",
             "ask": "/ask",
+            "ask_batch": "/ask/batch",
             "ingest": "/ingest",
-            "stats": "/stats"
+            "stats": "/stats",
+            "metrics": "/metrics"
         }
     }
 
+def ask_flight_key(anonymized_question: str, corpus_version: int, embedding_version: Optional[str],
+                   request: QuestionRequest) -> tuple:
+    """Key shared by /ask requests that would produce the same answer"""
+    return (
+        " ".join(anonymized_question.lower().split()),
+        corpus_version,
+        embedding_version,
+        request.model_dump_json(exclude={"question"})
+    )
+
+def answer_from_chunks(anonymized_question: str, similar_chunks: list, all_mappings: dict,
+                       context_token_budget: Optional[int] = None, pipeline: str = "ask") -> QuestionResponse:
+    """Pack the retrieved chunks, generate the answer and deanonymize it, timing the stages under `pipeline`"""
+    if not similar_chunks:
+        return QuestionResponse(
+            answer=MESSAGES["NO_DOCUMENTS"],
+            sources=[],
+            confidence=0.0
+        )
+    
+    # Fit the most relevant chunks into the context token budget
+    with stage_timer(pipeline, "pack_context"):
+        context_chunks, context_tokens = pack_context(
+            similar_chunks,
+            token_budget=context_token_budget or config.CONTEXT_TOKEN_BUDGET
+        )
+    print(f"📦 Packed {len(context_chunks)}/{len(similar_chunks)} chunks into {context_tokens} context tokens")
+    
+    # Create RAG prompt with anonymized chunks (AI never sees sensitive data)
+    rag_prompt = create_rag_prompt(anonymized_question, context_chunks)
+    with stage_timer(pipeline, "generate_rag_answer"):
+        answer = generate_rag_answer(rag_prompt)
+    
+    # Store the original AI answer for debug purposes
+    anonymized_answer = answer
+    
+    # Deanonymize the answer to show original values to the user
+    if all_mappings:
+        original_answer = answer
+        print(f"🔓 Original AI answer (before deanonymization): '{original_answer}'")
+        with stage_timer(pipeline, "deanonymize_answer"):
+            answer = anonymizer.deanonymize_answer(answer, all_mappings)
+        print(f"🔓 Final answer (after deanonymization): '{answer}'")
+    
+    most_relevant_chunk = similar_chunks[0]
+    
+    return QuestionResponse(
+        answer=answer,
+        sources=[f"{chunk['filename']} (similarity: {chunk['similarity']:.2f})" for chunk in context_chunks],
+        confidence=most_relevant_chunk['similarity'],
+        anonymized_answer=anonymized_answer if all_mappings else None,
+        context_tokens=context_tokens
+    )
+
 # Q&A endpoint
 @app.post("/ask", response_model=QuestionResponse)
 async def ask_question(request: QuestionRequest):
     """Ask a question and get an answer based on ingested documents"""
     try:
         # Get all anonymization mappings from the database
-        all_mappings = db_service.get_all_anonymization_mappings()
+        with stage_timer("ask", "get_all_anonymization_mappings"):
+            all_mappings = await request_profiler.to_thread(db_service.get_all_anonymization_mappings,
+                                                            request.collection)
         
         # Anonymize the question if we have mappings
         original_question = request.question
         anonymized_question = request.question
         if all_mappings:
-            anonymized_question = anonymizer.anonymize_question(request.question, all_mappings)
+            with stage_timer("ask", "anonymize_question"):
+                anonymized_question = anonymizer.anonymize_question(request.question, all_mappings)
             print(f"🔒 Original question: '{original_question}'")
             print(f"🔒 Anonymized question: '{anonymized_question}'")
         
-        # Get embedding for the anonymized question
-        question_embedding = get_embedding(anonymized_question)
-        if not question_embedding:
-            raise HTTPException(status_code=500, detail=MESSAGES["EMBEDDING_ERROR"])
+        async def search_chunks(question_embedding: list, embedding_version: Optional[str]) -> list:
+            """Search for the chunks to answer from, with embeddings of embedding_version"""
+            print(f"🔍 Searching for chunks with embedding length: {len(question_embedding)}")
+            context_limit = request.context_limit or DB_CONSTANTS["DEFAULT_LIMIT"]
+            if request.mmr:
+                # Over-fetch candidates with their embeddings, then keep a diverse top-k
+                fetch_k = max(request.mmr_fetch_k or config.MMR_FETCH_MULTIPLIER * context_limit, context_limit)
+                with stage_timer("ask", "search_similar_chunks"):
+                    candidates = await request_profiler.to_thread(
+                        db_service.search_similar_chunks,
+                        question_embedding, limit=fetch_k, with_embeddings=True,
+                        binary_prefilter=request.binary_prefilter, oversampling=request.oversampling,
+                        collection=request.collection, embedding_version=embedding_version
+                    )
+                with stage_timer("ask", "mmr_rerank"):
+                    similar_chunks = await request_profiler.to_thread(
+                        mmr_rerank, question_embedding, candidates, context_limit, request.mmr_lambda
+                    )
+                print(f"🔀 MMR kept {len(similar_chunks)} of {len(candidates)} candidates (lambda={request.mmr_lambda})")
+                return similar_chunks
+            with stage_timer("ask", "search_similar_chunks"):
+                return await request_profiler.to_thread(
+                    db_service.search_similar_chunks,
+                    question_embedding, limit=context_limit,
+                    binary_prefilter=request.binary_prefilter, oversampling=request.oversampling,
+                    collection=request.collection, embedding_version=embedding_version
+                )
         
-        # Search for similar chunks
-        print(f"🔍 Searching for chunks with embedding length: {len(question_embedding)}")
-        similar_chunks = db_service.search_similar_chunks(
-            question_embedding, 
-            limit=request.context_limit or DB_CONSTANTS["DEFAULT_LIMIT"]
-        )
+        async def run_pipeline() -> QuestionResponse:
+            for attempt in range(2):
+                # Search checks the stored embeddings are still of the version the question is embedded with
+                embedding_version = active_embedding_version["version"]
+                # Get embedding for the anonymized question
+                # Off the event loop, since the call may queue in the rate limiter
+                with stage_timer("ask", "get_embedding"):
+                    question_embedding = await request_profiler.to_thread(get_embedding, anonymized_question)
+                if not question_embedding:
+                    raise HTTPException(status_code=500, detail=MESSAGES["EMBEDDING_ERROR"])
+                try:
+                    similar_chunks = await search_chunks(question_embedding, embedding_version)
+                    break
+                except EmbeddingVersionMismatch as e:
+                    if attempt:
+                        raise HTTPException(status_code=503, detail="The embedding model changed during the question, please retry")
+                    # A re-embedding job switched models (in another worker): embed the question again
+                    print(f"🔁 Embedding version changed to {e.active['version']}, re-embedding the question")
+                    apply_embedding_version(e.active)
         
-        print(f"Found {len(similar_chunks)} similar chunks")
-        if similar_chunks:
-            print(f"First chunk similarity: {similar_chunks[0]['similarity']}")
-            print(f"First chunk content preview: {similar_chunks[0]['content'][:100]}")
-        else:
-            print("❌ No similar chunks found - this might indicate an issue with the search")
+            print(f"Found {len(similar_chunks)} similar chunks")
+            if similar_chunks:
+                print(f"First chunk similarity: {similar_chunks[0]['similarity']}")
+                print(f"First chunk content preview: {similar_chunks[0]['content'][:100]}")
+            else:
+                print("❌ No similar chunks found - this might indicate an issue with the search")
 
-        if not similar_chunks:
-            return QuestionResponse(
-                answer=MESSAGES["NO_DOCUMENTS"],
-                sources=[],
-                confidence=0.0
+            return await request_profiler.to_thread(
+                answer_from_chunks, anonymized_question, similar_chunks, all_mappings, request.context_token_budget
             )
         
-        # Create RAG prompt with anonymized chunks (AI never sees sensitive data)
-        rag_prompt = create_rag_prompt(anonymized_question, similar_chunks)
-        answer = generate_rag_answer(rag_prompt)
+        if not config.ASK_COALESCING:
+            return await run_pipeline()
         
-        # Store the original AI answer for debug purposes
-        anonymized_answer = answer
+        # Requests that would produce the same answer join the one already in flight
+        corpus_version = await request_profiler.to_thread(db_service.get_corpus_version)
+        flight_key = ask_flight_key(anonymized_question, corpus_version, active_embedding_version["version"], request)
+        response, shared = await ask_flights.do(flight_key, run_pipeline)
+        if shared:
+            print("🤝 Joined an identical question already in flight")
+        return response
         
-        # Deanonymize the answer to show original values to the user
-        if all_mappings:
-            original_answer = answer
-            print(f"🔓 Original AI answer (before deanonymization): '{original_answer}'")
-            answer = anonymizer.deanonymize_answer(answer, all_mappings)
-            print(f"🔓 Final answer (after deanonymization): '{answer}'")
+    except HTTPException:
+        raise
+    except RateLimitTimeout as e:
+        raise rate_limited(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error processing question: {str(e)}")
+
+# Batch Q&A endpoint
+@app.post("/ask/batch")
+async def ask_questions_batch(request: BatchQuestionRequest):
+    """
+    Answer many questions in one request. All questions share one mapping snapshot,
+    one embedding call and one search round-trip; answers are generated with bounded
+    concurrency and streamed back as NDJSON lines in completion order.
+    """
+    try:
+        if not request.questions:
+            raise HTTPException(status_code=400, detail="No questions provided")
         
-        most_relevant_chunk = similar_chunks[0]
+        # Database calls and anonymization block, so they run off the event loop
+        with stage_timer("ask_batch", "get_all_anonymization_mappings"):
+            all_mappings = await request_profiler.to_thread(db_service.get_all_anonymization_mappings,
+                                                            request.collection)
         
-        return QuestionResponse(
-            answer=answer,
-            sources=[f"{chunk['filename']} (similarity: {chunk['similarity']:.2f})" for chunk in similar_chunks],
-            confidence=most_relevant_chunk['similarity'],
-            anonymized_answer=anonymized_answer if all_mappings else None
-        )
+        def anonymize_questions() -> List[str]:
+            return [
+                anonymizer.anonymize_question(question, all_mappings) if all_mappings else question
+                for question in request.questions
+            ]
+        
+        with stage_timer("ask_batch", "anonymize_question"):
+            anonymized_questions = await request_profiler.to_thread(anonymize_questions)
         
+        context_limit = request.context_limit or DB_CONSTANTS["DEFAULT_LIMIT"]
+        for attempt in range(2):
+            embedding_version = active_embedding_version["version"]
+            with stage_timer("ask_batch", "get_embeddings"):
+                question_embeddings = await request_profiler.to_thread(get_embeddings, anonymized_questions)
+            if len(question_embeddings) != len(anonymized_questions):
+                raise HTTPException(status_code=500, detail=MESSAGES["EMBEDDING_ERROR"])
+            try:
+                with stage_timer("ask_batch", "search_similar_chunks"):
+                    chunks_per_question = await request_profiler.to_thread(
+                        db_service.search_similar_chunks_batch,
+                        question_embeddings, limit=context_limit, collection=request.collection,
+                        embedding_version=embedding_version
+                    )
+                break
+            except EmbeddingVersionMismatch as e:
+                if attempt:
+                    raise HTTPException(status_code=503, detail="The embedding model changed during the questions, please retry")
+                print(f"🔁 Embedding version changed to {e.active['version']}, re-embedding the questions")
+                apply_embedding_version(e.active)
+        print(f"🔍 Batch search returned chunks for {len(chunks_per_question)} questions")
+    except HTTPException:
+        raise
+    except RateLimitTimeout as e:
+        raise rate_limited(e)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error processing question: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error processing questions: {str(e)}")
+    
+    semaphore = asyncio.Semaphore(config.BATCH_ASK_CONCURRENCY)
+    
+    async def answer_one(index: int) -> dict:
+        async with semaphore:
+            try:
+                response = await asyncio.to_thread(
+                    answer_from_chunks,
+                    anonymized_questions[index],
+                    chunks_per_question[index],
+                    all_mappings,
+                    request.context_token_budget,
+                    "ask_batch"
+                )
+                return {"index": index, "question": request.questions[index], **response.model_dump()}
+            except Exception as e:
+                return {"index": index, "question": request.questions[index], "error": str(e)}
+    
+    async def stream_answers():
+        for finished in asyncio.as_completed([answer_one(i) for i in range(len(request.questions))]):
+            yield json.dumps(await finished) + "\n"
+    
+    return StreamingResponse(stream_answers(), media_type="application/x-ndjson")
+
+DUPLICATE_UPLOAD_MODES = ("reuse", "alias", "ingest")
+
+def ingest_duplicate(existing: dict, filename: str, metadata: Optional[str], anonymize: bool,
+                     on_duplicate: str, collection: str) -> IngestResponse:
+    """Answer an upload of an already ingested file without processing it again"""
+    file_id = existing['id']
+    if on_duplicate == "alias":
+        file_id = db_service.insert_file_alias(existing['id'], filename, metadata)
+        if file_id is None:
+            raise HTTPException(status_code=409, detail="The matching file was deleted meanwhile, please retry")
+    print(f"♻️ {filename} is identical to file ID {existing['id']} ({on_duplicate})")
+    anonymization_summary = None
+    if anonymize and existing['anonymization_mapping']:
+        anonymization_summary = SpacyAnonymizer.get_mapping_summary(existing['anonymization_mapping'])
+    return IngestResponse(
+        message=MESSAGES["DUPLICATE_UPLOAD"],
+        filename=filename if on_duplicate == "alias" else existing['filename'],
+        file_size=existing['file_size'],
+        file_type=existing['content_type'],
+        status="duplicate",
+        chunks_processed=0,
+        word_count=existing['word_count'],
+        anonymized=anonymize,
+        anonymization_summary=anonymization_summary,
+        file_id=file_id,
+        duplicate_of=existing['id'],
+        collection=collection
+    )
 
 # Document ingestion endpoint
 @app.post("/ingest", response_model=IngestResponse)
 async def ingest_document(
     file: UploadFile = File(..., description="Document file to ingest"),
     metadata: Optional[str] = Form(None, description="Optional metadata as JSON string"),
-    anonymize: bool = Form(False, description="Whether to anonymize sensitive data")
+    anonymize: bool = Form(False, description="Whether to anonymize sensitive data"),
+    on_duplicate: Optional[str] = Form(None, description="For an identical upload: reuse, alias or ingest (default: DUPLICATE_UPLOADS)"),
+    collection: str = Form(DB_CONSTANTS["DEFAULT_COLLECTION"], description="Collection to add the document to (created if new)")
 ):
     """Ingest a document for RAG processing"""
+    file_id = None
     try:
+        try:
+            validate_collection_name(collection)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
         # Validate file type
         allowed_types = config.ALLOWED_FILE_TYPES
         
@@ -157,12 +562,23 @@ async def ingest_document(
         # Read file content
         file_content = await file.read()
         
+        # A byte-identical upload costs one hash and one index lookup instead of a full ingest
+        on_duplicate = (on_duplicate or config.DUPLICATE_UPLOADS).lower()
+        if on_duplicate not in DUPLICATE_UPLOAD_MODES:
+            raise HTTPException(status_code=400, detail=f"on_duplicate must be one of {', '.join(DUPLICATE_UPLOAD_MODES)}")
+        if on_duplicate != "ingest":
+            with stage_timer("ingest", "find_duplicate"):
+                existing = db_service.find_file_by_hash(file_hash(file_content), anonymize, collection)
+            if existing:
+                return ingest_duplicate(existing, file.filename, metadata, anonymize, on_duplicate, collection)
+        
         # Process the file to extract text
-        processed_file = file_processor.process_file(
-            file_content, 
-            file.content_type, 
-            file.filename
-        )
+        with stage_timer("ingest", "process_file"):
+            processed_file = file_processor.process_file(
+                file_content, 
+                file.content_type, 
+                file.filename
+            )
         
         if processed_file['status'] == 'error':
             raise HTTPException(
@@ -180,9 +596,13 @@ async def ingest_document(
             print(f"🔒 Original text length: {len(processed_file['text'])} characters")
             print(f"🔒 Original text preview: {processed_file['text'][:200]}...")
             
-            anonymizer.clear_mappings()  # Clear previous mappings
-            extracted_text, anonymization_mapping = anonymizer.anonymize_text(processed_file['text'])
-            anonymization_summary = anonymizer.get_mapping_summary()
+            # NER is CPU-bound; run it off the event loop. The anonymizer keeps no per-call
+            # state, so concurrent ingests each get their own mapping and summary.
+            with stage_timer("ingest", "anonymize_text"):
+                extracted_text, anonymization_mapping = await request_profiler.to_thread(
+                    anonymizer.anonymize_text, processed_file['text']
+                )
+            anonymization_summary = SpacyAnonymizer.get_mapping_summary(anonymization_mapping)
             
             print(f"🔒 Anonymized {len(anonymization_mapping)} sensitive data points")
             print(f"📊 Anonymization summary: {anonymization_summary}")
@@ -199,19 +619,24 @@ async def ingest_document(
             print(f"📄 No anonymization requested for file: {processed_file['filename']}")
         
         # Insert file metadata and original file content into database
-        file_id = db_service.insert_file_metadata(
-            filename=processed_file['filename'],
-            content_type=processed_file['content_type'],
-            file_size=processed_file['file_size'],
-            word_count=processed_file['word_count'],
-            original_file_bytes=file_content,  # Store the original file
-            anonymized=anonymize,
-            anonymization_mapping=anonymization_mapping if anonymization_mapping else None,
-            metadata=metadata
-        )
+        with stage_timer("ingest", "insert_file_metadata"):
+            file_id = db_service.insert_file_metadata(
+                filename=processed_file['filename'],
+                content_type=processed_file['content_type'],
+                file_size=processed_file['file_size'],
+                word_count=processed_file['word_count'],
+                original_file_bytes=file_content,  # Store the original file
+                anonymized=anonymize,
+                anonymization_mapping=anonymization_mapping if anonymization_mapping else None,
+                metadata=metadata,
+                collection=collection
+            )
         
         # Chunk the extracted text (anonymized if requested)
-        text_chunks = chunk_text(extracted_text, FILE_CONSTANTS["DEFAULT_CHUNK_SIZE"])
+        with stage_timer("ingest", "chunk_text"):
+            text_chunks = chunk_text(extracted_text, FILE_CONSTANTS["DEFAULT_CHUNK_SIZE"],
+                                     content_defined=config.CONTENT_DEFINED_CHUNKING,
+                                     paragraphs=processed_file['paragraphs'])
 
         # DEBUG: Add these print statements
         print(f"Original text length: {len(processed_file['text'])}")
@@ -223,15 +648,19 @@ async def ingest_document(
 
         # Process chunks and create embeddings
         processed_chunks = []
+        embedding_version = active_embedding_version["version"]
         print(f"Starting to process {len(text_chunks)} chunks...")
 
         for i, chunk in enumerate(text_chunks):
             print(f"Processing chunk {i+1}/{len(text_chunks)}")
             if chunk.strip():  # Skip empty chunks
                 print(f"  Chunk {i+1} has content, generating embedding...")
-                embedding = get_embedding(chunk)
+                # Bulk priority: queued behind /ask calls when the OpenAI quota is tight
+                with stage_timer("ingest", "get_embedding"):
+                    embedding = await request_profiler.to_thread(get_embedding, chunk, "bulk", executor=bulk_executor)
                 if embedding:
                     print(f"  Chunk {i+1} embedding generated successfully")
+                    CHUNKS_EMBEDDED.inc()
                     sanatized_content = sanitize_text(chunk)
                     processed_chunks.append({
                         'content': sanatized_content,
@@ -246,7 +675,22 @@ async def ingest_document(
         print(f"Total processed chunks: {len(processed_chunks)}")
 
         # Insert chunks into database
-        chunks_inserted = db_service.insert_document_chunks(file_id, processed_chunks)
+        with stage_timer("ingest", "insert_document_chunks"):
+            try:
+                chunks_inserted = db_service.insert_document_chunks(file_id, processed_chunks, embedding_version)
+            except EmbeddingVersionMismatch as e:
+                # A re-embedding job switched models while this file was embedded: redo it with the new one
+                print(f"🔁 Embedding version changed to {e.active['version']} during ingest, re-embedding")
+                apply_embedding_version(e.active)
+                embeddings = await request_profiler.to_thread(
+                    get_embeddings, [text_chunks[chunk['index']] for chunk in processed_chunks], priority="bulk",
+                    executor=bulk_executor
+                )
+                if len(embeddings) != len(processed_chunks):
+                    raise HTTPException(status_code=500, detail=MESSAGES["EMBEDDING_ERROR"])
+                for chunk, chunk_embedding in zip(processed_chunks, embeddings):
+                    chunk['embedding'] = chunk_embedding
+                chunks_inserted = db_service.insert_document_chunks(file_id, processed_chunks, e.active['version'])
         
         return IngestResponse(
             message=MESSAGES["UPLOAD_SUCCESS"],
@@ -257,18 +701,25 @@ async def ingest_document(
             chunks_processed=chunks_inserted,
             word_count=processed_file['word_count'],
             anonymized=anonymize,
-            anonymization_summary=anonymization_summary
+            anonymization_summary=anonymization_summary,
+            file_id=file_id,
+            collection=collection
         )
         
     except HTTPException:
         raise
+    except RateLimitTimeout as e:
+        # Don't keep a file with only some of its chunks; the client uploads it again later
+        if file_id:
+            db_service.delete_file(file_id)
+        raise rate_limited(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error ingesting document: {str(e)}")
 
 # Stats endpoint
 @app.get("/stats", response_model=StatsResponse)
 async def get_stats():
-    """Get database statistics"""
+    """Get corpus statistics from the maintained counters"""
     try:
         stats = db_service.get_file_stats()
         return StatsResponse(**stats)
@@ -276,15 +727,51 @@ async def get_stats():
         raise HTTPException(status_code=500, detail=f"Error getting stats: {str(e)}")
 
 # Files endpoint
-@app.get("/files", response_model=FilesResponse)
-async def get_files():
-    """Get all uploaded files"""
+@app.get("/files", response_model=FilesResponse, response_model_exclude_unset=True)
+async def get_files(
+    limit: int = Query(DB_CONSTANTS["FILES_PAGE_SIZE"], ge=1, le=DB_CONSTANTS["FILES_PAGE_SIZE_MAX"], description="Page size"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    fields: Optional[str] = Query(None, description="Comma-separated list of fields to return"),
+    collection: Optional[str] = Query(None, pattern=DB_CONSTANTS["COLLECTION_NAME_PATTERN"], description="Only list this collection's files")
+):
+    """Get uploaded files, newest first, one page at a time"""
     try:
-        files = db_service.get_all_files()
-        return FilesResponse(files=files)
+        field_list = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+        try:
+            page = db_service.get_files_page(limit=limit, cursor=cursor, fields=field_list, collection=collection)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return FilesResponse(**page)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting files: {str(e)}")
 
+# Collections endpoints
+@app.get("/collections", response_model=List[CollectionInfo])
+async def get_collections():
+    """List collections with their file and chunk counts"""
+    try:
+        return [CollectionInfo(**collection) for collection in db_service.list_collections()]
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error getting collections: {str(e)}")
+
+@app.delete("/collections/{name}", dependencies=[Depends(require_admin)])
+async def delete_collection(name: str):
+    """Delete a collection with all its files; its chunk partition is dropped as a whole"""
+    try:
+        try:
+            files_deleted = await asyncio.to_thread(db_service.drop_collection, name)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if files_deleted is None:
+            raise HTTPException(status_code=404, detail="Collection not found")
+        return {"message": f"Collection {name} deleted", "files_deleted": files_deleted}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error deleting collection: {str(e)}")
+
 # Document content endpoint
 @app.get("/files/{file_id}/content")
 async def get_file_content(file_id: int):
@@ -301,11 +788,14 @@ async def get_file_content(file_id: int):
 
 # Delete file endpoint
 @app.delete("/files/{file_id}")
-async def delete_file(file_id: int):
+async def delete_file(
+    file_id: int,
+    background: bool = Query(False, description="Hide the file now and remove its chunks in the background")
+):
     """Delete a file and all its associated data"""
     try:
         # Delete the file and all its chunks
-        deleted = db_service.delete_file(file_id)
+        deleted = db_service.delete_file(file_id, background=background)
         if not deleted:
             raise HTTPException(status_code=404, detail="File not found")
         
@@ -315,6 +805,153 @@ async def delete_file(file_id: int):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error deleting file: {str(e)}")
 
+def embed_new_chunks(chunks: List[tuple]) -> List[dict]:
+    """Embed (index, content) pairs in batches with the active embedding version"""
+    embedded = []
+    batch_size = FILE_CONSTANTS["EMBEDDING_BATCH_SIZE"]
+    for start in range(0, len(chunks), batch_size):
+        batch = chunks[start:start + batch_size]
+        embeddings = get_embeddings([content for _, content in batch], priority="bulk")
+        if len(embeddings) != len(batch):
+            raise HTTPException(status_code=500, detail=MESSAGES["EMBEDDING_ERROR"])
+        CHUNKS_EMBEDDED.inc(len(batch))
+        embedded.extend({'content': content, 'embedding': chunk_embedding, 'index': index}
+                        for (index, content), chunk_embedding in zip(batch, embeddings))
+    return embedded
+
+# Replace file endpoint
+@app.put("/files/{file_id}", response_model=ReplaceFileResponse)
+async def replace_file(
+    file_id: int,
+    file: UploadFile = File(..., description="New version of the document"),
+    metadata: Optional[str] = Form(None, description="Optional metadata as JSON string (default: keep)"),
+    anonymize: Optional[bool] = Form(None, description="Whether to anonymize sensitive data (default: as before)")
+):
+    """
+    Replace a file with a new version. The new text is re-chunked and diffed against the
+    stored chunks by content hash: only new or changed chunks are embedded, and the changes
+    are applied in one transaction.
+    """
+    try:
+        if file.content_type not in config.ALLOWED_FILE_TYPES:
+            raise HTTPException(
+                status_code=400,
+                detail=MESSAGES["FILE_TYPE_NOT_SUPPORTED"].format(file_type=file.content_type, allowed_types=config.ALLOWED_FILE_TYPES)
+            )
+        
+        file_info = db_service.get_file_info(file_id)
+        if not file_info:
+            raise HTTPException(status_code=404, detail="File not found")
+        if anonymize is None:
+            anonymize = bool(file_info['anonymized'])
+        
+        file_content = await file.read()
+        with stage_timer("replace", "process_file"):
+            processed_file = file_processor.process_file(file_content, file.content_type, file.filename)
+        if processed_file['status'] == 'error':
+            raise HTTPException(
+                status_code=400,
+                detail=MESSAGES["PROCESSING_ERROR"].format(error=processed_file.get('error', 'Unknown error'))
+            )
+        
+        extracted_text = processed_file['text']
+        anonymization_mapping = None
+        anonymization_summary = None
+        if anonymize:
+            # Aliases are derived from the original values, so unchanged text anonymizes the same way
+            with stage_timer("replace", "anonymize_text"):
+                extracted_text, anonymization_mapping = await asyncio.to_thread(
+                    anonymizer.anonymize_text, extracted_text
+                )
+            anonymization_summary = SpacyAnonymizer.get_mapping_summary(anonymization_mapping)
+        
+        with stage_timer("replace", "chunk_text"):
+            text_chunks = chunk_text(extracted_text, FILE_CONSTANTS["DEFAULT_CHUNK_SIZE"],
+                                     content_defined=config.CONTENT_DEFINED_CHUNKING,
+                                     paragraphs=processed_file['paragraphs'])
+        new_chunks = [(i, sanitize_text(chunk)) for i, chunk in enumerate(text_chunks) if chunk.strip()]
+        
+        last_error = None
+        for attempt in range(2):
+            stored = db_service.get_file_chunk_hashes(file_id)
+            if stored is None:
+                raise HTTPException(status_code=404, detail="File not found")
+            unchanged, added, removed = diff_chunks(stored['chunks'], new_chunks)
+            
+            embedding_version = active_embedding_version["version"]
+            with stage_timer("replace", "get_embeddings"):
+                embedded = await request_profiler.to_thread(embed_new_chunks, added, executor=bulk_executor)
+            
+            try:
+                with stage_timer("replace", "replace_file_chunks"):
+                    chunk_count = db_service.replace_file_chunks(
+                        file_id, stored['updated_at'],
+                        filename=processed_file['filename'],
+                        content_type=processed_file['content_type'],
+                        file_size=processed_file['file_size'],
+                        word_count=processed_file['word_count'],
+                        original_file_bytes=file_content,
+                        anonymized=anonymize,
+                        anonymization_mapping=anonymization_mapping,
+                        metadata=metadata,
+                        unchanged=unchanged,
+                        new_chunks=embedded,
+                        removed_ids=removed,
+                        embedding_version=embedding_version
+                    )
+                break
+            except EmbeddingVersionMismatch as e:
+                # The stored chunks were re-embedded with the new version; redo ours with it too
+                apply_embedding_version(e.active)
+                last_error = e
+            except FileChangedError as e:
+                # Someone else changed the file meanwhile: diff against what they stored
+                last_error = e
+        else:
+            if isinstance(last_error, EmbeddingVersionMismatch):
+                raise HTTPException(status_code=503, detail="The embedding model changed during the replace, please retry")
+            raise HTTPException(status_code=409, detail="File was modified concurrently, please retry")
+        
+        if chunk_count is None:
+            raise HTTPException(status_code=404, detail="File not found")
+        CHUNKS_REUSED.inc(len(unchanged))
+        
+        return ReplaceFileResponse(
+            message=MESSAGES["UPLOAD_SUCCESS"],
+            file_id=file_id,
+            filename=processed_file['filename'],
+            file_size=processed_file['file_size'],
+            file_type=processed_file['content_type'],
+            word_count=processed_file['word_count'],
+            chunks_total=chunk_count,
+            chunks_unchanged=len(unchanged),
+            chunks_added=len(embedded),
+            chunks_removed=len(removed),
+            anonymized=anonymize,
+            anonymization_summary=anonymization_summary
+        )
+        
+    except HTTPException:
+        raise
+    except RateLimitTimeout as e:
+        raise rate_limited(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error replacing file: {str(e)}")
+
+# Bulk delete endpoint
+@app.post("/files/delete", response_model=BulkDeleteResponse)
+async def delete_files(request: BulkDeleteRequest):
+    """Delete many files and all their associated data in one transaction"""
+    try:
+        deleted_ids = db_service.delete_files(request.file_ids, background=request.background)
+        deleted = set(deleted_ids)
+        return BulkDeleteResponse(
+            deleted=deleted_ids,
+            not_found=[file_id for file_id in request.file_ids if file_id not in deleted]
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error deleting files: {str(e)}")
+
 # Original file endpoint
 @app.get("/files/{file_id}/download")
 async def download_file(file_id: int):
@@ -337,7 +974,6 @@ async def download_file(file_id: int):
         
         print(f"✅ File bytes retrieved: {len(original_file_bytes)} bytes")
         
-        from fastapi.responses import Response
         return Response(
             content=original_file_bytes,
             media_type=file_info['content_type'],
@@ -352,6 +988,149 @@ async def download_file(file_id: int):
         print(f"❌ Error downloading file {file_id}: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error downloading file: {str(e)}")
 
+# Metrics endpoint
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: per-stage latency histograms, counters and in-flight gauges (of all workers)"""
+    return Response(content=render_metrics(), media_type=CONTENT_TYPE_LATEST)
+
+# Profiling admin endpoints
+@app.get("/admin/profiling", response_model=ProfilingSettings, dependencies=[Depends(require_admin)])
+async def get_profiling_settings():
+    """Get the current profiling settings"""
+    return ProfilingSettings(enabled=request_profiler.enabled, sample_rate=request_profiler.sample_rate)
+
+@app.post("/admin/profiling", response_model=ProfilingSettings, dependencies=[Depends(require_admin)])
+async def update_profiling_settings(settings: ProfilingSettings):
+    """Turn profiling on or off and set the sampling rate at runtime"""
+    request_profiler.enabled = settings.enabled
+    request_profiler.sample_rate = settings.sample_rate
+    print(f"🔬 Profiling {'enabled' if settings.enabled else 'disabled'} (sample rate {settings.sample_rate})")
+    return settings
+
+@app.get("/admin/profiles", response_model=List[ProfileInfo], dependencies=[Depends(require_admin)])
+async def list_profiles():
+    """List stored request profiles, newest first"""
+    return request_profiler.list_profiles()
+
+@app.get("/admin/profiles/{profile_id}", dependencies=[Depends(require_admin)])
+async def get_profile(profile_id: str, format: str = Query("text", pattern="^(text|pstats)$")):
+    """Get a stored profile as a text summary or as a .pstats file"""
+    profile = request_profiler.get_profile(profile_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "pstats":
+        return Response(
+            content=profile['pstats'],
+            media_type="application/octet-stream",
+            headers={"Content-Disposition": f"attachment; filename={profile_id}.pstats"}
+        )
+    return PlainTextResponse(profile['summary'])
+
+@app.get("/admin/ner-cache", dependencies=[Depends(require_admin)])
+async def get_ner_cache_stats():
+    """Size and hit rate of the anonymizer's NER cache in this worker"""
+    if not anonymizer.loaded:
+        return {"loaded": False}
+    return {"loaded": True, **anonymizer.ner_cache.stats()}
+
+@app.get("/admin/rate-limits", dependencies=[Depends(require_admin)])
+async def get_rate_limits():
+    """Queue depth per priority and remaining budget of the OpenAI rate limiters"""
+    return {limiter.name: limiter.stats() for limiter in (embedding_limiter, chat_limiter)}
+
+@app.get("/admin/llm", dependencies=[Depends(require_admin)])
+async def get_llm_stats():
+    """Chat model, deadline and hedging settings, with the recent latency percentiles they use"""
+    return rag.llm.stats()
+
+@app.get("/admin/compression", dependencies=[Depends(require_admin)])
+async def get_compression_stats():
+    """How much stored chunk text and original file data is compressed, and the space it takes"""
+    return await asyncio.to_thread(db_service.get_compression_stats)
+
+@app.post("/admin/compression/dictionary", dependencies=[Depends(require_admin)])
+async def train_compression_dictionary(
+    samples: int = Query(DB_CONSTANTS["COMPRESSION_TRAINING_SAMPLES"], ge=1, description="Chunks to train on"),
+    size: Optional[int] = Query(None, ge=1024, description="Dictionary size in bytes (default: COMPRESSION_DICTIONARY_SIZE)")
+):
+    """
+    Train a zstd dictionary on the stored chunks. New chunks are compressed with it (by
+    other workers within a minute); existing ones once recompressed with rewrite=true.
+    """
+    try:
+        return await asyncio.to_thread(db_service.train_compression_dictionary, samples, size)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/admin/compression/recompress", response_model=RecompressStatus, dependencies=[Depends(require_admin)])
+async def start_recompress(
+    rewrite: bool = Query(False, description="Also recompress chunks compressed with an older dictionary")
+):
+    """
+    Start compressing the chunks and files stored uncompressed in the background; safe to
+    stop and start again, it picks up what is still uncompressed.
+    """
+    if not db_service.codec.enabled:
+        raise HTTPException(status_code=400, detail="Stored data is only compressed with STORAGE_COMPRESSION=zstd")
+    if recompression_job.running:
+        raise HTTPException(status_code=409, detail="A recompression job is already running")
+    task = asyncio.create_task(asyncio.to_thread(recompression_job.run, rewrite))
+    # The event loop only keeps weak references to tasks
+    recompression_tasks.add(task)
+    task.add_done_callback(recompression_tasks.discard)
+    # Let the job take its lock before reporting on it
+    await asyncio.sleep(0.2)
+    return await get_recompress_status()
+
+@app.get("/admin/compression/recompress", response_model=RecompressStatus, dependencies=[Depends(require_admin)])
+async def get_recompress_status():
+    """Progress of the recompression job in this worker, and how much is compressed so far"""
+    compression = await asyncio.to_thread(db_service.get_compression_stats)
+    return RecompressStatus(job=recompression_job.state, compression=compression)
+
+@app.delete("/admin/compression/recompress", response_model=RecompressStatus, dependencies=[Depends(require_admin)])
+async def stop_recompress():
+    """Stop the recompression job after its current batch"""
+    recompression_job.stop()
+    return await get_recompress_status()
+
+@app.post("/admin/reembed", response_model=ReembedStatus, dependencies=[Depends(require_admin)])
+async def start_reembed(request: ReembedRequest):
+    """
+    Start (or resume) re-embedding every chunk with another model. Search keeps using the
+    current embeddings until all chunks are done, then switches over in one transaction.
+    """
+    if reembedding_job.running:
+        raise HTTPException(status_code=409, detail="A re-embedding job is already running")
+    start_reembedding(
+        request.model,
+        request.dimensions or EMBEDDING_CONSTANTS["MODEL_DIMENSIONS"].get(request.model, config.EMBEDDING_DIMENSIONS),
+        request.storage or config.EMBEDDING_STORAGE,
+        request.requests_per_minute if request.requests_per_minute is not None else config.REEMBED_REQUESTS_PER_MINUTE,
+        request.tokens_per_minute if request.tokens_per_minute is not None else config.REEMBED_TOKENS_PER_MINUTE,
+        request.batch_size or config.REEMBED_BATCH_SIZE
+    )
+    # Let the job take its lock and register the version before reporting on it
+    await asyncio.sleep(0.2)
+    return await get_reembed_status()
+
+@app.get("/admin/reembed", response_model=ReembedStatus, dependencies=[Depends(require_admin)])
+async def get_reembed_status():
+    """Progress of the re-embedding job in this worker and all recorded embedding versions"""
+    versions = await asyncio.to_thread(db_service.get_embedding_versions)
+    return ReembedStatus(job=reembedding_job.state, versions=versions)
+
+@app.delete("/admin/reembed", response_model=ReembedStatus, dependencies=[Depends(require_admin)])
+async def stop_reembed(cancel: bool = Query(False, description="Also discard the embeddings made so far")):
+    """Pause the re-embedding job (it resumes on the next start), or cancel it for good"""
+    reembedding_job.stop()
+    if cancel:
+        for version in await asyncio.to_thread(db_service.get_embedding_versions):
+            if version['status'] == "building":
+                await asyncio.to_thread(db_service.cancel_embedding_version, version['version'])
+    return await get_reembed_status()
+
 # API documentation endpoint
 @app.get("/docs")
 async def get_docs():
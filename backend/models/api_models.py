@@ -1,15 +1,33 @@
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from config import config
+from constants import DB_CONSTANTS
 
 class QuestionRequest(BaseModel):
     question: str
     context_limit: int = 5
+    context_token_budget: Optional[int] = None  # Defaults to CONTEXT_TOKEN_BUDGET
+    mmr: bool = False  # Re-rank candidates for diversity (maximal marginal relevance)
+    mmr_lambda: float = Field(0.5, ge=0.0, le=1.0)  # 1.0 = pure relevance, 0.0 = pure diversity
+    mmr_fetch_k: Optional[int] = None  # Candidates to over-fetch, defaults to MMR_FETCH_MULTIPLIER * context_limit
+    binary_prefilter: Optional[bool] = None  # Exact re-rank over a full scan instead of the ANN index, defaults to BINARY_PREFILTER
+    oversampling: Optional[int] = Field(None, ge=1)  # Shortlisted chunks per returned chunk, defaults to BINARY_PREFILTER_OVERSAMPLING
+    collection: Optional[str] = Field(None, pattern=DB_CONSTANTS["COLLECTION_NAME_PATTERN"])  # Defaults to all collections
+
+class BatchQuestionRequest(BaseModel):
+    questions: List[str] = Field(..., max_length=config.BATCH_ASK_MAX_QUESTIONS)  # All embedded in one call
+    context_limit: int = 5
+    context_token_budget: Optional[int] = None  # Defaults to CONTEXT_TOKEN_BUDGET
+    collection: Optional[str] = Field(None, pattern=DB_CONSTANTS["COLLECTION_NAME_PATTERN"])  # Defaults to all collections
 
 class QuestionResponse(BaseModel):
     answer: str
     sources: List[str]
     confidence: float
     anonymized_answer: Optional[str] = None  # Debug: original AI response before deanonymization
+    context_tokens: Optional[int] = None  # Tokens of retrieved context sent to the LLM
 
 
 class HealthResponse(BaseModel):
@@ -27,20 +45,101 @@ class IngestResponse(BaseModel):
     word_count: int
     anonymized: bool = False
     anonymization_summary: Optional[dict] = None
+    file_id: Optional[int] = None
+    duplicate_of: Optional[int] = None  # Set when the upload matched an already ingested file
+    collection: Optional[str] = None
 
-class FileInfo(BaseModel):
-    id: int
+class ReplaceFileResponse(BaseModel):
+    message: str
+    file_id: int
     filename: str
-    content_type: str
     file_size: int
+    file_type: str
     word_count: int
+    chunks_total: int
+    chunks_unchanged: int  # Kept with their stored embedding
+    chunks_added: int  # New or changed, embedded for this version
+    chunks_removed: int
     anonymized: bool = False
-    created_at: str
+    anonymization_summary: Optional[dict] = None
+
+class FileInfo(BaseModel):
+    # Everything except id is optional so /files can return a field projection
+    id: int
+    filename: Optional[str] = None
+    content_type: Optional[str] = None
+    file_size: Optional[int] = None
+    word_count: Optional[int] = None
+    anonymized: Optional[bool] = None
+    collection: Optional[str] = None
+    created_at: Optional[str] = None
+
+class StatsBreakdown(BaseModel):
+    content_type: str
+    anonymized: bool
+    file_count: int
+    chunk_count: int
+    total_words: int
 
 class StatsResponse(BaseModel):
     file_count: int
     chunk_count: int
     total_words: int
+    breakdown: List[StatsBreakdown] = []  # Per content type and anonymization
 
 class FilesResponse(BaseModel):
-    files: List[FileInfo]
\ No newline at end of file
+    files: List[FileInfo]
+    next_cursor: Optional[str] = None  # Pass back as ?cursor= to get the next page
+    total: int = 0
+
+class ProfilingSettings(BaseModel):
+    enabled: bool
+    sample_rate: float = Field(0.0, ge=0.0, le=1.0)
+
+class ProfileInfo(BaseModel):
+    id: str
+    method: str
+    path: str
+    duration_ms: float
+    created_at: str
+
+class ReembedRequest(BaseModel):
+    model: str
+    dimensions: Optional[int] = Field(None, ge=1)  # Defaults to the model's native size
+    storage: Optional[str] = Field(None, pattern="^(vector|halfvec)$")  # Defaults to EMBEDDING_STORAGE
+    requests_per_minute: Optional[int] = Field(None, ge=0)
+    tokens_per_minute: Optional[int] = Field(None, ge=0)
+    batch_size: Optional[int] = Field(None, ge=1, le=2048)
+
+class EmbeddingVersionInfo(BaseModel):
+    version: str
+    model: str
+    dimensions: int
+    storage: str
+    status: str
+    embedded_chunks: int
+    created_at: Optional[datetime] = None
+    activated_at: Optional[datetime] = None
+
+class ReembedStatus(BaseModel):
+    job: Dict[str, Any]
+    versions: List[EmbeddingVersionInfo]
+
+class RecompressStatus(BaseModel):
+    job: Dict[str, Any]
+    compression: Dict[str, Any]  # As reported by GET /admin/compression
+
+class CollectionInfo(BaseModel):
+    name: str
+    partition: str  # The document_chunks partition holding its chunks
+    file_count: int
+    chunk_count: int
+    created_at: Optional[str] = None
+
+class BulkDeleteRequest(BaseModel):
+    file_ids: List[int]
+    background: bool = False  # Hide files now, remove chunks in the background
+
+class BulkDeleteResponse(BaseModel):
+    deleted: List[int]
+    not_found: List[int]
\ No newline at end of file
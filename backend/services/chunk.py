@@ -1,4 +1,13 @@
 # services/chunking.py
+import re
+import hashlib
+import zlib
+
+# Blank lines between paragraphs
+PARAGRAPH_BREAK = re.compile(r'\n\s*\n')
+# With content-defined chunking, a chunk only ends at a content-picked sentence once it is at
+# least this full, so chunks stay close to max_chunk_size on average
+MIN_BOUNDARY_FILL = 0.6
 
 def sanitize_text(text: str) -> str:
     """
@@ -16,32 +25,101 @@ def sanitize_text(text: str) -> str:
     return text.strip()
 
 
-def chunk_text(text: str, max_chunk_size: int = 1000) -> list:
+def content_hash(content: str) -> bytes:
+    """SHA-256 of a chunk's stored text, used to tell unchanged chunks apart on re-ingest"""
+    return hashlib.sha256(content.encode("utf-8")).digest()
+
+
+def _is_boundary(sentence: str, target_size: int) -> bool:
+    """
+    Whether a chunk ends after this sentence, decided from the sentence alone (about once
+    every `target_size` characters). Because it ignores what came before, an edit only moves
+    the boundaries up to the next such sentence, and the chunks after it come out unchanged.
+    """
+    return zlib.crc32(sentence.encode("utf-8")) < (len(sentence) + 2) * 2 ** 32 / target_size
+
+
+def chunk_text(text: str, max_chunk_size: int = 1000, content_defined: bool = False,
+               paragraphs: bool = False) -> list:
     """
     This function takes a large text and splits it into smaller chunks
     that are approximately `max_chunk_size` tokens in length.
-    """
-    # Sanitize the text first
-    text = sanitize_text(text)
     
-    # Split the text into sentences or paragraphs (you can adjust the logic)
-    sentences = text.split(". ")  # Split by period and space (you can customize this)
+    With `content_defined`, chunks also end at sentences picked by their content (once they
+    are MIN_BOUNDARY_FILL full), so they stay the same across edits elsewhere in the text while
+    averaging about 90% of `max_chunk_size`, against about 95% without.
+    
+    With `paragraphs` (text extracted one paragraph per block, as from Word documents), a
+    paragraph without a full stop still ends a sentence, and a Markdown heading starts a new
+    chunk. Other text is split as before, so its stored chunks and embeddings stay valid.
+    """
+    # Split the text into sentences, each with the separator that follows it. Paragraphs
+    # (blank-line separated) are split on their own; a single "paragraph" is the same as
+    # splitting the sanitized text on ". ".
+    sentences = []
+    for paragraph in (PARAGRAPH_BREAK.split(text) if paragraphs else [text]):
+        paragraph = sanitize_text(paragraph)
+        if paragraph:
+            heading = paragraphs and paragraph.startswith("#")
+            sentences.extend((sentence, ". ", heading and i == 0)
+                             for i, sentence in enumerate(paragraph.split(". ")))
+            sentences[-1] = (sentences[-1][0], " ", sentences[-1][2])
+    if sentences:
+        sentences[-1] = (sentences[-1][0], ". ", sentences[-1][2])
     
     chunks = []
     current_chunk = ""
     
     # Iterate through sentences and create chunks
-    for sentence in sentences:
+    for sentence, separator, heading in sentences:
+        if heading and current_chunk:
+            chunks.append(current_chunk.strip())
+            current_chunk = ""
+        
         # If adding the sentence doesn't exceed the max chunk size, add it to the current chunk
         if len(current_chunk) + len(sentence) + 1 <= max_chunk_size:
-            current_chunk += sentence + ". "
+            current_chunk += sentence + separator
         else:
             # Otherwise, finalize the current chunk and start a new one
             chunks.append(current_chunk.strip())
-            current_chunk = sentence + ". "
+            current_chunk = sentence + separator
 
+        if (content_defined and len(current_chunk) >= max_chunk_size * MIN_BOUNDARY_FILL
+                and _is_boundary(sentence, max_chunk_size)):
+            chunks.append(current_chunk.strip())
+            current_chunk = ""
+    
     # Add any remaining chunk that might not have been added
     if current_chunk:
         chunks.append(current_chunk.strip())
     
     return chunks
+
+
+def diff_chunks(stored: list, new_chunks: list) -> tuple:
+    """
+    Match the chunks of a new file version against the stored ones by content hash.
+    
+    Args:
+        stored: (chunk_id, chunk_index, content_hash) of every stored chunk
+        new_chunks: (chunk_index, content) of every chunk of the new version
+        
+    Returns:
+        (unchanged, added, removed): unchanged is (chunk_id, new_index) of stored chunks to
+        keep, added the new (chunk_index, content) that need embedding, removed the chunk ids
+        to delete. A chunk repeated in the text is matched as many times as it is stored.
+    """
+    by_hash = {}
+    for chunk_id, _, stored_hash in stored:
+        by_hash.setdefault(bytes(stored_hash) if stored_hash else None, []).append(chunk_id)
+    
+    unchanged, added = [], []
+    for index, content in new_chunks:
+        matches = by_hash.get(content_hash(content))
+        if matches:
+            unchanged.append((matches.pop(0), index))
+        else:
+            added.append((index, content))
+    
+    removed = [chunk_id for ids in by_hash.values() for chunk_id in ids]
+    return unchanged, added, removed
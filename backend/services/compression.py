@@ -0,0 +1,152 @@
+# services/compression.py
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+NO_DICTIONARY = 0  # Dictionary ID of frames compressed without one
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError as e:
+        raise RuntimeError("STORAGE_COMPRESSION=zstd needs the zstandard package (pip install zstandard)") from e
+    return zstandard
+
+
+class StorageCodec:
+    """
+    zstd compression of stored chunk text and original files.
+    
+    A chunk is too short for zstd to find much to reuse within it, so chunks are compressed
+    with a dictionary trained on the corpus. Each frame records the ID of the dictionary it
+    was made with and dictionaries are never deleted, so every chunk stays readable whichever
+    dictionary is current, or with compression switched off. Original files are compressed
+    without a dictionary and only kept compressed when that saves space: PDFs and .docx
+    files are compressed already.
+    """
+    
+    def __init__(self, enabled: bool, level: int, min_saving: float, refresh_seconds: float,
+                 load_dictionary: Callable[[int], Optional[bytes]],
+                 load_newest_dictionary: Callable[[], Optional[Tuple[int, bytes]]]):
+        self.enabled = enabled
+        self.level = level
+        self.min_saving = min_saving
+        self.refresh_seconds = refresh_seconds
+        self._load_dictionary = load_dictionary
+        self._load_newest_dictionary = load_newest_dictionary
+        self._dictionaries: Dict[int, Any] = {}
+        self._current = NO_DICTIONARY  # Dictionary new chunks are compressed with
+        self._checked_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._local = threading.local()  # zstd (de)compressors must not be shared between threads
+        if enabled:
+            _zstd()  # Fail on startup rather than on the first upload
+    
+    def _dictionary(self, dict_id: int):
+        dictionary = self._dictionaries.get(dict_id)
+        if dictionary is None:
+            data = self._load_dictionary(dict_id)
+            if data is None:
+                raise ValueError(f"Compression dictionary {dict_id} is missing")
+            dictionary = self._register(dict_id, data)
+        return dictionary
+    
+    def _register(self, dict_id: int, data: bytes):
+        with self._lock:
+            if dict_id not in self._dictionaries:
+                dictionary = _zstd().ZstdCompressionDict(data)
+                dictionary.precompute_compress(level=self.level)  # Shared by every thread's compressor
+                self._dictionaries[dict_id] = dictionary
+            return self._dictionaries[dict_id]
+    
+    def _current_dictionary(self) -> int:
+        """ID of the newest trained dictionary, looked up again every refresh_seconds"""
+        now = time.monotonic()
+        if self._checked_at is None or now - self._checked_at >= self.refresh_seconds:
+            self._checked_at = now
+            newest = self._load_newest_dictionary()
+            if newest:
+                self._register(*newest)
+                self._current = newest[0]
+        return self._current
+    
+    def _compressor(self, dict_id: int):
+        compressors = getattr(self._local, "compressors", None)
+        if compressors is None:
+            compressors = self._local.compressors = {}
+        if dict_id not in compressors:
+            zstandard = _zstd()
+            if dict_id == NO_DICTIONARY:
+                compressors[dict_id] = zstandard.ZstdCompressor(level=self.level)
+            else:
+                compressors[dict_id] = zstandard.ZstdCompressor(level=self.level, dict_data=self._dictionary(dict_id))
+        return compressors[dict_id]
+    
+    def _decompressor(self, dict_id: int):
+        decompressors = getattr(self._local, "decompressors", None)
+        if decompressors is None:
+            decompressors = self._local.decompressors = {}
+        if dict_id not in decompressors:
+            zstandard = _zstd()
+            if dict_id == NO_DICTIONARY:
+                decompressors[dict_id] = zstandard.ZstdDecompressor()
+            else:
+                decompressors[dict_id] = zstandard.ZstdDecompressor(dict_data=self._dictionary(dict_id))
+        return decompressors[dict_id]
+    
+    def use_dictionary(self, dict_id: int, data: bytes):
+        """Compress new chunks with this dictionary from now on (other processes follow within refresh_seconds)"""
+        self._register(dict_id, data)
+        self._current = dict_id
+        self._checked_at = time.monotonic()
+    
+    def current_dictionary(self) -> int:
+        return self._current_dictionary() if self.enabled else self._current
+    
+    @staticmethod
+    def frame_dictionary(data: bytes) -> int:
+        """ID of the dictionary a stored frame was compressed with"""
+        return _zstd().get_frame_parameters(data).dict_id
+    
+    def compress(self, data: bytes, dict_id: int = NO_DICTIONARY) -> bytes:
+        return self._compressor(dict_id).compress(data)
+    
+    def decompress(self, data: bytes) -> bytes:
+        return self._decompressor(self.frame_dictionary(data)).decompress(data)
+    
+    def chunk_columns(self, text: str) -> Tuple[Optional[str], Optional[bytes]]:
+        """Values of document_chunks (content, content_zstd) to store a chunk's text as"""
+        if not self.enabled:
+            return text, None
+        return None, self.compress(text.encode("utf-8"), self._current_dictionary())
+    
+    def chunk_text(self, content: Optional[str], content_zstd: Optional[bytes]) -> str:
+        """A chunk's text from its stored (content, content_zstd)"""
+        if content_zstd is None:
+            return content
+        return self.decompress(bytes(content_zstd)).decode("utf-8")
+    
+    def file_columns(self, data: Optional[bytes]) -> Tuple[Optional[bytes], Optional[bytes]]:
+        """Values of files (original_file, original_file_zstd) to store an uploaded file as"""
+        if not self.enabled or not data:
+            return data, None
+        compressed = self.compress(data)
+        if len(compressed) > len(data) * (1 - self.min_saving):
+            return data, None
+        return None, compressed
+    
+    def file_bytes(self, original_file: Optional[bytes], original_file_zstd: Optional[bytes]) -> Optional[bytes]:
+        """An uploaded file's bytes from its stored (original_file, original_file_zstd)"""
+        if original_file_zstd is None:
+            return bytes(original_file) if original_file is not None else None
+        return self.decompress(bytes(original_file_zstd))
+    
+    def train_dictionary(self, samples: List[bytes], size: int) -> Tuple[int, bytes]:
+        """Train a chunk dictionary of at most `size` bytes, returning its ID and data"""
+        zstandard = _zstd()
+        try:
+            dictionary = zstandard.train_dictionary(size, samples, level=self.level)
+        except zstandard.ZstdError as e:
+            raise ValueError(f"Could not train a compression dictionary from {len(samples)} chunks: {e}") from e
+        return dictionary.dict_id(), dictionary.as_bytes()
@@ -1,71 +1,1522 @@
 # services/db.py
 import psycopg2
+from pgvector.psycopg2 import register_vector
 import os
 import logging
 import json
-from typing import List, Dict, Any, Optional
+import re
+import base64
+import hashlib
+import threading
+from typing import Callable, List, Dict, Any, Optional, Tuple
 from datetime import datetime
 
+from config import config
+from constants import DB_CONSTANTS, EMBEDDING_CONSTANTS
+from services.metrics import DB_CONNECTIONS_OPENED
+from services.chunk import content_hash
+from services.compression import StorageCodec
+
 # Set up basic logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+
+def encode_files_cursor(created_at: datetime, file_id: int) -> str:
+    """Encode a (created_at, id) keyset position as an opaque cursor string"""
+    raw = f"{created_at.isoformat()}|{file_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_files_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Decode a cursor produced by encode_files_cursor, raising ValueError if malformed"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, file_id = base64.urlsafe_b64decode(padded).decode().rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(file_id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def file_hash(data: Optional[bytes]) -> Optional[bytes]:
+    """SHA-256 of an uploaded file, stored in files.content_hash to recognise repeated uploads"""
+    return hashlib.sha256(data).digest() if data is not None else None
+
+
+def collection_partition(name: str) -> str:
+    """
+    Name of the document_chunks partition that holds a collection's chunks. Hashed, since
+    collection names may contain characters (and lengths) a table name can't.
+    """
+    if name == DB_CONSTANTS["DEFAULT_COLLECTION"]:
+        return "document_chunks_default"
+    return "document_chunks_c" + hashlib.md5(name.encode("utf-8")).hexdigest()[:16]
+
+
+def validate_collection_name(name: str) -> str:
+    """Return the name, or raise ValueError if it isn't a valid collection name"""
+    if not re.match(DB_CONSTANTS["COLLECTION_NAME_PATTERN"], name or ""):
+        raise ValueError(f"Invalid collection name '{name}': use lowercase letters, digits, '-' and '_' (max 63)")
+    return name
+
+
+def embedding_version_id(model: str, dimensions: int, storage: str) -> str:
+    """Identifier of an embedding configuration in embedding_versions"""
+    return f"{model}:{dimensions}:{storage}"
+
+
+class EmbeddingVersionMismatch(Exception):
+    """Chunks were embedded for a version that is no longer the active one"""
+    
+    def __init__(self, expected: str, active: Dict[str, Any]):
+        super().__init__(f"Chunks embedded for {expected}, but {active['version']} is active")
+        self.active = active
+
+
+class FileChangedError(Exception):
+    """The file was modified by someone else between reading its chunks and replacing them"""
+
+
+# Re-created by switch_embedding_version after it swaps the embedding columns;
+# keep in sync with database_schema.sql
+CHUNK_QUANTIZE_TRIGGER_SQL = """
+    CREATE TRIGGER quantize_document_chunks_embedding
+        BEFORE INSERT OR UPDATE OF embedding ON document_chunks
+        FOR EACH ROW
+        EXECUTE FUNCTION quantize_chunk_embedding()
+"""
+CHUNK_VIEW_SQL = """
+    CREATE OR REPLACE VIEW chunk_with_file_info AS
+    SELECT dc.id, dc.content, dc.embedding, dc.chunk_index,
+           f.filename, f.content_type, f.file_size, f.word_count, dc.created_at, dc.content_zstd
+    FROM document_chunks dc
+    JOIN files f ON dc.file_id = f.id
+    WHERE f.deleted_at IS NULL
+"""
+
+
 class DatabaseService:
     def __init__(self):
         self.connection_string = os.getenv("DATABASE_URL")
         if not self.connection_string:
             raise ValueError("DATABASE_URL environment variable is required")
+        # Query vectors are cast to the configured column type (vector or halfvec)
+        self.embedding_type = config.EMBEDDING_STORAGE
+        if config.STORAGE_COMPRESSION not in DB_CONSTANTS["STORAGE_COMPRESSION_CODECS"]:
+            raise ValueError(f"STORAGE_COMPRESSION must be one of {DB_CONSTANTS['STORAGE_COMPRESSION_CODECS']}")
+        self.codec = StorageCodec(
+            enabled=config.STORAGE_COMPRESSION == "zstd",
+            level=config.COMPRESSION_LEVEL,
+            min_saving=DB_CONSTANTS["COMPRESSION_MIN_SAVING"],
+            refresh_seconds=DB_CONSTANTS["COMPRESSION_DICTIONARY_REFRESH"],
+            load_dictionary=self._load_compression_dictionary,
+            load_newest_dictionary=self._load_newest_compression_dictionary,
+        )
     
     def get_connection(self):
         """Get a database connection"""
+        DB_CONNECTIONS_OPENED.inc()
         return psycopg2.connect(self.connection_string)
     
-    def insert_file_metadata(self, filename: str, content_type: str, file_size: int, 
-                           word_count: int, original_file_bytes: Optional[bytes] = None, 
-                           anonymized: bool = False, anonymization_mapping: Optional[Dict] = None,
-                           metadata: Optional[str] = None) -> int:
+    def sync_embedding_column(self) -> bool:
+        """
+        Make document_chunks.embedding and its ANN index match EMBEDDING_STORAGE and
+        EMBEDDING_DIMENSIONS, and record that configuration as the active embedding version.
+        Switching vector <-> halfvec converts stored embeddings in place; a different model
+        or dimension is only accepted while no chunk has an embedding (otherwise use the
+        re-embedding job).
+        
+        Drops the chunk_with_file_info view and the quantization trigger when the column has
+        to change, so the caller must re-apply database_schema.sql afterwards. Returns True
+        if the column or index changed.
+        """
+        storage = self.embedding_type
+        dimension = config.EMBEDDING_DIMENSIONS
+        model = config.OPENAI_EMBEDDING_MODEL
+        opclasses = EMBEDDING_CONSTANTS["STORAGE_OPCLASSES"]
+        if storage not in opclasses:
+            raise ValueError(f"EMBEDDING_STORAGE must be one of {list(opclasses)}, got '{storage}'")
+        
+        conn = None
+        cur = None
+        try:
+            conn = self.get_connection()
+            cur = conn.cursor()
+            
+            self._check_storage_supported(cur, storage)
+            
+            cur.execute("SELECT EXISTS (SELECT 1 FROM document_chunks WHERE embedding IS NOT NULL)")
+            has_embeddings = cur.fetchone()[0]
+            cur.execute("SELECT model FROM embedding_versions WHERE status = 'active'")
+            active = cur.fetchone()
+            if active and active[0] != model and has_embeddings:
+                raise ValueError(
+                    f"Stored embeddings come from {active[0]}; set OPENAI_EMBEDDING_MODEL to it, "
+                    f"or change models with the re-embedding job (POST /admin/reembed)"
+                )
+            
+            cur.execute("""
+                SELECT format_type(atttypid, atttypmod) FROM pg_attribute
+                WHERE attrelid = 'document_chunks'::regclass AND attname = 'embedding'
+            """)
+            current_type = cur.fetchone()[0]
+            target_type = f"{storage}({dimension})"
+            cur.execute("SELECT indexdef FROM pg_indexes WHERE indexname = 'idx_document_chunks_embedding'")
+            row = cur.fetchone()
+            changed = row is None or opclasses[storage] not in row[0]
+            
+            if current_type != target_type:
+                current_dimension = int(current_type[current_type.index("(") + 1:-1])
+                if current_dimension != dimension and has_embeddings:
+                    raise ValueError(
+                        f"Stored embeddings are {current_type}; re-embed them with the re-embedding job "
+                        f"(POST /admin/reembed) to switch to {target_type}"
+                    )
+                
+                logger.info(f"🔧 Converting embedding column from {current_type} to {target_type}")
+                cur.execute("DROP VIEW IF EXISTS chunk_with_file_info")
+                cur.execute("DROP TRIGGER IF EXISTS quantize_document_chunks_embedding ON document_chunks")
+                cur.execute("DROP INDEX IF EXISTS idx_document_chunks_embedding")
+                cur.execute(f"""
+                    ALTER TABLE document_chunks ALTER COLUMN embedding TYPE {target_type}
+                    USING embedding::{target_type}
+                """)
+                changed = True
+            
+            if changed:
+                cur.execute("DROP INDEX IF EXISTS idx_document_chunks_embedding")
+                if dimension <= EMBEDDING_CONSTANTS["INDEX_MAX_DIMENSIONS"][storage]:
+                    cur.execute(f"""
+                        CREATE INDEX idx_document_chunks_embedding ON document_chunks
+                        USING ivfflat (embedding {opclasses[storage]}) WITH (lists = 100)
+                    """)
+                else:
+                    logger.warning(f"⚠️ {target_type} is too wide for an ivfflat index; searches will scan")
+            else:
+                logger.info(f"✅ Embedding column already {target_type}")
+            
+            # The configuration now describes what is stored
+            version = embedding_version_id(model, dimension, storage)
+            cur.execute("""
+                UPDATE embedding_versions SET status = 'retired'
+                WHERE status = 'active' AND version <> %s
+            """, (version,))
+            cur.execute("""
+                INSERT INTO embedding_versions (version, model, dimensions, storage, status, activated_at)
+                VALUES (%s, %s, %s, %s, 'active', NOW())
+                ON CONFLICT (version) DO UPDATE
+                SET status = 'active', activated_at = COALESCE(embedding_versions.activated_at, NOW())
+            """, (version, model, dimension, storage))
+            
+            conn.commit()
+            return changed
+        
+        except Exception as e:
+            if conn:
+                conn.rollback()
+            logger.error(f"❌ Failed to sync embedding column: {e}")
+            raise
+        finally:
+            if cur:
+                cur.close()
+            if conn:
+                conn.close()
+    
+    def _check_storage_supported(self, cur, storage: str):
+        """Raise ValueError if the server's pgvector can't store this embedding type"""
+        if storage not in EMBEDDING_CONSTANTS["STORAGE_OPCLASSES"]:
+            raise ValueError(f"Embedding storage must be one of {list(EMBEDDING_CONSTANTS['STORAGE_OPCLASSES'])}, got '{storage}'")
+        if storage == "halfvec":
+            cur.execute("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+            version = cur.fetchone()[0]
+            if tuple(int(part) for part in version.split(".")[:2]) < (0, 7):
+                raise ValueError(f"halfvec storage needs pgvector >= 0.7.0, the server has {version}")
+    
+    def get_embedding_versions(self) -> List[Dict[str, Any]]:
+        """All embedding versions, newest first"""
+        conn = None
+        cur = None
+        try:
+            conn = self.get_connection()
+            cur = conn.cursor()
+            cur.execute("""
+                SELECT version, model, dimensions, storage, status, last_chunk_id,
+                       embedded_chunks, created_at, activated_at
+                FROM embedding_versions
+                ORDER BY created_at DESC
+            """)
+            columns = ['version', 'model', 'dimensions', 'storage', 'status', 'last_chunk_id',
+                       'embedded_chunks', 'created_at', 'activated_at']
+            return [dict(zip(columns, row)) for row in cur.fetchall()]
+        finally:
+            if cur:
+                cur.close()
+            if conn:
+                conn.close()
+    
+    def get_active_embedding_version(self) -> Optional[Dict[str, Any]]:
+        """The version document_chunks.embedding currently holds, if one is recorded"""
+        for version in self.get_embedding_versions():
+            if version['status'] == 'active':
+                return version
+        return None
+    
+    def begin_embedding_version(self, model: str, dimensions: int, storage: str) -> Dict[str, Any]:
+        """
+        Start re-embedding into a new version, or return it unchanged if it is already building
+        (to resume from its checkpoint). Adds the embedding_next / embedding_bq_next staging
+        columns, which are metadata-only changes.
+        """
+        version = embedding_version_id(model, dimensions, storage)
+        conn = None
+        cur = None
+        try:
+            conn = self.get_connection()
+            cur = conn.cursor()
+            self._check_storage_supported(cur, storage)
+            
+            cur.execute("SELECT version, status FROM embedding_versions WHERE status IN ('active', 'building') FOR UPDATE")
+            current = {status: name for name, status in cur.fetchall()}
+            if current.get('active') == version:
+                raise ValueError(f"{version} is already the active embedding version")
+            if current.get('building') not in (None, version):
+                raise ValueError(f"{current['building']} is already being built; cancel it first")
+            
+            cur.execute("""
+                SELECT 1 FROM pg_attribute
+                WHERE attrelid = 'document_chunks'::regclass AND attname = 'embedding_next' AND NOT attisdropped
+            """)
+            has_staging = cur.fetchone() is not None
+            if current.get('building') != version or not has_staging:
+                cur.execute("DROP INDEX IF EXISTS idx_document_chunks_embedding_next")
+                cur.execute("ALTER TABLE document_chunks DROP COLUMN IF EXISTS embedding_next, DROP COLUMN IF EXISTS embedding_bq_next")
+                cur.execute(f"""
+                    ALTER TABLE document_chunks
+                    ADD COLUMN embedding_next {storage}({dimensions}),
+                    ADD COLUMN embedding_bq_next BIT VARYING
+                """)
+                cur.execute("""
+                    INSERT INTO embedding_versions (version, model, dimensions, storage, status)
+                    VALUES (%s, %s, %s, %s, 'building')
+                    ON CONFLICT (version) DO UPDATE
+                    SET status = 'building', last_chunk_id = 0, embedded_chunks = 0,
+                        created_at = NOW(), activated_at = NULL
+                """, (version, model, dimensions, storage))
+                logger.info(f"🆕 Started embedding version {version}")
+            
+            conn.commit()
+            return next(v for v in self.get_embedding_versions() if v['version'] == version)
+        
+        except Exception as e:
+            if conn:
+                conn.rollback()
+            logger.error(f"❌ Failed to begin embedding version {version}: {e}")
+            raise
+        finally:
+            if cur:
+                cur.close()
+            if conn:
+                conn.close()
+    
+    def fetch_chunks_to_reembed(self, after_id: int, limit: int) -> List[Tuple[int, str]]:
+        """Next chunks, in id order after a checkpoint, that have no embedding for the building version"""
+        conn = None
+        cur = None
+        try:
+            conn = self.get_connection()
+            cur = conn.cursor()
+            cur.execute("""
+                SELECT id, content, content_zstd FROM document_chunks
+                WHERE id > %s AND embedding_next IS NULL
+                ORDER BY id
+                LIMIT %s
+            """, (after_id, limit))
+            return [(chunk_id, self.codec.chunk_text(content, content_zstd))
+                    for chunk_id, content, content_zstd in cur.fetchall()]
+        finally:
+            if cur:
+                cur.close()
+            if conn:
+                conn.close()
+    
+    def store_reembedded_chunks(self, version: Dict[str, Any], embeddings: List[Tuple[int, List[float]]]):
+        """
+        Write a batch of new-version embeddings and advance the version's checkpoint in the
+        same transaction, so a restarted job resumes exactly after the last stored batch.
+        Raises ValueError if the version is no longer building (e.g. it was cancelled).
+        """
+        from psycopg2.extras import execute_values
+        
+        column_type = f"{version['storage']}({version['dimensions']})"
+        conn = None
+        cur = None
+        try:
+            conn = self.get_connection()
+            cur = conn.cursor()
+            execute_values(cur, f"""
+                UPDATE document_chunks dc
+                SET embedding_next = v.embedding::{column_type},
+                    embedding_bq_next = quantize_embedding(v.embedding::{column_type}::REAL[])
+                FROM (VALUES %s) AS v(id, embedding)
+                WHERE dc.id = v.id
+            """, [(chunk_id, '[' + ','.join(map(str, embedding)) + ']') for chunk_id, embedding in embeddings])
+            cur.execute("""
+                UPDATE embedding_versions
+                SET last_chunk_id = GREATEST(last_chunk_id, %s), embedded_chunks = embedded_chunks + %s
+                WHERE version = %s AND status = 'building'
+            """, (max(chunk_id for chunk_id, _ in embeddings), len(embeddings), version['version']))
+            if cur.rowcount == 0:
+                raise ValueError(f"{version['version']} is no longer building")
+            conn.commit()
+        except Exception as e:
+            if conn:
+                conn.rollback()
+            logger.error(f"❌ Failed to store re-embedded chunks: {e}")
+            raise
+        finally:
+            if cur:
+                cur.close()
+            if conn:
+                conn.close()
+    
+    def build_next_embedding_index(self, version: Dict[str, Any]):
+        """
+        Build the ANN index for the building version without blocking writes. A partitioned
+        table can't be indexed CONCURRENTLY, so each collection's partition is indexed
+        concurrently on its own and attached to an index declared ON ONLY the parent, which
+        becomes valid once every partition is attached.
+        """
+        storage, dimensions = version['storage'], version['dimensions']
+        if dimensions > EMBEDDING_CONSTANTS["INDEX_MAX_DIMENSIONS"][storage]:
+            logger.warning(f"⚠️ {storage}({dimensions}) is too wide for an ivfflat index; searches will scan")
+            return
+        index_method = f"USING ivfflat (embedding_next {EMBEDDING_CONSTANTS['STORAGE_OPCLASSES'][storage]}) WITH (lists = 100)"
+        
+        conn = None
+        cur = None
+        try:
+            conn = self.get_connection()
+            conn.autocommit = True  # CONCURRENTLY can't run inside a transaction
+            cur = conn.cursor()
+            cur.execute("""
+                SELECT i.indisvalid FROM pg_index i
+                JOIN pg_class c ON c.oid = i.indexrelid
+                WHERE c.relname = 'idx_document_chunks_embedding_next'
+            """)
+            row = cur.fetchone()
+            if row and row[0]:
+                return
+            logger.info(f"🏗️ Building ANN index for {version['version']}")
+            cur.execute(f"CREATE INDEX IF NOT EXISTS idx_document_chunks_embedding_next ON ONLY document_chunks {index_method}")
+            for partition in self._chunk_partitions(cur):
+                index = f"{partition}_embedding_next_idx"
+                cur.execute("""
+                    SELECT i.indisvalid FROM pg_index i
+                    JOIN pg_class c ON c.oid = i.indexrelid
+                    WHERE c.relname = %s
+                """, (index,))
+                row = cur.fetchone()
+                if not row or not row[0]:
+                    # An interrupted concurrent build leaves an invalid index behind
+                    cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {index}")
+                    cur.execute(f"CREATE INDEX CONCURRENTLY {index} ON {partition} {index_method}")
+                cur.execute(f"ALTER INDEX idx_document_chunks_embedding_next ATTACH PARTITION {index}")
+        finally:
+            if cur:
+                cur.close()
+            if conn:
+                conn.close()
+    
+    def switch_embedding_version(self, version: Dict[str, Any]) -> bool:
+        """
+        Atomically make the building version the active one: its staging columns and index
+        replace embedding / embedding_bq and their index, in one short transaction.
+        
+        Returns False without changing anything if some chunk still lacks a new-version
+        embedding (e.g. one ingested during the last batch); the caller embeds those and retries.
+        """
+        conn = None
+        cur = None
+        try:
+            conn = self.get_connection()
+            cur = conn.cursor()
+            # Renaming columns needs a brief exclusive lock; don't let a queue of readers
+            # build up behind it if a long query is running
+            cur.execute("SET LOCAL lock_timeout = %s", (f"{DB_CONSTANTS['EMBEDDING_SWITCH_LOCK_TIMEOUT_MS']}ms",))
+            # Same lock order as insert_document_chunks: version row first, then the table
+            cur.execute("SELECT version FROM embedding_versions WHERE status IN ('active', 'building') FOR UPDATE")
+            cur.execute("SELECT status FROM embedding_versions WHERE version = %s", (version['version'],))
+            row = cur.fetchone()
+            if not row or row[0] != 'building':
+                raise ValueError(f"{version['version']} is not building")
+            cur.execute("LOCK TABLE document_chunks IN SHARE ROW EXCLUSIVE MODE")
+            cur.execute("SELECT EXISTS (SELECT 1 FROM document_chunks WHERE embedding_next IS NULL)")
+            if cur.fetchone()[0]:
+                conn.rollback()
+                return False
+            
+            cur.execute("DROP VIEW IF EXISTS chunk_with_file_info")
+            cur.execute("DROP TRIGGER IF EXISTS quantize_document_chunks_embedding ON document_chunks")
+            cur.execute("DROP INDEX IF EXISTS idx_document_chunks_embedding")
+            cur.execute("ALTER TABLE document_chunks DROP COLUMN embedding, DROP COLUMN embedding_bq")
+            cur.execute("ALTER TABLE document_chunks RENAME COLUMN embedding_next TO embedding")
+            cur.execute("ALTER TABLE document_chunks RENAME COLUMN embedding_bq_next TO embedding_bq")
+            cur.execute("ALTER INDEX IF EXISTS idx_document_chunks_embedding_next RENAME TO idx_document_chunks_embedding")
+            for partition in self._chunk_partitions(cur):
+                cur.execute(f"ALTER INDEX IF EXISTS {partition}_embedding_next_idx RENAME TO {partition}_embedding_idx")
+            cur.execute(CHUNK_QUANTIZE_TRIGGER_SQL)
+            cur.execute(CHUNK_VIEW_SQL)
+            cur.execute("UPDATE embedding_versions SET status = 'retired' WHERE status = 'active'")
+            cur.execute("""
+                UPDATE embedding_versions SET status = 'active', activated_at = NOW()
+                WHERE version = %s
+            """, (version['version'],))
+            conn.commit()
+            logger.info(f"✅ Switched to embedding version {version['version']}")
+            return True
+        
+        except Exception as e:
+            if conn:
+                conn.rollback()
+            logger.error(f"❌ Failed to switch embedding version: {e}")
+            raise
+        finally:
+            if cur:
+                cur.close()
+            if conn:
+                conn.close()
+    
+    def cancel_embedding_version(self, version: str) -> bool:
+        """Abandon a building version and drop its staging columns. Returns False if it wasn't building."""
+        conn = None
+        cur = None
+        try:
+            conn = self.get_connection()
+            cur = conn.cursor()
+            cur.execute("""
+                UPDATE embedding_versions SET status = 'cancelled'
+                WHERE version = %s AND status = 'building'
+            """, (version,))
+            if cur.rowcount == 0:
+                conn.rollback()
+                return False
+            cur.execute("DROP INDEX IF EXISTS idx_document_chunks_embedding_next")
+            cur.execute("ALTER TABLE document_chunks DROP COLUMN IF EXISTS embedding_next, DROP COLUMN IF EXISTS embedding_bq_next")
+            conn.commit()
+            logger.info(f"🗑️ Cancelled embedding version {version}")
+            return True
+        except Exception as e:
+            if conn:
+                conn.rollback()
+            logger.error(f"❌ Failed to cancel embedding version: {e}")
+            raise
+        finally:
+            if cur:
+                cur.close()
+            if conn:
+                conn.close()
+    
+    def _chunk_partitions(self, cur) -> List[str]:
+        """Names of the partitions of document_chunks, one per collection"""
+        cur.execute("""
+            SELECT c.relname FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'document_chunks'::regclass
+            ORDER BY c.relname
+        """)
+        return [row[0] for row in cur.fetchall()]
+    
+    def ensure_collection(self, name: str) -> str:
+        """
+        Create a collection and its document_chunks partition if they don't exist yet. The
+        partition gets every index of the parent, including its own ANN index. That index is
+        built on no rows; refresh_collection_indexes rebuilds it once the partition has filled.
+        
+        Returns:
+            str: The name of the collection's partition
+        """
+        validate_collection_name(name)
+        conn = None
+        cur = None
+        try:
+            conn = self.get_connection()
+            cur = conn.cursor()
+            cur.execute("SELECT partition_name FROM collections WHERE name = %s", (name,))
+            row = cur.fetchone()
+            if row:
+                return row[0]
+            
+            partition = collection_partition(name)
+            cur.execute("SET LOCAL lock_timeout = %s", (f"{DB_CONSTANTS['COLLECTION_DDL_LOCK_TIMEOUT_MS']}ms",))
+            # A concurrent creator of the same collection waits on this row, then skips both steps
+            cur.execute("""
+                INSERT INTO collections (name, partition_name) VALUES (%s, %s)
+                ON CONFLICT (name) DO NOTHING
+            """, (name, partition))
+            cur.execute(f"CREATE TABLE IF NOT EXISTS {partition} PARTITION OF document_chunks FOR VALUES IN (%s)",
+                        (name,))
+            conn.commit()
+            logger.info(f"🆕 Created collection {name} (partition {partition})")
+            return partition
+        except Exception as e:
+            if conn:
+                conn.rollback()
+            logger.error(f"❌ Failed to create collection {name}: {e}")
+            raise
+        finally:
+            if cur:
+                cur.close()
+            if conn:
+                conn.close()
+    
+    def refresh_collection_indexes(self) -> List[str]:
+        """
+        Rebuild the ANN index of every collection partition that has outgrown it. A partition
+        inherits the parent's ivfflat index when it is created, so that index is built on zero
+        rows and its centroids say nothing about the data. It is rebuilt with REINDEX
+        CONCURRENTLY (writes and searches go on) once the partition holds ANN_REINDEX_MIN_CHUNKS
+        chunks, and again whenever it has grown ANN_REINDEX_GROWTH-fold since.
+        
+        Returns:
+            List of the collections whose index was rebuilt
+        """
+        conn = None
+        cur = None
+        try:
+            conn = self.get_connection()
+            conn.autocommit = True  # REINDEX CONCURRENTLY can't run inside a transaction
+            cur = conn.cursor()
+            # Other workers run this check too: the first one to get here does the work
+            cur.execute("SELECT pg_try_advisory_lock(%s)", (DB_CONSTANTS["ANN_REINDEX_LOCK_KEY"],))
+            if not cur.fetchone()[0]:
+                return []
+            
+            cur.execute("""
+                SELECT s.collection, c.partition_name, s.chunk_count
+                FROM collection_stats s
+                JOIN collections c ON c.name = s.collection
+                WHERE s.chunk_count >= %s AND s.chunk_count >= s.indexed_chunks * %s
+            """, (DB_CONSTANTS["ANN_REINDEX_MIN_CHUNKS"], DB_CONSTANTS["ANN_REINDEX_GROWTH"]))
+            reindexed = []
+            for collection, partition, chunk_count in cur.fetchall():
+                cur.execute("""
+                    SELECT i.indexrelid::regclass::text
+                    FROM pg_index i
+                    JOIN pg_inherits h ON h.inhrelid = i.indexrelid
+                    JOIN pg_class p ON p.oid = h.inhparent
+                    WHERE i.indrelid = %s::regclass AND p.relname = 'idx_document_chunks_embedding'
+                """, (partition,))
+                row = cur.fetchone()
+                if row:
+                    cur.execute(f"REINDEX INDEX CONCURRENTLY {row[0]}")
+                    logger.info(f"🏗️ Rebuilt the ANN index of collection {collection} on {chunk_count} chunks")
+                    reindexed.append(collection)
+                # Without an ANN index (embeddings too wide for ivfflat) there is nothing to rebuild
+                cur.execute("UPDATE collection_stats SET indexed_chunks = %s WHERE collection = %s",
+                            (chunk_count, collection))
+            return reindexed
+        except Exception as e:
+            logger.error(f"❌ Failed to rebuild collection ANN indexes: {e}")
+            raise
+        finally:
+            if cur:
+                cur.close()
+            if conn:
+                conn.close()  # Also releases the advisory lock
+    
+    def list_collections(self) -> List[Dict[str, Any]]:
+        """All collections with their live file and chunk counts (from the maintained counters)"""
+        conn = None
+        cur = None
+        try:
+            conn = self.get_connection()
+            cur = conn.cursor()
+            cur.execute("""
+                SELECT c.name, c.partition_name, COALESCE(s.file_count, 0), COALESCE(s.chunk_count, 0), c.created_at
+                FROM collections c
+                LEFT JOIN collection_stats s ON s.collection = c.name
+                ORDER BY c.name
+            """)
+            return [
+                {
+                    'name': row[0],
+                    'partition': row[1],
+                    'file_count': row[2],
+                    'chunk_count': row[3],
+                    'created_at': row[4].isoformat() if row[4] else None
+                }
+                for row in cur.fetchall()
+            ]
+        finally:
+            if cur:
+                cur.close()
+            if conn:
+                conn.close()
+    
+    def drop_collection(self, name: str) -> Optional[int]:
+        """
+        Delete a collection with all its files. Its chunks go with a DROP TABLE of its partition
+        (and ANN index) instead of row-by-row deletes. The default collection can't be dropped.
+        
+        Returns:
+            int: Number of files deleted, or None if the collection doesn't exist
+        """
+        if name == DB_CONSTANTS["DEFAULT_COLLECTION"]:
+            raise ValueError("The default collection can't be dropped")
+        conn = None
+        cur = None
+        try:
+            conn = self.get_connection()
+            cur = conn.cursor()
+            cur.execute("SET LOCAL lock_timeout = %s", (f"{DB_CONSTANTS['COLLECTION_DDL_LOCK_TIMEOUT_MS']}ms",))
+            # Blocks new files in the collection (their foreign key locks this row) until we're done
+            cur.execute("SELECT partition_name FROM collections WHERE name = %s FOR UPDATE", (name,))
+            row = cur.fetchone()
+            if not row:
+                conn.rollback()
+                return None
+            partition = row[0]
+            
+            cur.execute("""
+                SELECT content_type, COALESCE(anonymized, FALSE), COUNT(*),
+                       COALESCE(SUM(chunk_count), 0), COALESCE(SUM(word_count), 0)
+                FROM files
+                WHERE collection = %s AND deleted_at IS NULL
+                GROUP BY content_type, COALESCE(anonymized, FALSE)
+            """, (name,))
+            for content_type, anonymized, files, chunks, words in cur.fetchall():
+                self._adjust_corpus_stats(cur, name, content_type, anonymized, files=-files,
+                                          chunks=-chunks, words=-words)
+            cur.execute("DELETE FROM collection_stats WHERE collection = %s", (name,))
+            
+            cur.execute(f"DROP TABLE IF EXISTS {partition}")
+            cur.execute("DELETE FROM files WHERE collection = %s", (name,))
+            files_deleted = cur.rowcount
+            cur.execute("DELETE FROM collections WHERE name = %s", (name,))
+            conn.commit()
+            logger.info(f"🗑️ Dropped collection {name} with {files_deleted} files")
+            return files_deleted
+        except Exception as e:
+            if conn:
+                conn.rollback()
+            logger.error(f"❌ Failed to drop collection {name}: {e}")
+            raise
+        finally:
+            if cur:
+                cur.close()
+            if conn:
+                conn.close()
+    
+    def _adjust_corpus_stats(self, cur, collection: str, content_type: str, anonymized: bool,
+                             files: int = 0, chunks: int = 0, words: int = 0):
+        """
+        Apply deltas to the maintained corpus and collection counters inside the caller's
+        transaction, and bump the corpus version. The corpus_stats row is always updated first
+        so its row lock orders concurrent writers and reconcile_corpus_stats.
+        """
+        cur.execute("""
+            UPDATE corpus_stats
+            SET file_count = file_count + %s,
+                chunk_count = chunk_count + %s,
+                total_words = total_words + %s,
+                version = version + 1
+            WHERE id = 1
+        """, (files, chunks, words))
+        cur.execute("""
+            INSERT INTO corpus_stats_breakdown (content_type, anonymized, file_count, chunk_count, total_words)
+            VALUES (%s, %s, %s, %s, %s)
+            ON CONFLICT (content_type, anonymized) DO UPDATE
+            SET file_count = corpus_stats_breakdown.file_count + EXCLUDED.file_count,
+                chunk_count = corpus_stats_breakdown.chunk_count + EXCLUDED.chunk_count,
+                total_words = corpus_stats_breakdown.total_words + EXCLUDED.total_words
+        """, (content_type, bool(anonymized), files, chunks, words))
+        cur.execute("""
+            INSERT INTO collection_stats (collection, file_count, chunk_count)
+            VALUES (%s, %s, %s)
+            ON CONFLICT (collection) DO UPDATE
+            SET file_count = collection_stats.file_count + EXCLUDED.file_count,
+                chunk_count = collection_stats.chunk_count + EXCLUDED.chunk_count
+        """, (collection, files, chunks))
+    
+    def _check_embedding_version(self, cur, embedding_version: Optional[str]):
+        """
+        Raise EmbeddingVersionMismatch if embeddings made with this version can no longer be
+        stored or searched with. FOR SHARE holds off a version switch until the caller's
+        transaction ends.
+        """
+        if not embedding_version:
+            return
+        cur.execute("""
+            SELECT version, model, dimensions, storage FROM embedding_versions
+            WHERE status = 'active' FOR SHARE
+        """)
+        row = cur.fetchone()
+        if row and row[0] != embedding_version:
+            raise EmbeddingVersionMismatch(embedding_version, {
+                'version': row[0], 'model': row[1], 'dimensions': row[2], 'storage': row[3]
+            })
+    
+    def insert_file_metadata(self, filename: str, content_type: str, file_size: int, 
+                           word_count: int, original_file_bytes: Optional[bytes] = None, 
+                           anonymized: bool = False, anonymization_mapping: Optional[Dict] = None,
+                           metadata: Optional[str] = None,
+                           collection: str = DB_CONSTANTS["DEFAULT_COLLECTION"]) -> int:
+        """
+        Insert file metadata and original file content, return the file ID
+        
+        Args:
+            filename: Name of the file
+            content_type: MIME type of the file
+            file_size: Size of the file in bytes
+            word_count: Number of words in the extracted text
+            original_file_bytes: Original file content as bytes (optional)
+            anonymized: Whether the file was anonymized
+            anonymization_mapping: Mapping of original values to aliases
+            metadata: Additional metadata as JSON string (optional)
+            collection: Collection the file and its chunks belong to (created if new)
+            
+        Returns:
+            int: The file ID that was inserted
+        """
+        self.ensure_collection(collection)
+        conn = None
+        cur = None
+        try:
+            conn = self.get_connection()
+            cur = conn.cursor()
+            
+            # Convert anonymization_mapping to JSON string if it exists
+            anonymization_mapping_json = json.dumps(anonymization_mapping) if anonymization_mapping else None
+            original_file, original_file_zstd = self.codec.file_columns(original_file_bytes)
+            
+            cur.execute("""
+                INSERT INTO files (filename, content_type, file_size, word_count, original_file, original_file_zstd,
+                                 anonymized, anonymization_mapping, metadata, content_hash, collection, created_at)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                RETURNING id
+            """, (filename, content_type, file_size, word_count, original_file, original_file_zstd,
+                  anonymized, anonymization_mapping_json, metadata, file_hash(original_file_bytes),
+                  collection, datetime.utcnow()))
+            
+            file_id = cur.fetchone()[0]
+            
+            # Keep the maintained corpus counters in step with the insert
+            self._adjust_corpus_stats(cur, collection, content_type, anonymized, files=1, words=word_count)
+            
+            conn.commit()
+            logger.info(f"✅ Inserted file metadata and content for {filename} with ID {file_id}")
+            return file_id
+            
+        except Exception as e:
+            logger.error(f"❌ Failed to insert file metadata: {e}")
+            if conn:
+                conn.rollback()
+            raise
+        finally:
+            if cur:
+                cur.close()
+            if conn:
+                conn.close()
+    
+    def find_file_by_hash(self, content_hash: bytes, anonymized: bool,
+                          collection: str = DB_CONSTANTS["DEFAULT_COLLECTION"]) -> Optional[Dict[str, Any]]:
+        """A live file in the collection with these exact bytes, ingested with the same anonymization, if any"""
+        conn = None
+        cur = None
+        try:
+            conn = self.get_connection()
+            cur = conn.cursor()
+            cur.execute("""
+                SELECT id, filename, content_type, file_size, word_count, chunk_count, anonymization_mapping
+                FROM files
+                WHERE content_hash = %s AND anonymized = %s AND collection = %s
+                  AND deleted_at IS NULL AND alias_of IS NULL
+                ORDER BY id
+                LIMIT 1
+            """, (content_hash, anonymized, collection))
+            row = cur.fetchone()
+            if not row:
+                return None
+            columns = ['id', 'filename', 'content_type', 'file_size', 'word_count', 'chunk_count',
+                       'anonymization_mapping']
+            return dict(zip(columns, row))
+        finally:
+            if cur:
+                cur.close()
+            if conn:
+                conn.close()
+    
+    def insert_file_alias(self, original_id: int, filename: str, metadata: Optional[str] = None) -> Optional[int]:
+        """
+        Add a file row for a duplicate upload that shares the chunks of an existing file instead
+        of storing its own. Aliases are listed like any file but never show up twice in search;
+        deleting the original deletes its aliases, replacing an alias gives it its own chunks,
+        and replacing the original first hands its current chunks over to the aliases.
+        
+        Returns:
+            int: The alias file ID, or None if the original doesn't exist
+        """
+        conn = None
+        cur = None
+        try:
+            conn = self.get_connection()
+            cur = conn.cursor()
+            cur.execute("""
+                INSERT INTO files (filename, content_type, file_size, word_count, anonymized,
+                                   metadata, alias_of, collection, created_at)
+                SELECT %s, content_type, file_size, word_count, anonymized,
+                       COALESCE(%s::jsonb, metadata), id, collection, %s
+                FROM files
+                WHERE id = %s AND deleted_at IS NULL AND alias_of IS NULL
+                RETURNING id, content_type, anonymized, word_count, collection
+            """, (filename, metadata, datetime.utcnow(), original_id))
+            row = cur.fetchone()
+            if not row:
+                conn.rollback()
+                return None
+            alias_id, content_type, anonymized, word_count, collection = row
+            self._adjust_corpus_stats(cur, collection, content_type, anonymized, files=1, words=word_count)
+            conn.commit()
+            logger.info(f"✅ Added {filename} with ID {alias_id} as an alias of file ID {original_id}")
+            return alias_id
+        except Exception as e:
+            logger.error(f"❌ Failed to insert file alias: {e}")
+            if conn:
+                conn.rollback()
+            raise
+        finally:
+            if cur:
+                cur.close()
+            if conn:
+                conn.close()
+    
+    def insert_document_chunks(self, file_id: int, chunks: List[Dict[str, Any]],
+                               embedding_version: Optional[str] = None) -> int:
+        """
+        Insert document chunks with their embeddings
+        
+        Args:
+            file_id: The ID of the file these chunks belong to
+            chunks: List of dicts with 'content' and 'embedding' keys
+            embedding_version: Version the embeddings were made with. If another version has
+                become active meanwhile, nothing is inserted and EmbeddingVersionMismatch is raised.
+            
+        Returns:
+            int: Number of chunks inserted
+        """
+        conn = None
+        cur = None
+        try:
+            conn = self.get_connection()
+            cur = conn.cursor()
+            
+            self._check_embedding_version(cur, embedding_version)
+            
+            # Chunks are stored in the partition of the file's collection
+            cur.execute("SELECT collection FROM files WHERE id = %s", (file_id,))
+            row = cur.fetchone()
+            collection = row[0] if row else DB_CONSTANTS["DEFAULT_COLLECTION"]
+            
+            inserted_count = 0
+            for chunk in chunks:
+                cur.execute("""
+                    INSERT INTO document_chunks (file_id, collection, content, content_zstd, embedding, chunk_index,
+                                                 content_hash, created_at)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                """, (
+                    file_id,
+                    collection,
+                    *self.codec.chunk_columns(chunk['content']),
+                    chunk['embedding'],
+                    chunk.get('index', 0),
+                    content_hash(chunk['content']),
+                    datetime.utcnow()
+                ))
+                inserted_count += 1
+            
+            # Track the per-file chunk count so deletes never have to count chunks
+            cur.execute("""
+                UPDATE files SET chunk_count = chunk_count + %s
+                WHERE id = %s AND deleted_at IS NULL
+                RETURNING content_type, anonymized
+            """, (inserted_count, file_id))
+            file_row = cur.fetchone()
+            if file_row and inserted_count:
+                self._adjust_corpus_stats(cur, collection, file_row[0], file_row[1], chunks=inserted_count)
+            
+            conn.commit()
+            logger.info(f"✅ Inserted {inserted_count} chunks for file ID {file_id}")
+            return inserted_count
+            
+        except EmbeddingVersionMismatch:
+            # Expected right after a version switch; the caller re-embeds and retries
+            if conn:
+                conn.rollback()
+            raise
+        except Exception as e:
+            logger.error(f"❌ Failed to insert document chunks: {e}")
+            if conn:
+                conn.rollback()
+            raise
+        finally:
+            if cur:
+                cur.close()
+            if conn:
+                conn.close()
+    
+    def find_ingested_hashes(self, content_hashes: List[bytes], anonymized: bool,
+                             collection: str = DB_CONSTANTS["DEFAULT_COLLECTION"]) -> set:
+        """Which of these file hashes already have a live file in the collection (see find_file_by_hash)"""
+        if not content_hashes:
+            return set()
+        conn = None
+        cur = None
+        try:
+            conn = self.get_connection()
+            cur = conn.cursor()
+            cur.execute("""
+                SELECT DISTINCT content_hash FROM files
+                WHERE content_hash = ANY(%s) AND anonymized = %s AND collection = %s
+                  AND deleted_at IS NULL AND alias_of IS NULL
+            """, (list(content_hashes), anonymized, collection))
+            return {bytes(row[0]) for row in cur.fetchall()}
+        finally:
+            if cur:
+                cur.close()
+            if conn:
+                conn.close()
+    
+    def insert_files_with_chunks(self, files: List[Dict[str, Any]],
+                                 embedding_version: Optional[str] = None) -> List[int]:
+        """
+        Insert several files with all their chunks in one transaction, for bulk ingestion:
+        a file is either stored complete or not at all, so an interrupted run can simply be
+        started again. Corpus counters are adjusted once per content type.
+        
+        Args:
+            files: Dicts with the insert_file_metadata arguments plus 'chunks' (list of dicts
+                with 'content', 'embedding' and 'index'). All files must be in one collection,
+                which must exist (ensure_collection).
+            embedding_version: As for insert_document_chunks; on a mismatch nothing is inserted
+        
+        Returns:
+            List of the new file IDs, in input order
+        """
+        from psycopg2.extras import execute_values
+        
+        if not files:
+            return []
+        conn = None
+        cur = None
+        try:
+            conn = self.get_connection()
+            cur = conn.cursor()
+            
+            self._check_embedding_version(cur, embedding_version)
+            
+            now = datetime.utcnow()
+            file_ids = []
+            chunk_rows = []
+            stats: Dict[Tuple[str, str, bool], List[int]] = {}
+            for file in files:
+                mapping = file.get('anonymization_mapping')
+                collection = file.get('collection', DB_CONSTANTS["DEFAULT_COLLECTION"])
+                cur.execute("""
+                    INSERT INTO files (filename, content_type, file_size, word_count, original_file, original_file_zstd,
+                                     anonymized, anonymization_mapping, metadata, content_hash, collection,
+                                     chunk_count, created_at)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                    RETURNING id
+                """, (file['filename'], file['content_type'], file['file_size'], file['word_count'],
+                      *self.codec.file_columns(file.get('original_file_bytes')), file.get('anonymized', False),
+                      json.dumps(mapping) if mapping else None, file.get('metadata'),
+                      file_hash(file.get('original_file_bytes')), collection, len(file['chunks']), now))
+                file_id = cur.fetchone()[0]
+                file_ids.append(file_id)
+                chunk_rows.extend(
+                    (file_id, collection, *self.codec.chunk_columns(chunk['content']), chunk['embedding'],
+                     chunk.get('index', 0), content_hash(chunk['content']), now)
+                    for chunk in file['chunks']
+                )
+                totals = stats.setdefault((collection, file['content_type'], bool(file.get('anonymized', False))),
+                                          [0, 0, 0])
+                totals[0] += 1
+                totals[1] += len(file['chunks'])
+                totals[2] += file['word_count']
+            
+            execute_values(cur, """
+                INSERT INTO document_chunks (file_id, collection, content, content_zstd, embedding, chunk_index,
+                                             content_hash, created_at)
+                VALUES %s
+            """, chunk_rows, page_size=500)
+            
+            for (collection, content_type, anonymized), (file_count, chunk_count, words) in stats.items():
+                self._adjust_corpus_stats(cur, collection, content_type, anonymized,
+                                          files=file_count, chunks=chunk_count, words=words)
+            
+            conn.commit()
+            logger.info(f"✅ Inserted {len(file_ids)} files with {len(chunk_rows)} chunks")
+            return file_ids
+        
+        except EmbeddingVersionMismatch:
+            if conn:
+                conn.rollback()
+            raise
+        except Exception as e:
+            logger.error(f"❌ Failed to insert files with chunks: {e}")
+            if conn:
+                conn.rollback()
+            raise
+        finally:
+            if cur:
+                cur.close()
+            if conn:
+                conn.close()
+    
+    def get_file_chunk_hashes(self, file_id: int) -> Optional[Dict[str, Any]]:
+        """
+        The content hashes of a file's chunks, to diff a new version of the file against
+        
+        Returns:
+            Dict with 'updated_at' (pass back to replace_file_chunks) and 'chunks', a list of
+            (chunk_id, chunk_index, content_hash), or None if the file doesn't exist
+        """
+        conn = None
+        cur = None
+        try:
+            conn = self.get_connection()
+            cur = conn.cursor()
+            cur.execute("SELECT updated_at FROM files WHERE id = %s AND deleted_at IS NULL", (file_id,))
+            row = cur.fetchone()
+            if not row:
+                return None
+            cur.execute("""
+                SELECT id, chunk_index, content_hash FROM document_chunks
+                WHERE file_id = %s
+                ORDER BY chunk_index
+            """, (file_id,))
+            return {'updated_at': row[0], 'chunks': cur.fetchall()}
+        finally:
+            if cur:
+                cur.close()
+            if conn:
+                conn.close()
+    
+    def replace_file_chunks(self, file_id: int, updated_at: datetime, filename: str, content_type: str,
+                            file_size: int, word_count: int, original_file_bytes: Optional[bytes],
+                            anonymized: bool, anonymization_mapping: Optional[Dict],
+                            metadata: Optional[str], unchanged: List[Tuple[int, int]],
+                            new_chunks: List[Dict[str, Any]], removed_ids: List[int],
+                            embedding_version: Optional[str] = None) -> Optional[int]:
+        """
+        Apply a new version of a file in one transaction: update its metadata and original,
+        delete removed chunks, insert new ones and renumber the unchanged ones. Only chunks
+        whose position moved are written, so index churn follows the size of the edit.
+        Aliases of the file keep the version they were uploaded as (see _detach_aliases).
+        
+        Args:
+            file_id: The file to replace
+            updated_at: The file's updated_at when its chunks were read (get_file_chunk_hashes);
+                FileChangedError is raised if it was modified since
+            unchanged: (chunk_id, new_index) of stored chunks that are kept
+            new_chunks: List of dicts with 'content', 'embedding' and 'index' keys
+            removed_ids: Chunk ids to delete
+            embedding_version: As for insert_document_chunks
+            metadata: New metadata JSON string, or None to keep the current metadata
+            
+        Returns:
+            int: The file's chunk count afterwards, or None if the file doesn't exist
+        """
+        from psycopg2.extras import execute_values
+        
+        conn = None
+        cur = None
+        try:
+            conn = self.get_connection()
+            cur = conn.cursor()
+            
+            self._check_embedding_version(cur, embedding_version)
+            
+            cur.execute("""
+                SELECT content_type, anonymized, word_count, chunk_count, updated_at, collection
+                FROM files WHERE id = %s AND deleted_at IS NULL
+                FOR UPDATE
+            """, (file_id,))
+            row = cur.fetchone()
+            if not row:
+                conn.rollback()
+                return None
+            old_content_type, old_anonymized, old_word_count, old_chunk_count, current_updated_at, collection = row
+            if current_updated_at != updated_at:
+                raise FileChangedError(f"File {file_id} was modified while the new version was processed")
+            
+            self._detach_aliases(cur, file_id, collection)
+            
+            removed = 0
+            if removed_ids:
+                cur.execute("DELETE FROM document_chunks WHERE collection = %s AND file_id = %s AND id = ANY(%s)",
+                            (collection, file_id, list(removed_ids)))
+                removed = cur.rowcount
+            
+            if unchanged:
+                execute_values(cur, f"""
+                    UPDATE document_chunks d SET chunk_index = v.chunk_index
+                    FROM (VALUES %s) AS v(id, chunk_index)
+                    WHERE d.id = v.id AND d.file_id = {int(file_id)}
+                      AND d.chunk_index IS DISTINCT FROM v.chunk_index
+                """, unchanged)
+            
+            if new_chunks:
+                now = datetime.utcnow()
+                execute_values(cur, """
+                    INSERT INTO document_chunks (file_id, collection, content, content_zstd, embedding, chunk_index,
+                                                 content_hash, created_at)
+                    VALUES %s
+                """, [(file_id, collection, *self.codec.chunk_columns(chunk['content']), chunk['embedding'],
+                       chunk['index'], content_hash(chunk['content']), now) for chunk in new_chunks])
+            
+            chunk_count = old_chunk_count - removed + len(new_chunks)
+            cur.execute("""
+                UPDATE files
+                SET filename = %s, content_type = %s, file_size = %s, word_count = %s,
+                    original_file = %s, original_file_zstd = %s, anonymized = %s, anonymization_mapping = %s,
+                    metadata = COALESCE(%s, metadata), chunk_count = %s,
+                    content_hash = %s, alias_of = NULL
+                WHERE id = %s
+            """, (filename, content_type, file_size, word_count, *self.codec.file_columns(original_file_bytes),
+                  anonymized,
+                  json.dumps(anonymization_mapping) if anonymization_mapping else None,
+                  metadata, chunk_count, file_hash(original_file_bytes), file_id))
+            
+            if old_content_type == content_type and bool(old_anonymized) == bool(anonymized):
+                self._adjust_corpus_stats(cur, collection, content_type, anonymized,
+                                          chunks=chunk_count - old_chunk_count, words=word_count - old_word_count)
+            else:
+                self._adjust_corpus_stats(cur, collection, old_content_type, old_anonymized, files=-1,
+                                          chunks=-old_chunk_count, words=-old_word_count)
+                self._adjust_corpus_stats(cur, collection, content_type, anonymized, files=1,
+                                          chunks=chunk_count, words=word_count)
+            
+            conn.commit()
+            logger.info(f"✅ Replaced file ID {file_id}: {len(unchanged)} chunks kept, "
+                        f"{len(new_chunks)} added, {removed} removed")
+            return chunk_count
+            
+        except (EmbeddingVersionMismatch, FileChangedError):
+            if conn:
+                conn.rollback()
+            raise
+        except Exception as e:
+            logger.error(f"❌ Failed to replace file chunks: {e}")
+            if conn:
+                conn.rollback()
+            raise
+        finally:
+            if cur:
+                cur.close()
+            if conn:
+                conn.close()
+    
+    def _detach_aliases(self, cur, file_id: int, collection: str):
+        """
+        Before a file's chunks change, give its aliases the current version to keep: the oldest
+        alias becomes a file of its own with copies of the chunks (embeddings included) and the
+        original file, and the other aliases point at it instead.
+        """
+        cur.execute("""
+            SELECT id, content_type, anonymized FROM files
+            WHERE alias_of = %s AND deleted_at IS NULL
+            ORDER BY id
+            FOR UPDATE
+        """, (file_id,))
+        aliases = cur.fetchall()
+        if not aliases:
+            return
+        heir_id, content_type, anonymized = aliases[0]
+        cur.execute("""
+            INSERT INTO document_chunks (file_id, collection, content, content_zstd, embedding, chunk_index,
+                                         content_hash, created_at)
+            SELECT %s, collection, content, content_zstd, embedding, chunk_index, content_hash, created_at
+            FROM document_chunks
+            WHERE collection = %s AND file_id = %s
+        """, (heir_id, collection, file_id))
+        chunk_count = cur.rowcount
+        cur.execute("""
+            UPDATE files h
+            SET original_file = f.original_file, original_file_zstd = f.original_file_zstd,
+                anonymization_mapping = f.anonymization_mapping, content_hash = f.content_hash,
+                chunk_count = %s, alias_of = NULL
+            FROM files f
+            WHERE h.id = %s AND f.id = %s
+        """, (chunk_count, heir_id, file_id))
+        cur.execute("UPDATE files SET alias_of = %s WHERE alias_of = %s", (heir_id, file_id))
+        self._adjust_corpus_stats(cur, collection, content_type, anonymized, chunks=chunk_count)
+        logger.info(f"📎 File ID {heir_id} took over the chunks of file ID {file_id} for its {len(aliases)} aliases")
+    
+    def search_similar_chunks(self, query_embedding: List[float], limit: int = 5,
+                              with_embeddings: bool = False, binary_prefilter: Optional[bool] = None,
+                              oversampling: Optional[int] = None, collection: Optional[str] = None,
+                              embedding_version: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Search for similar chunks using vector similarity
+        
+        Args:
+            query_embedding: Embedding of the question
+            limit: Maximum number of chunks to return
+            with_embeddings: Also return each chunk's embedding as a NumPy array (for re-ranking)
+            binary_prefilter: Rank exactly instead of through the ANN index (default: BINARY_PREFILTER):
+                scan every chunk in scope, shortlist limit * oversampling by Hamming distance over
+                the binary-quantized embeddings, and re-rank those by exact cosine distance. Costs
+                a full scan, so it is meant for small collections, not for speeding up large ones.
+            oversampling: Shortlisted chunks per returned chunk for the exact re-rank (default: BINARY_PREFILTER_OVERSAMPLING)
+            collection: Only search this collection's partition (default: all collections)
+            embedding_version: Version the query was embedded with; raises
+                EmbeddingVersionMismatch if the stored embeddings are of another one
+        """
+        if binary_prefilter is None:
+            binary_prefilter = config.BINARY_PREFILTER
+        if oversampling is None:
+            oversampling = config.BINARY_PREFILTER_OVERSAMPLING
+        
+        conn = None
+        cur = None
+        try:
+            conn = self.get_connection()
+            if with_embeddings:
+                register_vector(conn)
+            cur = conn.cursor()
+            self._check_embedding_version(cur, embedding_version)
+            
+            # Convert the embedding list to a proper format for pgvector
+            embedding_str = '[' + ','.join(map(str, query_embedding)) + ']'
+            logger.info(f"🔍 Searching with embedding length: {len(query_embedding)}")
+            logger.info(f"🔍 Embedding string preview: {embedding_str[:100]}...")
+            
+            embedding_column = "dc.embedding" if with_embeddings else "NULL"
+            # A constant on the partition key lets the planner prune every other partition
+            collection_filter = "AND dc.collection = %s" if collection else ""
+            collection_params = [collection] if collection else []
+            if binary_prefilter:
+                # Exact re-rank, not an index: the shortlist reads only the 1-bit-per-dimension copy,
+                # but of every chunk in scope, and sorts them all by Hamming distance; the shortlist is
+                # then re-ranked against the full-precision embeddings. Cost grows with the collection.
+                query_bits = ''.join('1' if value > 0 else '0' for value in query_embedding)
+                cur.execute(f"""
+                    WITH candidates AS (
+                        SELECT dc.collection, dc.id
+                        FROM document_chunks dc
+                        JOIN files f ON dc.file_id = f.id
+                        WHERE dc.embedding_bq IS NOT NULL AND f.deleted_at IS NULL {collection_filter}
+                        ORDER BY bit_count(dc.embedding_bq # %s::BIT VARYING)
+                        LIMIT %s
+                    )
+                    SELECT dc.content, dc.chunk_index, f.filename, f.anonymized,
+                           (dc.embedding <=> %s::{self.embedding_type}) as similarity,
+                           {embedding_column}, dc.content_zstd
+                    FROM candidates c
+                    JOIN document_chunks dc ON dc.collection = c.collection AND dc.id = c.id
+                    JOIN files f ON dc.file_id = f.id
+                    ORDER BY similarity ASC
+                    LIMIT %s
+                """, (*collection_params, query_bits, limit * oversampling, embedding_str, limit))
+            else:
+                cur.execute(f"""
+                    SELECT dc.content, dc.chunk_index, f.filename, f.anonymized,
+                           (dc.embedding <=> %s::{self.embedding_type}) as similarity,
+                           {embedding_column}, dc.content_zstd
+                    FROM document_chunks dc
+                    JOIN files f ON dc.file_id = f.id
+                    WHERE dc.embedding IS NOT NULL AND f.deleted_at IS NULL {collection_filter}
+                    ORDER BY similarity ASC
+                    LIMIT %s
+                """, (embedding_str, *collection_params, limit))
+            
+            logger.info(f"🔍 Query executed, checking results...")
+            
+            results = []
+            for row in cur.fetchall():
+                result = {
+                    'content': self.codec.chunk_text(row[0], row[6]),
+                    'chunk_index': row[1],
+                    'filename': row[2],
+                    'anonymized': row[3],
+                    'similarity': float(row[4])
+                }
+                if with_embeddings:
+                    # Newer pgvector releases return Vector objects rather than arrays
+                    embedding = row[5]
+                    result['embedding'] = embedding.to_numpy() if hasattr(embedding, 'to_numpy') else embedding
+                results.append(result)
+            
+            return results
+            
+        except EmbeddingVersionMismatch:
+            raise
+        except Exception as e:
+            logger.error(f"❌ Failed to search similar chunks: {e}")
+            return []
+        finally:
+            if cur:
+                cur.close()
+            if conn:
+                conn.close()
+    
+    def search_similar_chunks_batch(self, query_embeddings: List[List[float]], limit: int = 5,
+                                    collection: Optional[str] = None,
+                                    embedding_version: Optional[str] = None) -> List[List[Dict[str, Any]]]:
         """
-        Insert file metadata and original file content, return the file ID
+        Search for the chunks most similar to each of many query embeddings in one round-trip
         
         Args:
-            filename: Name of the file
-            content_type: MIME type of the file
-            file_size: Size of the file in bytes
-            word_count: Number of words in the extracted text
-            original_file_bytes: Original file content as bytes (optional)
-            anonymized: Whether the file was anonymized
-            anonymization_mapping: Mapping of original values to aliases
-            metadata: Additional metadata as JSON string (optional)
+            query_embeddings: One embedding per question
+            limit: Maximum number of chunks per question
+            collection: Only search this collection's partition (default: all collections)
+            embedding_version: Version the queries were embedded with; raises
+                EmbeddingVersionMismatch if the stored embeddings are of another one
             
         Returns:
-            int: The file ID that was inserted
+            List of result lists, one per query embedding in input order
         """
+        results: List[List[Dict[str, Any]]] = [[] for _ in query_embeddings]
+        if not query_embeddings:
+            return results
+        
         conn = None
         cur = None
         try:
             conn = self.get_connection()
             cur = conn.cursor()
+            self._check_embedding_version(cur, embedding_version)
             
-            # Convert anonymization_mapping to JSON string if it exists
-            anonymization_mapping_json = json.dumps(anonymization_mapping) if anonymization_mapping else None
+            embedding_strs = ['[' + ','.join(map(str, embedding)) + ']' for embedding in query_embeddings]
+            collection_filter = "AND dc.collection = %s" if collection else ""
+            collection_params = [collection] if collection else []
+            
+            # One LATERAL top-k scan per query vector, all in a single statement
+            cur.execute(f"""
+                SELECT q.idx, r.content, r.chunk_index, r.filename, r.anonymized, r.similarity, r.content_zstd
+                FROM unnest(%s::{self.embedding_type}[]) WITH ORDINALITY AS q(embedding, idx)
+                CROSS JOIN LATERAL (
+                    SELECT dc.content, dc.chunk_index, f.filename, f.anonymized,
+                           (dc.embedding <=> q.embedding) AS similarity, dc.content_zstd
+                    FROM document_chunks dc
+                    JOIN files f ON dc.file_id = f.id
+                    WHERE dc.embedding IS NOT NULL AND f.deleted_at IS NULL {collection_filter}
+                    ORDER BY dc.embedding <=> q.embedding
+                    LIMIT %s
+                ) r
+                ORDER BY q.idx, r.similarity
+            """, (embedding_strs, *collection_params, limit))
+            
+            for row in cur.fetchall():
+                results[row[0] - 1].append({
+                    'content': self.codec.chunk_text(row[1], row[6]),
+                    'chunk_index': row[2],
+                    'filename': row[3],
+                    'anonymized': row[4],
+                    'similarity': float(row[5])
+                })
+            
+            return results
+            
+        except EmbeddingVersionMismatch:
+            raise
+        except Exception as e:
+            logger.error(f"❌ Failed to batch search similar chunks: {e}")
+            raise
+        finally:
+            if cur:
+                cur.close()
+            if conn:
+                conn.close()
+    
+    def _load_compression_dictionary(self, dict_id: int) -> Optional[bytes]:
+        conn = None
+        cur = None
+        try:
+            conn = self.get_connection()
+            cur = conn.cursor()
+            cur.execute("SELECT data FROM compression_dictionaries WHERE id = %s", (dict_id,))
+            row = cur.fetchone()
+            return bytes(row[0]) if row else None
+        finally:
+            if cur:
+                cur.close()
+            if conn:
+                conn.close()
+    
+    def _load_newest_compression_dictionary(self) -> Optional[Tuple[int, bytes]]:
+        conn = None
+        cur = None
+        try:
+            conn = self.get_connection()
+            cur = conn.cursor()
+            cur.execute("SELECT id, data FROM compression_dictionaries ORDER BY created_at DESC, id DESC LIMIT 1")
+            row = cur.fetchone()
+            return (row[0], bytes(row[1])) if row else None
+        finally:
+            if cur:
+                cur.close()
+            if conn:
+                conn.close()
+    
+    def train_compression_dictionary(self, samples: int = DB_CONSTANTS["COMPRESSION_TRAINING_SAMPLES"],
+                                     size: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Train a zstd dictionary on a random sample of stored chunks and compress new chunks
+        with it. Existing chunks keep the dictionary they were compressed with until
+        compress_stored_data(rewrite=True) recompresses them.
+        
+        Args:
+            samples: Chunks to train on
+            size: Maximum dictionary size in bytes (default: COMPRESSION_DICTIONARY_SIZE)
             
+        Returns:
+            The dictionary's ID and size, with the compression ratio it reaches on the sampled
+            chunks against compressing them without a dictionary
+        """
+        size = size or config.COMPRESSION_DICTIONARY_SIZE
+        conn = None
+        cur = None
+        try:
+            conn = self.get_connection()
+            cur = conn.cursor()
             cur.execute("""
-                INSERT INTO files (filename, content_type, file_size, word_count, original_file, 
-                                 anonymized, anonymization_mapping, metadata, created_at)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-                RETURNING id
-            """, (filename, content_type, file_size, word_count, original_file_bytes, 
-                  anonymized, anonymization_mapping_json, metadata, datetime.utcnow()))
+                SELECT content, content_zstd FROM document_chunks
+                ORDER BY random()
+                LIMIT %s
+            """, (samples,))
+            texts = [self.codec.chunk_text(content, content_zstd).encode("utf-8")
+                     for content, content_zstd in cur.fetchall()]
+            if len(texts) < DB_CONSTANTS["COMPRESSION_MIN_SAMPLES"]:
+                raise ValueError(f"Only {len(texts)} chunks to train on, at least "
+                                 f"{DB_CONSTANTS['COMPRESSION_MIN_SAMPLES']} are needed")
             
-            file_id = cur.fetchone()[0]
+            dict_id, data = self.codec.train_dictionary(texts, size)
+            cur.execute("""
+                INSERT INTO compression_dictionaries (id, data, samples) VALUES (%s, %s, %s)
+                ON CONFLICT (id) DO NOTHING
+            """, (dict_id, data, len(texts)))
             conn.commit()
-            logger.info(f"✅ Inserted file metadata and content for {filename} with ID {file_id}")
-            return file_id
+            self.codec.use_dictionary(dict_id, data)
+            
+            raw = sum(len(text) for text in texts)
+            with_dictionary = sum(len(self.codec.compress(text, dict_id)) for text in texts)
+            without_dictionary = sum(len(self.codec.compress(text)) for text in texts)
+            logger.info(f"✅ Trained compression dictionary {dict_id} on {len(texts)} chunks")
+            return {
+                'id': dict_id,
+                'size': len(data),
+                'samples': len(texts),
+                'sample_bytes': raw,
+                'ratio': raw / with_dictionary,
+                'ratio_without_dictionary': raw / without_dictionary,
+            }
             
         except Exception as e:
-            logger.error(f"❌ Failed to insert file metadata: {e}")
             if conn:
                 conn.rollback()
+            logger.error(f"❌ Failed to train compression dictionary: {e}")
             raise
         finally:
             if cur:
@@ -73,45 +1524,102 @@ class DatabaseService:
             if conn:
                 conn.close()
     
-    def insert_document_chunks(self, file_id: int, chunks: List[Dict[str, Any]]) -> int:
+    def compress_stored_data(self, batch_size: int = DB_CONSTANTS["COMPRESSION_BATCH_SIZE"],
+                             rewrite: bool = False, stop_event: Optional[threading.Event] = None,
+                             progress: Optional[Callable[[Dict[str, int]], None]] = None) -> Dict[str, int]:
         """
-        Insert document chunks with their embeddings
+        Compress chunks and original files stored before compression was switched on, one
+        batch per transaction, so it can be stopped and run again at any point.
         
         Args:
-            file_id: The ID of the file these chunks belong to
-            chunks: List of dicts with 'content' and 'embedding' keys
+            batch_size: Rows compressed per transaction
+            rewrite: Also recompress chunks compressed with another dictionary than the
+                newest one (or with none, before a dictionary was trained)
+            stop_event: Stop after the current batch once this is set
+            progress: Called with the counts so far after every committed batch
             
         Returns:
-            int: Number of chunks inserted
+            Number of chunks and files compressed
         """
+        from psycopg2.extras import execute_values
+        
+        if not self.codec.enabled:
+            raise ValueError("Stored data is only compressed with STORAGE_COMPRESSION=zstd")
+        dict_id = self.codec.current_dictionary()
+        counts = {'chunks': 0, 'files': 0}
         conn = None
         cur = None
         try:
             conn = self.get_connection()
             cur = conn.cursor()
             
-            inserted_count = 0
-            for chunk in chunks:
+            stopped = lambda: stop_event is not None and stop_event.is_set()
+            last_id = 0
+            while not stopped():
                 cur.execute("""
-                    INSERT INTO document_chunks (file_id, content, embedding, chunk_index, created_at)
-                    VALUES (%s, %s, %s, %s, %s)
-                """, (
-                    file_id,
-                    chunk['content'],
-                    chunk['embedding'],
-                    chunk.get('index', 0),
-                    datetime.utcnow()
-                ))
-                inserted_count += 1
+                    SELECT id, content, content_zstd FROM document_chunks
+                    WHERE id > %s AND (content IS NOT NULL OR %s)
+                    ORDER BY id
+                    LIMIT %s
+                """, (last_id, rewrite, batch_size))
+                rows = cur.fetchall()
+                if not rows:
+                    break
+                last_id = rows[-1][0]
+                updates = [
+                    (chunk_id, self.codec.compress(self.codec.chunk_text(content, content_zstd).encode("utf-8"), dict_id))
+                    for chunk_id, content, content_zstd in rows
+                    if content_zstd is None or self.codec.frame_dictionary(bytes(content_zstd)) != dict_id
+                ]
+                if updates:
+                    execute_values(cur, """
+                        UPDATE document_chunks d SET content = NULL, content_zstd = v.content_zstd
+                        FROM (VALUES %s) AS v(id, content_zstd)
+                        WHERE d.id = v.id
+                    """, updates)
+                conn.commit()
+                counts['chunks'] += len(updates)
+                if progress:
+                    progress(counts)
             
-            conn.commit()
-            logger.info(f"✅ Inserted {inserted_count} chunks for file ID {file_id}")
-            return inserted_count
+            # Files can be large, so they're read one at a time
+            last_id = 0
+            while not stopped():
+                cur.execute("""
+                    SELECT id FROM files
+                    WHERE id > %s AND original_file IS NOT NULL
+                    ORDER BY id
+                    LIMIT %s
+                """, (last_id, batch_size))
+                file_ids = [row[0] for row in cur.fetchall()]
+                if not file_ids:
+                    break
+                last_id = file_ids[-1]
+                for file_id in file_ids:
+                    cur.execute("SELECT original_file FROM files WHERE id = %s AND original_file IS NOT NULL", (file_id,))
+                    row = cur.fetchone()
+                    if not row:
+                        continue
+                    original_file, original_file_zstd = self.codec.file_columns(bytes(row[0]))
+                    if original_file_zstd is None:
+                        continue  # Doesn't compress, kept as it is
+                    cur.execute("""
+                        UPDATE files SET original_file = NULL, original_file_zstd = %s
+                        WHERE id = %s AND original_file IS NOT NULL
+                    """, (original_file_zstd, file_id))
+                    counts['files'] += cur.rowcount
+                conn.commit()
+                if progress:
+                    progress(counts)
+            
+            logger.info(f"✅ Compressed {counts['chunks']} stored chunks and {counts['files']} files"
+                        + (" before being stopped" if stopped() else ""))
+            return counts
             
         except Exception as e:
-            logger.error(f"❌ Failed to insert document chunks: {e}")
             if conn:
                 conn.rollback()
+            logger.error(f"❌ Failed to compress stored data: {e}")
             raise
         finally:
             if cur:
@@ -119,46 +1627,68 @@ class DatabaseService:
             if conn:
                 conn.close()
     
-    def search_similar_chunks(self, query_embedding: List[float], limit: int = 5) -> List[Dict[str, Any]]:
-        """Search for similar chunks using vector similarity"""
+    def get_compression_stats(self) -> Dict[str, Any]:
+        """How much of the stored chunk text and original files is compressed, and the space each takes"""
         conn = None
         cur = None
         try:
             conn = self.get_connection()
             cur = conn.cursor()
             
-            # Convert the embedding list to a proper format for pgvector
-            embedding_str = '[' + ','.join(map(str, query_embedding)) + ']'
-            logger.info(f"🔍 Searching with embedding length: {len(query_embedding)}")
-            logger.info(f"🔍 Embedding string preview: {embedding_str[:100]}...")
-            
+            # pg_column_size is the size as stored, after any TOAST compression
             cur.execute("""
-                SELECT dc.content, dc.chunk_index, f.filename, f.anonymized,
-                       (dc.embedding <=> %s::vector) as similarity
-                FROM document_chunks dc
-                JOIN files f ON dc.file_id = f.id
-                WHERE dc.embedding IS NOT NULL
-                ORDER BY similarity ASC
-                LIMIT %s
-            """, (embedding_str, limit))
-            
-            logger.info(f"🔍 Query executed, checking results...")
-            
-            results = []
-            for row in cur.fetchall():
-                results.append({
-                    'content': row[0],
-                    'chunk_index': row[1],
-                    'filename': row[2],
-                    'anonymized': row[3],
-                    'similarity': float(row[4])
-                })
+                SELECT COUNT(*) FILTER (WHERE content_zstd IS NULL), COUNT(*) FILTER (WHERE content_zstd IS NOT NULL),
+                       COALESCE(SUM(pg_column_size(content)), 0)::BIGINT, COALESCE(SUM(pg_column_size(content_zstd)), 0)::BIGINT
+                FROM document_chunks
+            """)
+            chunks = cur.fetchone()
+            cur.execute("""
+                SELECT COUNT(*) FILTER (WHERE original_file IS NOT NULL), COUNT(*) FILTER (WHERE original_file_zstd IS NOT NULL),
+                       COALESCE(SUM(pg_column_size(original_file)), 0)::BIGINT, COALESCE(SUM(pg_column_size(original_file_zstd)), 0)::BIGINT,
+                       COALESCE(SUM(file_size) FILTER (WHERE original_file_zstd IS NOT NULL), 0)::BIGINT
+                FROM files
+            """)
+            files = cur.fetchone()
+            cur.execute("""
+                SELECT (SELECT COALESCE(SUM(pg_total_relation_size(partition_name::regclass)), 0)::BIGINT FROM collections),
+                       pg_total_relation_size('files')
+            """)
+            chunk_table_bytes, file_table_bytes = cur.fetchone()
+            cur.execute("""
+                SELECT id, octet_length(data), samples, created_at
+                FROM compression_dictionaries
+                ORDER BY created_at DESC, id DESC
+            """)
+            dictionaries = [
+                {'id': d[0], 'size': d[1], 'samples': d[2], 'created_at': d[3].isoformat() if d[3] else None}
+                for d in cur.fetchall()
+            ]
             
-            return results
+            return {
+                'codec': config.STORAGE_COMPRESSION,
+                'level': self.codec.level,
+                'dictionary': dictionaries[0]['id'] if dictionaries else None,
+                'chunks': {
+                    'plain': chunks[0],
+                    'compressed': chunks[1],
+                    'plain_bytes': chunks[2],
+                    'compressed_bytes': chunks[3],
+                    'table_bytes': chunk_table_bytes,
+                },
+                'files': {
+                    'plain': files[0],
+                    'compressed': files[1],
+                    'plain_bytes': files[2],
+                    'compressed_bytes': files[3],
+                    'compressed_original_bytes': files[4],
+                    'table_bytes': file_table_bytes,
+                },
+                'dictionaries': dictionaries,
+            }
             
         except Exception as e:
-            logger.error(f"❌ Failed to search similar chunks: {e}")
-            return []
+            logger.error(f"❌ Failed to get compression stats: {e}")
+            raise
         finally:
             if cur:
                 cur.close()
@@ -166,29 +1696,41 @@ class DatabaseService:
                 conn.close()
     
     def get_file_stats(self) -> Dict[str, Any]:
-        """Get basic statistics about the database"""
+        """Get corpus statistics from the maintained counters"""
         conn = None
         cur = None
         try:
             conn = self.get_connection()
             cur = conn.cursor()
             
-            # Get file count
-            cur.execute("SELECT COUNT(*) FROM files")
-            file_count = cur.fetchone()[0]
-            
-            # Get chunk count
-            cur.execute("SELECT COUNT(*) FROM document_chunks")
-            chunk_count = cur.fetchone()[0]
+            cur.execute("SELECT file_count, chunk_count, total_words FROM corpus_stats WHERE id = 1")
+            row = cur.fetchone()
+            if row is None:
+                # Counter row missing (schema not migrated yet), fall back to full aggregates
+                return self._aggregate_file_stats(cur)
             
-            # Get total word count
-            cur.execute("SELECT COALESCE(SUM(word_count), 0) FROM files")
-            total_words = cur.fetchone()[0]
+            cur.execute("""
+                SELECT content_type, anonymized, file_count, chunk_count, total_words
+                FROM corpus_stats_breakdown
+                WHERE file_count > 0
+                ORDER BY content_type, anonymized
+            """)
+            breakdown = [
+                {
+                    'content_type': b[0],
+                    'anonymized': b[1],
+                    'file_count': b[2],
+                    'chunk_count': b[3],
+                    'total_words': b[4]
+                }
+                for b in cur.fetchall()
+            ]
             
             return {
-                'file_count': file_count,
-                'chunk_count': chunk_count,
-                'total_words': total_words
+                'file_count': row[0],
+                'chunk_count': row[1],
+                'total_words': row[2],
+                'breakdown': breakdown
             }
             
         except Exception as e:
@@ -199,6 +1741,173 @@ class DatabaseService:
                 cur.close()
             if conn:
                 conn.close()
+    
+    def get_corpus_version(self) -> int:
+        """A number that changes whenever files or chunks are added, replaced or removed"""
+        conn = None
+        cur = None
+        try:
+            conn = self.get_connection()
+            cur = conn.cursor()
+            cur.execute("SELECT version FROM corpus_stats WHERE id = 1")
+            row = cur.fetchone()
+            return row[0] if row else 0
+        finally:
+            if cur:
+                cur.close()
+            if conn:
+                conn.close()
+    
+    def _aggregate_file_stats(self, cur) -> Dict[str, Any]:
+        """Compute the basic statistics with full aggregates, ignoring files pending deletion"""
+        # Get file count
+        cur.execute("SELECT COUNT(*) FROM files WHERE deleted_at IS NULL")
+        file_count = cur.fetchone()[0]
+        
+        # Get chunk count
+        cur.execute("""
+            SELECT COUNT(*) FROM document_chunks dc
+            JOIN files f ON dc.file_id = f.id
+            WHERE f.deleted_at IS NULL
+        """)
+        chunk_count = cur.fetchone()[0]
+        
+        # Get total word count
+        cur.execute("SELECT COALESCE(SUM(word_count), 0) FROM files WHERE deleted_at IS NULL")
+        total_words = cur.fetchone()[0]
+        
+        return {
+            'file_count': file_count,
+            'chunk_count': chunk_count,
+            'total_words': total_words
+        }
+    
+    def reconcile_corpus_stats(self) -> Dict[str, int]:
+        """
+        Recompute the maintained corpus counters from the base tables and correct any drift.
+        
+        The counters and the full aggregates are read from one REPEATABLE READ snapshot, where
+        every write is either fully visible (rows and counter deltas, which commit together) or
+        not at all, so their difference is exactly the drift. Only correcting that drift then
+        takes the counter row lock, briefly: writes made since the snapshot are kept, and the
+        slow aggregates never block writers.
+        
+        Returns:
+            Dict of the drift that was corrected (maintained minus actual), per counter
+        """
+        conn = None
+        cur = None
+        try:
+            conn = self.get_connection()
+            cur = conn.cursor()
+            
+            cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+            cur.execute("SELECT file_count, chunk_count, total_words FROM corpus_stats WHERE id = 1")
+            maintained = cur.fetchone() or (0, 0, 0)
+            actual = self._aggregate_file_stats(cur)
+            cur.execute("""
+                SELECT content_type, anonymized, file_count, chunk_count, total_words
+                FROM corpus_stats_breakdown
+            """)
+            maintained_breakdown = {(row[0], row[1]): row[2:] for row in cur.fetchall()}
+            cur.execute("""
+                SELECT f.content_type, COALESCE(f.anonymized, FALSE), COUNT(*),
+                       COALESCE(SUM(c.chunk_count), 0), COALESCE(SUM(f.word_count), 0)
+                FROM files f
+                LEFT JOIN (
+                    SELECT file_id, COUNT(*) AS chunk_count
+                    FROM document_chunks
+                    GROUP BY file_id
+                ) c ON c.file_id = f.id
+                WHERE f.deleted_at IS NULL
+                GROUP BY f.content_type, COALESCE(f.anonymized, FALSE)
+            """)
+            actual_breakdown = {(row[0], row[1]): row[2:] for row in cur.fetchall()}
+            cur.execute("SELECT collection, file_count, chunk_count FROM collection_stats")
+            maintained_collections = {row[0]: row[1:] for row in cur.fetchall()}
+            cur.execute("""
+                SELECT f.collection, COUNT(*), COALESCE(SUM(c.chunk_count), 0)
+                FROM files f
+                LEFT JOIN (
+                    SELECT file_id, COUNT(*) AS chunk_count
+                    FROM document_chunks
+                    GROUP BY file_id
+                ) c ON c.file_id = f.id
+                WHERE f.deleted_at IS NULL
+                GROUP BY f.collection
+            """)
+            actual_collections = {row[0]: row[1:] for row in cur.fetchall()}
+            conn.commit()
+            
+            drift = {
+                'file_count': maintained[0] - actual['file_count'],
+                'chunk_count': maintained[1] - actual['chunk_count'],
+                'total_words': maintained[2] - actual['total_words']
+            }
+            breakdown_drift = []
+            for key in maintained_breakdown.keys() | actual_breakdown.keys():
+                counts = maintained_breakdown.get(key, (0, 0, 0))
+                actual_counts = actual_breakdown.get(key, (0, 0, 0))
+                delta = [int(m - a) for m, a in zip(counts, actual_counts)]
+                if any(delta):
+                    breakdown_drift.append((key[0], key[1], *delta))
+            collection_drift = []
+            for collection in maintained_collections.keys() | actual_collections.keys():
+                counts = maintained_collections.get(collection, (0, 0))
+                actual_counts = actual_collections.get(collection, (0, 0))
+                delta = [int(m - a) for m, a in zip(counts, actual_counts)]
+                if any(delta):
+                    collection_drift.append((collection, *delta))
+            
+            if any(drift.values()) or breakdown_drift or collection_drift:
+                # Subtracted rather than overwritten, so writes since the snapshot are kept
+                cur.execute("""
+                    INSERT INTO corpus_stats (id) VALUES (1)
+                    ON CONFLICT (id) DO NOTHING
+                """)
+                cur.execute("""
+                    UPDATE corpus_stats
+                    SET file_count = file_count - %s, chunk_count = chunk_count - %s, total_words = total_words - %s
+                    WHERE id = 1
+                """, (drift['file_count'], drift['chunk_count'], drift['total_words']))
+                for content_type, anonymized, files, chunks, words in breakdown_drift:
+                    cur.execute("""
+                        INSERT INTO corpus_stats_breakdown (content_type, anonymized, file_count, chunk_count, total_words)
+                        VALUES (%s, %s, %s, %s, %s)
+                        ON CONFLICT (content_type, anonymized) DO UPDATE
+                        SET file_count = corpus_stats_breakdown.file_count + EXCLUDED.file_count,
+                            chunk_count = corpus_stats_breakdown.chunk_count + EXCLUDED.chunk_count,
+                            total_words = corpus_stats_breakdown.total_words + EXCLUDED.total_words
+                    """, (content_type, anonymized, -files, -chunks, -words))
+                for collection, files, chunks in collection_drift:
+                    cur.execute("""
+                        INSERT INTO collection_stats (collection, file_count, chunk_count)
+                        VALUES (%s, %s, %s)
+                        ON CONFLICT (collection) DO UPDATE
+                        SET file_count = collection_stats.file_count + EXCLUDED.file_count,
+                            chunk_count = collection_stats.chunk_count + EXCLUDED.chunk_count
+                    """, (collection, -files, -chunks))
+                conn.commit()
+            
+            if any(drift.values()):
+                logger.warning(f"⚠️ Corrected corpus stats drift: {drift}")
+            elif breakdown_drift or collection_drift:
+                logger.warning(f"⚠️ Corrected corpus stats drift in {len(breakdown_drift)} content types "
+                               f"and {len(collection_drift)} collections")
+            else:
+                logger.info("✅ Corpus stats reconciled, no drift")
+            return drift
+            
+        except Exception as e:
+            logger.error(f"❌ Failed to reconcile corpus stats: {e}")
+            if conn:
+                conn.rollback()
+            raise
+        finally:
+            if cur:
+                cur.close()
+            if conn:
+                conn.close()
 
     def get_all_files(self) -> List[Dict[str, Any]]:
         """Get all files with their metadata"""
@@ -210,8 +1919,9 @@ class DatabaseService:
             
             cur.execute("""
                 SELECT id, filename, content_type, file_size, word_count, 
-                       anonymized, created_at
+                       anonymized, created_at, collection
                 FROM files
+                WHERE deleted_at IS NULL
                 ORDER BY created_at DESC
             """)
             
@@ -224,7 +1934,8 @@ class DatabaseService:
                     'file_size': row[3],
                     'word_count': row[4],
                     'anonymized': row[5],
-                    'created_at': row[6].isoformat() if row[6] else None
+                    'created_at': row[6].isoformat() if row[6] else None,
+                    'collection': row[7]
                 })
             
             return files
@@ -238,6 +1949,92 @@ class DatabaseService:
             if conn:
                 conn.close()
 
+    def get_files_page(self, limit: int = DB_CONSTANTS["FILES_PAGE_SIZE"], cursor: Optional[str] = None,
+                       fields: Optional[List[str]] = None, collection: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Get one page of files, newest first, using keyset pagination on (created_at, id)
+        
+        Args:
+            limit: Maximum number of files to return
+            cursor: Opaque cursor from a previous page's next_cursor (optional)
+            fields: Subset of FILE_LIST_FIELDS to return (optional, defaults to all)
+            collection: Only list files of this collection (optional, defaults to all)
+            
+        Returns:
+            Dict with 'files', 'next_cursor' (None on the last page) and 'total'
+        """
+        fields = fields or DB_CONSTANTS["FILE_LIST_FIELDS"]
+        unknown = [f for f in fields if f not in DB_CONSTANTS["FILE_LIST_FIELDS"]]
+        if unknown:
+            raise ValueError(f"Unknown file fields: {', '.join(unknown)}")
+        if 'id' not in fields:
+            fields = ['id'] + fields
+        
+        # id and created_at are always selected since the next cursor is built from them
+        columns = ['id', 'created_at'] + [f for f in fields if f not in ('id', 'created_at')]
+        
+        conn = None
+        cur = None
+        try:
+            conn = self.get_connection()
+            cur = conn.cursor()
+            
+            # Column names come from the whitelist above, never from the request
+            query = f"SELECT {', '.join(columns)} FROM files WHERE deleted_at IS NULL"
+            params: List[Any] = []
+            if collection:
+                query += " AND collection = %s"
+                params.append(collection)
+            if cursor:
+                query += " AND (created_at, id) < (%s, %s)"
+                params.extend(decode_files_cursor(cursor))
+            query += " ORDER BY created_at DESC, id DESC LIMIT %s"
+            # Fetch one extra row to know whether another page exists
+            params.append(limit + 1)
+            
+            cur.execute(query, params)
+            rows = cur.fetchall()
+            
+            next_cursor = None
+            if len(rows) > limit:
+                rows = rows[:limit]
+                next_cursor = encode_files_cursor(rows[-1][1], rows[-1][0])
+            
+            files = []
+            for row in rows:
+                record = dict(zip(columns, row))
+                if record['created_at']:
+                    record['created_at'] = record['created_at'].isoformat()
+                files.append({field: record[field] for field in fields})
+            
+            if collection:
+                cur.execute("SELECT file_count FROM collection_stats WHERE collection = %s", (collection,))
+            else:
+                cur.execute("SELECT file_count FROM corpus_stats WHERE id = 1")
+            counter = cur.fetchone()
+            if counter is None:
+                # Counter row missing (schema not migrated yet, or a collection with no files yet)
+                if collection:
+                    cur.execute("SELECT COUNT(*) FROM files WHERE collection = %s AND deleted_at IS NULL", (collection,))
+                else:
+                    cur.execute("SELECT COUNT(*) FROM files WHERE deleted_at IS NULL")
+                counter = cur.fetchone()
+            
+            return {
+                'files': files,
+                'next_cursor': next_cursor,
+                'total': counter[0]
+            }
+            
+        except Exception as e:
+            logger.error(f"❌ Failed to get files page: {e}")
+            raise
+        finally:
+            if cur:
+                cur.close()
+            if conn:
+                conn.close()
+
     def get_file_content(self, file_id: int) -> Optional[str]:
         """Get the full content of a file by combining all its chunks"""
         conn = None
@@ -248,10 +2045,12 @@ class DatabaseService:
             
             # Get all chunks for the file, ordered by chunk_index
             cur.execute("""
-                SELECT content 
-                FROM document_chunks 
-                WHERE file_id = %s 
-                ORDER BY chunk_index
+                SELECT dc.content, dc.content_zstd
+                FROM files a
+                JOIN files f ON f.id = COALESCE(a.alias_of, a.id)
+                JOIN document_chunks dc ON dc.file_id = f.id
+                WHERE a.id = %s AND a.deleted_at IS NULL AND f.deleted_at IS NULL
+                ORDER BY dc.chunk_index
             """, (file_id,))
             
             chunks = cur.fetchall()
@@ -259,7 +2058,7 @@ class DatabaseService:
                 return None
             
             # Combine all chunks into full content
-            full_content = '\n'.join([chunk[0] for chunk in chunks])
+            full_content = '\n'.join([self.codec.chunk_text(*chunk) for chunk in chunks])
             return full_content
             
         except Exception as e:
@@ -281,9 +2080,9 @@ class DatabaseService:
             
             cur.execute("""
                 SELECT id, filename, content_type, file_size, word_count, 
-                       anonymized, anonymization_mapping, created_at
+                       anonymized, anonymization_mapping, created_at, collection
                 FROM files
-                WHERE id = %s
+                WHERE id = %s AND deleted_at IS NULL
             """, (file_id,))
             
             row = cur.fetchone()
@@ -298,7 +2097,8 @@ class DatabaseService:
                 'word_count': row[4],
                 'anonymized': row[5],
                 'anonymization_mapping': row[6],
-                'created_at': row[7].isoformat() if row[7] else None
+                'created_at': row[7].isoformat() if row[7] else None,
+                'collection': row[8]
             }
             
         except Exception as e:
@@ -318,17 +2118,19 @@ class DatabaseService:
             conn = self.get_connection()
             cur = conn.cursor()
             
+            # Aliases of a duplicate upload keep no copy of their own
             cur.execute("""
-                SELECT original_file
-                FROM files
-                WHERE id = %s
+                SELECT COALESCE(a.original_file, f.original_file), COALESCE(a.original_file_zstd, f.original_file_zstd)
+                FROM files a
+                LEFT JOIN files f ON f.id = a.alias_of
+                WHERE a.id = %s AND a.deleted_at IS NULL
             """, (file_id,))
             
             row = cur.fetchone()
-            if not row or not row[0]:
+            if not row or not (row[0] or row[1]):
                 return None
             
-            return row[0]
+            return self.codec.file_bytes(row[0], row[1])
             
         except Exception as e:
             logger.error(f"❌ Failed to get original file: {e}")
@@ -339,45 +2141,129 @@ class DatabaseService:
             if conn:
                 conn.close()
 
-    def delete_file(self, file_id: int) -> bool:
+    def delete_file(self, file_id: int, background: bool = False) -> bool:
         """Delete a file and all its associated chunks"""
+        try:
+            return file_id in self.delete_files([file_id], background=background)
+        except Exception:
+            return False
+
+    def delete_files(self, file_ids: List[int], background: bool = False) -> List[int]:
+        """
+        Delete many files at once
+        
+        Args:
+            file_ids: IDs of the files to delete (their aliases are deleted with them)
+            background: If True, only tombstone the files (instant, hidden from search and
+                listings right away) and leave chunk removal to purge_deleted_files.
+                Otherwise delete the rows now and let ON DELETE CASCADE remove the chunks.
+            
+        Returns:
+            List[int]: IDs of the files that were deleted or tombstoned
+        """
+        if not file_ids:
+            return []
+        
         conn = None
         cur = None
         try:
             conn = self.get_connection()
             cur = conn.cursor()
             
-            # First, check if the file exists
-            cur.execute("SELECT id FROM files WHERE id = %s", (file_id,))
-            if not cur.fetchone():
-                return False
+            if background:
+                cur.execute("""
+                    UPDATE files SET deleted_at = NOW()
+                    WHERE (id = ANY(%s) OR alias_of = ANY(%s)) AND deleted_at IS NULL
+                    RETURNING id, content_type, anonymized, word_count, chunk_count, NULL, collection
+                """, (list(file_ids), list(file_ids)))
+            else:
+                # Aliases go with the file whose chunks they share
+                cur.execute("""
+                    DELETE FROM files
+                    WHERE id = ANY(%s) OR alias_of = ANY(%s)
+                    RETURNING id, content_type, anonymized, word_count, chunk_count, deleted_at, collection
+                """, (list(file_ids), list(file_ids)))
+            rows = cur.fetchall()
+            
+            # Tombstoned files already left the counters when they were tombstoned
+            for _, content_type, anonymized, word_count, chunk_count, deleted_at, collection in rows:
+                if deleted_at is None:
+                    self._adjust_corpus_stats(cur, collection, content_type, anonymized, files=-1,
+                                              chunks=-(chunk_count or 0), words=-(word_count or 0))
+            
+            conn.commit()
+            
+            deleted_ids = [row[0] for row in rows]
+            action = "Tombstoned" if background else "Deleted"
+            logger.info(f"✅ {action} {len(deleted_ids)} of {len(file_ids)} requested files")
+            return deleted_ids
+            
+        except Exception as e:
+            logger.error(f"❌ Failed to delete files: {e}")
+            if conn:
+                conn.rollback()
+            raise
+        finally:
+            if cur:
+                cur.close()
+            if conn:
+                conn.close()
+
+    def purge_deleted_files(self, batch_size: int = DB_CONSTANTS["DELETE_BATCH_SIZE"]) -> int:
+        """
+        Remove the chunks of tombstoned files in bounded batches, then the file rows.
+        Each batch commits on its own so no single transaction holds many row locks.
+        
+        Returns:
+            int: Number of file rows removed
+        """
+        conn = None
+        cur = None
+        try:
+            conn = self.get_connection()
+            cur = conn.cursor()
             
-            # Delete all chunks associated with this file
-            cur.execute("DELETE FROM document_chunks WHERE file_id = %s", (file_id,))
-            chunks_deleted = cur.rowcount
+            cur.execute("SELECT id FROM files WHERE deleted_at IS NOT NULL ORDER BY deleted_at")
+            tombstoned_ids = [row[0] for row in cur.fetchall()]
+            if not tombstoned_ids:
+                return 0
             
-            # Delete the file itself
-            cur.execute("DELETE FROM files WHERE id = %s", (file_id,))
-            file_deleted = cur.rowcount
+            chunks_deleted = 0
+            while True:
+                cur.execute("""
+                    DELETE FROM document_chunks
+                    WHERE id IN (
+                        SELECT id FROM document_chunks
+                        WHERE file_id = ANY(%s)
+                        LIMIT %s
+                    )
+                """, (tombstoned_ids, batch_size))
+                batch_deleted = cur.rowcount
+                conn.commit()
+                chunks_deleted += batch_deleted
+                if batch_deleted < batch_size:
+                    break
             
+            cur.execute("DELETE FROM files WHERE id = ANY(%s) AND deleted_at IS NOT NULL", (tombstoned_ids,))
+            files_deleted = cur.rowcount
             conn.commit()
             
-            logger.info(f"✅ Deleted file ID {file_id} and {chunks_deleted} associated chunks")
-            return file_deleted > 0
+            logger.info(f"✅ Purged {files_deleted} tombstoned files and {chunks_deleted} chunks")
+            return files_deleted
             
         except Exception as e:
-            logger.error(f"❌ Failed to delete file: {e}")
+            logger.error(f"❌ Failed to purge deleted files: {e}")
             if conn:
                 conn.rollback()
-            return False
+            raise
         finally:
             if cur:
                 cur.close()
             if conn:
                 conn.close()
 
-    def get_all_anonymization_mappings(self) -> Dict[str, str]:
-        """Get all anonymization mappings from all files"""
+    def get_all_anonymization_mappings(self, collection: Optional[str] = None) -> Dict[str, str]:
+        """Get all anonymization mappings from all files (of one collection, if given)"""
         conn = None
         cur = None
         try:
@@ -387,8 +2273,9 @@ class DatabaseService:
             cur.execute("""
                 SELECT anonymization_mapping
                 FROM files
-                WHERE anonymized = true AND anonymization_mapping IS NOT NULL
-            """)
+                WHERE anonymized = true AND anonymization_mapping IS NOT NULL AND deleted_at IS NULL
+                  AND (%s::VARCHAR IS NULL OR collection = %s)
+            """, (collection, collection))
             
             all_mappings = {}
             for row in cur.fetchall():
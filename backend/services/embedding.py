@@ -1,29 +1,110 @@
 # services/embedding.py
-import openai
 import os
+from typing import Optional
 from dotenv import load_dotenv
+from config import config
+from constants import EMBEDDING_CONSTANTS
+from services.lazy import Lazy
+from services.metrics import API_ERRORS
+from services.rag import count_tokens
+from services.rate_limit import RateLimitTimeout, call_with_limit, embedding_limiter
 
 # Load environment variables from .env file
 load_dotenv()
 
-# Set your OpenAI API key
-openai.api_key = os.getenv("OPENAI_API_KEY")
 
-def get_embedding(text: str) -> list:
+def _create_client():
+    # The openai package is imported on first use to keep API startup fast
+    import openai
+    return openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+
+# Initialize the client lazily
+client = Lazy(_create_client, "OpenAI embeddings client")
+
+
+# Embedding version new embeddings are made with. Starts from the configuration and then
+# follows the active row of embedding_versions, which a re-embedding job can switch.
+active_version = {
+    "version": None,
+    "model": config.OPENAI_EMBEDDING_MODEL,
+    "dimensions": config.EMBEDDING_DIMENSIONS,
+}
+
+
+def set_active_version(version: str, model: str, dimensions: int):
+    """Embed with this version from now on"""
+    if active_version["version"] != version:
+        print(f"🔁 Embedding with {version}")
+    active_version.update(version=version, model=model, dimensions=dimensions)
+
+
+def embedding_request_options(model: Optional[str] = None, dimensions: Optional[int] = None) -> dict:
+    """
+    Model and size arguments for embeddings.create, defaulting to the active version.
+    `dimensions` is only sent when it shortens the native output of a model known to
+    support that (SHORTENABLE_MODELS), since older models such as ada-002 reject it.
+    """
+    if model is None:
+        model = active_version["model"]
+        dimensions = dimensions or active_version["dimensions"]
+    options = {"model": model}
+    native = EMBEDDING_CONSTANTS["MODEL_DIMENSIONS"].get(model)
+    if dimensions and dimensions != native and model in EMBEDDING_CONSTANTS["SHORTENABLE_MODELS"]:
+        options["dimensions"] = dimensions
+    return options
+
+
+def get_embedding(text: str, priority: str = "interactive") -> list:
     """
     This function takes a text string and returns its embedding using OpenAI's API.
+    The call waits its turn in the shared rate limiter ("interactive" before "bulk") and
+    raises RateLimitTimeout if it can't be sent before the priority's deadline.
     """
     try:
         # Request the embedding from OpenAI
-        response = openai.embeddings.create(
-            model="text-embedding-ada-002",  # Use the 'text-embedding-ada-002' model for embeddings
-            input=text
+        options = embedding_request_options()
+        response = call_with_limit(
+            embedding_limiter, count_tokens(text),
+            lambda: client.embeddings.create(input=text, **options),
+            priority=priority
         )
         
         return response.data[0].embedding
+    except RateLimitTimeout:
+        API_ERRORS.labels("embedding").inc()
+        raise
     except Exception as e:
         print(f"Error while generating embedding: {e}")
+        API_ERRORS.labels("embedding").inc()
         return []  # Return an empty list if there was an error
 
 
+def get_embeddings(texts: list, model: Optional[str] = None, dimensions: Optional[int] = None,
+                   priority: str = "interactive") -> list:
+    """
+    Embed many texts with a single API call. Returns one embedding per text,
+    in input order, or an empty list if there was an error. Uses the active
+    version unless a model (and size) is given. Rate limited like get_embedding.
+    """
+    if not texts:
+        return []
+    try:
+        options = embedding_request_options(model, dimensions)
+        response = call_with_limit(
+            embedding_limiter, sum(count_tokens(text) for text in texts),
+            lambda: client.embeddings.create(input=texts, **options),
+            priority=priority
+        )
+        
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+    except RateLimitTimeout:
+        API_ERRORS.labels("embedding").inc()
+        raise
+    except Exception as e:
+        print(f"Error while generating embeddings: {e}")
+        API_ERRORS.labels("embedding").inc()
+        return []
+
+
 
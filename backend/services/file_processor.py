@@ -5,6 +5,8 @@ from typing import Optional, Dict, Any
 import PyPDF2
 import io
 
+from services.word import extract_word_text
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -19,8 +21,15 @@ class FileProcessor:
             'text/markdown': self._process_text,
             'text/csv': self._process_csv,
             'application/json': self._process_json,
+            'application/msword': self._process_word,
+            'application/vnd.openxmlformats-officedocument.wordprocessingml.document': self._process_word,
             # Add more file types as needed
         }
+        # Types extracted one paragraph per block, chunked along those paragraphs
+        self.paragraph_types = {
+            'application/msword',
+            'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+        }
     
     def process_file(self, file_content: bytes, content_type: str, filename: str) -> Dict[str, Any]:
         """
@@ -52,6 +61,7 @@ class FileProcessor:
                 'word_count': word_count,
                 'filename': filename,
                 'content_type': content_type,
+                'paragraphs': content_type in self.paragraph_types,
                 'status': 'processed'
             }
             
@@ -63,6 +73,7 @@ class FileProcessor:
                 'word_count': 0,
                 'filename': filename,
                 'content_type': content_type,
+                'paragraphs': False,
                 'status': 'error',
                 'error': str(e)
             }
@@ -82,6 +93,11 @@ class FileProcessor:
             logger.error(f"Error processing PDF: {e}")
             return ""
     
+    def _process_word(self, file_content: bytes) -> str:
+        """Extract text from Word files (.docx streamed, or legacy .doc), one paragraph per block"""
+        # Errors propagate, so an unreadable document is reported instead of stored empty
+        return extract_word_text(file_content)
+    
     def _process_text(self, file_content: bytes) -> str:
         """Extract text from plain text files"""
         try:
@@ -0,0 +1,46 @@
+# services/lazy.py
+import time
+import logging
+import threading
+from typing import Callable, Generic, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class Lazy(Generic[T]):
+    """
+    Thread-safe lazy initialization of a heavy component.
+    
+    The factory runs once, on first attribute access or get(), under a lock so
+    concurrent first callers wait for the same instance instead of building their own.
+    Attribute access is proxied, so a Lazy can stand in for the object it wraps.
+    """
+    
+    def __init__(self, factory: Callable[[], T], name: str):
+        self._factory = factory
+        self._name = name
+        self._instance: Optional[T] = None
+        self._lock = threading.Lock()
+        self.load_seconds: Optional[float] = None
+    
+    @property
+    def loaded(self) -> bool:
+        return self._instance is not None
+    
+    def get(self) -> T:
+        instance = self._instance
+        if instance is not None:
+            return instance
+        with self._lock:
+            if self._instance is None:
+                started = time.perf_counter()
+                self._instance = self._factory()
+                self.load_seconds = time.perf_counter() - started
+                logger.info(f"⚡ Loaded {self._name} in {self.load_seconds:.2f}s")
+            return self._instance
+    
+    def __getattr__(self, item):
+        # Only called for attributes not found on the Lazy itself
+        return getattr(self.get(), item)
@@ -0,0 +1,190 @@
+# services/llm.py
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from services.metrics import LLM_ATTEMPTS, LLM_LATENCY
+from services.rate_limit import RateLimitTimeout, RateLimiter, call_with_limit
+
+logger = logging.getLogger(__name__)
+
+# Latencies needed before a model's p95 is trusted for hedging and fallback decisions
+MIN_LATENCY_SAMPLES = 20
+
+
+class LLMDeadlineExceeded(Exception):
+    """No attempt produced an answer before the request's deadline"""
+
+
+class LatencyWindow:
+    """Latencies of the most recent successful calls per model"""
+    
+    def __init__(self, size: int = 200):
+        self.size = size
+        self.samples: Dict[str, Deque[float]] = {}
+        self.lock = threading.Lock()
+    
+    def record(self, model: str, seconds: float):
+        with self.lock:
+            self.samples.setdefault(model, deque(maxlen=self.size)).append(seconds)
+    
+    def quantile(self, model: str, q: float) -> Optional[float]:
+        """The q-quantile of the model's recent latencies, or None until there are enough"""
+        with self.lock:
+            samples = sorted(self.samples.get(model, ()))
+        if len(samples) < MIN_LATENCY_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+class LLMClient:
+    """
+    Chat completions bounded by a per-request deadline. Every attempt goes through the
+    chat rate limiter and gets the time left as its HTTP timeout, so no call outlives
+    the request that made it.
+    
+    With hedging on, a second attempt is sent once the first has taken longer than the
+    model's recent p95, and whichever answers first wins. When a fallback model is set,
+    attempts started with less time left than the main model's p95 use it instead. An
+    attempt that fails is retried once the same way if time allows.
+    
+    The loser of a hedge is abandoned, not cancelled (the SDK can't abort a request in
+    flight); it ends by its timeout at the latest and still counts toward the latencies.
+    """
+    
+    def __init__(self, client: Any, limiter: RateLimiter, model: str, fallback_model: Optional[str] = None,
+                 timeout: float = 30.0, hedging: bool = False, hedge_delay: float = 2.0, max_workers: int = 32):
+        self.client = client
+        self.limiter = limiter
+        self.model = model
+        self.fallback_model = fallback_model or None
+        self.timeout = timeout
+        self.hedging = hedging
+        self.hedge_delay = hedge_delay  # Used until the model has enough recorded latencies
+        self.latencies = LatencyWindow()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm")
+    
+    def _pick_model(self, remaining: float) -> str:
+        p95 = self.latencies.quantile(self.model, 0.95)
+        if self.fallback_model and p95 is not None and remaining < p95:
+            return self.fallback_model
+        return self.model
+    
+    def _hedge_after(self) -> float:
+        p95 = self.latencies.quantile(self.model, 0.95)
+        return p95 if p95 is not None else self.hedge_delay
+    
+    def _attempt(self, model: str, messages: List[Dict[str, str]], quota_tokens: int,
+                 deadline: float, **params) -> str:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise LLMDeadlineExceeded(f"No time left for a {model} attempt")
+        # Retries are left to the caller; the SDK's own would ignore the deadline
+        client = self.client.with_options(timeout=remaining, max_retries=0)
+        response = call_with_limit(
+            self.limiter, quota_tokens,
+            lambda: client.chat.completions.create(model=model, messages=messages, **params),
+            timeout=remaining
+        )
+        return response.choices[0].message.content.strip()
+    
+    def _start(self, kind: str, deadline: float, messages: List[Dict[str, str]],
+               quota_tokens: int, params: Dict[str, Any]) -> Tuple[Future, Tuple[str, str]]:
+        model = self._pick_model(deadline - time.monotonic())
+        started = time.monotonic()
+        future = self.executor.submit(self._attempt, model, messages, quota_tokens, deadline, **params)
+        
+        def finished(done: Future):
+            if not done.cancelled() and done.exception() is None:
+                elapsed = time.monotonic() - started
+                self.latencies.record(model, elapsed)
+                LLM_LATENCY.labels(model).observe(elapsed)
+        
+        future.add_done_callback(finished)
+        return future, (kind, model)
+    
+    def complete(self, messages: List[Dict[str, str]], quota_tokens: int,
+                 timeout: Optional[float] = None, **params) -> str:
+        """
+        Get a chat completion before the deadline
+        
+        Args:
+            messages: Chat messages to send
+            quota_tokens: Tokens the call counts against the rate limit (prompt and answer)
+            timeout: Seconds the whole call may take (default: the client's timeout)
+            **params: Passed on to chat.completions.create (max_tokens, temperature, ...)
+        
+        Raises:
+            LLMDeadlineExceeded: No attempt answered in time
+            RateLimitTimeout: The rate limiter couldn't admit any attempt in time
+        """
+        started = time.monotonic()
+        deadline = started + (timeout if timeout is not None else self.timeout)
+        attempts: Dict[Future, Tuple[str, str]] = {}  # Future -> (kind, model)
+        
+        def start(kind: str):
+            future, attempt = self._start(kind, deadline, messages, quota_tokens, params)
+            attempts[future] = attempt
+            return future
+        
+        pending = {start("first")}
+        spare_attempt = True  # One hedge or retry per request
+        hedge_at = started + self._hedge_after() if self.hedging else None
+        last_error: Optional[Exception] = None
+        
+        while True:
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            wake_at = deadline if hedge_at is None or not spare_attempt else min(deadline, hedge_at)
+            done, pending = wait(pending, timeout=max(0.0, wake_at - now), return_when=FIRST_COMPLETED)
+            
+            for future in done:
+                kind, model = attempts[future]
+                try:
+                    answer = future.result()
+                except Exception as e:
+                    LLM_ATTEMPTS.labels(kind, model, "failed").inc()
+                    logger.warning(f"⚠️ LLM {kind} attempt with {model} failed: {e}")
+                    last_error = e
+                    continue
+                LLM_ATTEMPTS.labels(kind, model, "won").inc()
+                for loser in pending:
+                    LLM_ATTEMPTS.labels(*attempts[loser], "abandoned").inc()
+                return answer
+            
+            if not pending:
+                # Retrying is pointless when the limiter already said it can't admit a call in time
+                if not spare_attempt or isinstance(last_error, RateLimitTimeout) or time.monotonic() >= deadline:
+                    break
+                spare_attempt = False
+                pending = {start("retry")}
+            elif spare_attempt and hedge_at is not None and time.monotonic() >= hedge_at:
+                spare_attempt = False
+                pending.add(start("hedge"))
+        
+        for loser in pending:
+            LLM_ATTEMPTS.labels(*attempts[loser], "abandoned").inc()
+        if last_error is not None and time.monotonic() < deadline:
+            raise last_error  # Failed outright, with time to spare
+        raise LLMDeadlineExceeded(f"No answer within {deadline - started:.1f}s") from last_error
+    
+    def stats(self) -> Dict[str, Any]:
+        models = [self.model] + ([self.fallback_model] if self.fallback_model else [])
+        return {
+            "model": self.model,
+            "fallback_model": self.fallback_model,
+            "timeout": self.timeout,
+            "hedging": self.hedging,
+            "hedge_after": round(self._hedge_after(), 3),
+            "latency": {
+                model: {
+                    "p50": self.latencies.quantile(model, 0.5),
+                    "p95": self.latencies.quantile(model, 0.95),
+                }
+                for model in models
+            },
+        }
@@ -0,0 +1,120 @@
+# services/metrics.py
+#
+# Under gunicorn every worker has its own metric values. gunicorn.conf.py then sets
+# PROMETHEUS_MULTIPROC_DIR (before prometheus_client is imported), where each worker
+# writes its values to files, and /metrics adds up the files of all workers.
+import os
+from contextlib import contextmanager
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest
+from prometheus_client.multiprocess import MultiProcessCollector
+
+# Per-stage latency of the /ask and /ingest pipelines
+STAGE_DURATION = Histogram(
+    "unboxed_stage_duration_seconds",
+    "Time spent in each pipeline stage",
+    ["pipeline", "stage"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+)
+
+CHUNKS_EMBEDDED = Counter(
+    "unboxed_chunks_embedded_total",
+    "Chunks embedded during ingestion"
+)
+
+CHUNKS_REUSED = Counter(
+    "unboxed_chunks_reused_total",
+    "Unchanged chunks kept with their embedding when a file was replaced"
+)
+
+NER_CACHE_LOOKUPS = Counter(
+    "unboxed_ner_cache_lookups_total",
+    "Text segments looked up in the NER cache during anonymization",
+    ["result"]
+)
+
+API_ERRORS = Counter(
+    "unboxed_openai_errors_total",
+    "Failed OpenAI API calls",
+    ["operation"]
+)
+
+OPENAI_QUEUE_DEPTH = Gauge(
+    "unboxed_openai_queue_depth",
+    "OpenAI calls waiting for the client-side rate limiter",
+    ["limiter", "priority"],
+    multiprocess_mode="livesum"
+)
+
+OPENAI_QUEUE_WAIT = Histogram(
+    "unboxed_openai_queue_wait_seconds",
+    "Time OpenAI calls waited for the client-side rate limiter",
+    ["limiter", "priority"],
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+)
+
+OPENAI_RATE_LIMITED = Counter(
+    "unboxed_openai_rate_limited_total",
+    "OpenAI calls answered with 429 and queued again",
+    ["limiter"]
+)
+
+LLM_ATTEMPTS = Counter(
+    "unboxed_llm_attempts_total",
+    "Chat completion attempts by kind (first, hedge, retry), model and outcome (won, failed, abandoned)",
+    ["kind", "model", "outcome"]
+)
+
+LLM_LATENCY = Histogram(
+    "unboxed_llm_latency_seconds",
+    "Latency of successful chat completion attempts, including abandoned hedges",
+    ["model"],
+    buckets=(0.1, 0.25, 0.5, 1, 2, 3, 5, 7.5, 10, 15, 20, 30, 60)
+)
+
+REQUESTS_COALESCED = Counter(
+    "unboxed_requests_coalesced_total",
+    "Requests answered by joining an identical request already in flight",
+    ["pipeline"]
+)
+
+DB_CONNECTIONS_OPENED = Counter(
+    "unboxed_db_connections_opened_total",
+    "Database connections opened"
+)
+
+REQUESTS_IN_FLIGHT = Gauge(
+    "unboxed_requests_in_flight",
+    "Requests currently being handled",
+    ["endpoint"],
+    multiprocess_mode="livesum"
+)
+
+STARTUP_SECONDS = Gauge(
+    "unboxed_startup_seconds",
+    "Seconds from importing the app until it was ready to serve, and until warm-up finished",
+    ["phase"],
+    multiprocess_mode="max"
+)
+
+COMPONENT_LOAD_SECONDS = Gauge(
+    "unboxed_component_load_seconds",
+    "Seconds taken to load a lazily initialized component",
+    ["component"],
+    multiprocess_mode="max"
+)
+
+
+@contextmanager
+def stage_timer(pipeline: str, stage: str):
+    """Record the duration of the enclosed block as one pipeline stage"""
+    with STAGE_DURATION.labels(pipeline, stage).time():
+        yield
+
+
+def render_metrics() -> bytes:
+    """The metrics in the Prometheus text format, summed over all workers in multiprocess mode"""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
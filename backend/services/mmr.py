@@ -0,0 +1,57 @@
+# services/mmr.py
+from typing import List, Dict, Any
+import numpy as np
+
+
+def mmr_select(query_embedding, candidate_embeddings, k: int, lambda_mult: float = 0.5) -> List[int]:
+    """
+    Pick k candidates by maximal marginal relevance.
+    
+    Each step takes the candidate with the best trade-off between similarity to the
+    query and dissimilarity to what has already been picked:
+    lambda_mult * sim(query, c) - (1 - lambda_mult) * max(sim(c, picked))
+    
+    Args:
+        query_embedding: Query vector
+        candidate_embeddings: One vector per candidate
+        k: Number of candidates to pick
+        lambda_mult: 1.0 ranks purely by relevance, 0.0 purely by diversity
+        
+    Returns:
+        List[int]: Indices of the picked candidates, in pick order
+    """
+    candidates = np.asarray(candidate_embeddings, dtype=np.float32)
+    if candidates.ndim != 2 or len(candidates) == 0 or k <= 0:
+        return []
+    
+    query = np.asarray(query_embedding, dtype=np.float32)
+    candidates = candidates / np.maximum(np.linalg.norm(candidates, axis=1, keepdims=True), 1e-12)
+    query = query / max(np.linalg.norm(query), 1e-12)
+    
+    relevance = candidates @ query
+    first = int(np.argmax(relevance))
+    selected = [first]
+    # Highest similarity of every candidate to anything selected so far
+    redundancy = candidates @ candidates[first]
+    
+    for _ in range(min(k, len(candidates)) - 1):
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[selected] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        redundancy = np.maximum(redundancy, candidates @ candidates[best])
+    
+    return selected
+
+
+def mmr_rerank(query_embedding, candidates: List[Dict[str, Any]], k: int,
+               lambda_mult: float = 0.5) -> List[Dict[str, Any]]:
+    """
+    Re-rank over-fetched chunks (with an 'embedding' key) into a diverse top-k.
+    The embeddings are dropped from the returned chunks.
+    """
+    picked = mmr_select(query_embedding, [c['embedding'] for c in candidates], k, lambda_mult)
+    return [
+        {key: value for key, value in candidates[i].items() if key != 'embedding'}
+        for i in picked
+    ]
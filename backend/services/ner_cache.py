@@ -0,0 +1,136 @@
+# services/ner_cache.py
+import os
+import json
+import hashlib
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from services.metrics import NER_CACHE_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+# Entity spans of one segment: (start_char, end_char, label) relative to the segment
+Spans = Tuple[Tuple[int, int, str], ...]
+
+
+class NerCache:
+    """
+    LRU cache of NER results per text segment, keyed by a hash of the segment and the model
+    version, so boilerplate that recurs across documents only goes through spaCy once.
+    
+    Entries live in memory (up to max_entries) and, when a path is given, also in a SQLite
+    file that survives restarts and is shared by all workers on the machine. Only hashes and
+    offsets are stored, never the text itself. Safe to use from several threads.
+    
+    The SQLite connection is opened on first use in each process, so a cache created before
+    gunicorn forks its workers (preload_app) never shares a connection between them.
+    """
+    
+    def __init__(self, max_entries: int, path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[bytes, Spans]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.path = path
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_pid: Optional[int] = None  # Process the connection was opened in
+    
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        """This process's connection to the cache file, opened on first use (call with the lock held)"""
+        if not self.path or not self.enabled:
+            return None
+        if self._db_pid != os.getpid():
+            # A connection inherited across fork is left alone; SQLite handles mustn't cross processes
+            self._db_pid = os.getpid()
+            self._db = None
+            try:
+                db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+                db.execute("PRAGMA journal_mode=WAL")
+                db.execute("CREATE TABLE IF NOT EXISTS ner_spans (key BLOB PRIMARY KEY, spans TEXT NOT NULL)")
+                self._db = db
+            except sqlite3.Error as e:
+                logger.warning(f"⚠️ Could not open the NER cache file {self.path}, caching in memory only: {e}")
+        return self._db
+    
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+    
+    @staticmethod
+    def key(segment: str, model_version: str) -> bytes:
+        return hashlib.sha256(f"{model_version}\0{segment}".encode("utf-8")).digest()
+    
+    def get_many(self, keys: List[bytes]) -> Dict[bytes, Spans]:
+        """Cached spans for whichever of these keys are known (memory first, then the file)"""
+        if not self.enabled:
+            return {}
+        
+        found: Dict[bytes, Spans] = {}
+        with self.lock:
+            for key in keys:
+                spans = self.entries.get(key)
+                if spans is not None:
+                    self.entries.move_to_end(key)
+                    found[key] = spans
+            
+            missing = list({key for key in keys if key not in found})
+            db = self._connection() if missing else None
+            if db:
+                try:
+                    for start in range(0, len(missing), 500):
+                        batch = missing[start:start + 500]
+                        rows = db.execute(
+                            f"SELECT key, spans FROM ner_spans WHERE key IN ({','.join('?' * len(batch))})", batch
+                        ).fetchall()
+                        for key, spans_json in rows:
+                            spans = tuple(tuple(span) for span in json.loads(spans_json))
+                            self._remember(bytes(key), spans)
+                            found[bytes(key)] = spans
+                except sqlite3.Error as e:
+                    # The segments missed are run through spaCy instead
+                    logger.warning(f"⚠️ Could not read NER cache entries: {e}")
+            
+            hits = sum(1 for key in keys if key in found)
+            self.hits += hits
+            self.misses += len(keys) - hits
+        
+        NER_CACHE_LOOKUPS.labels("hit").inc(hits)
+        NER_CACHE_LOOKUPS.labels("miss").inc(len(keys) - hits)
+        return found
+    
+    def put_many(self, items: Dict[bytes, Spans]):
+        if not self.enabled or not items:
+            return
+        with self.lock:
+            for key, spans in items.items():
+                self._remember(key, spans)
+            db = self._connection()
+            if db:
+                try:
+                    db.executemany("INSERT OR REPLACE INTO ner_spans (key, spans) VALUES (?, ?)",
+                                   [(key, json.dumps(spans)) for key, spans in items.items()])
+                except sqlite3.Error as e:
+                    # Losing persistence only costs future hits, so never fail anonymization over it
+                    logger.warning(f"⚠️ Could not persist NER cache entries: {e}")
+    
+    def _remember(self, key: bytes, spans: Spans):
+        self.entries[key] = spans
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+    
+    def stats(self) -> Dict[str, float]:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "persistent": self._db is not None and self._db_pid == os.getpid(),
+            }
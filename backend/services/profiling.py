@@ -0,0 +1,156 @@
+# services/profiling.py
+import io
+import os
+import asyncio
+import functools
+import time
+import uuid
+import random
+import marshal
+import pstats
+import cProfile
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Executor
+from contextvars import ContextVar, copy_context
+from datetime import datetime
+from typing import Dict, Any, Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Profilers of the worker threads the profiled request handed work to; None outside it
+_thread_profilers: ContextVar[Optional[List[cProfile.Profile]]] = ContextVar("thread_profilers", default=None)
+
+
+class RequestProfiler:
+    """
+    Opt-in deterministic profiling of single requests with cProfile.
+    
+    A request is profiled when profiling is enabled and either it carries the
+    profile header or it is picked by the sampling rate. Finished profiles are kept
+    in memory (most recent max_stored) and optionally written to profile_dir as
+    .pstats files, which snakeviz, flameprof or `python -m pstats` can open.
+    
+    Profiles are process-wide: the event-loop thread is profiled as a whole, so a profile
+    also counts other requests' coroutines that ran meanwhile, and only one request per
+    process is profiled at a time (others asking for it are served unprofiled). Work the
+    request hands to threads through to_thread() is profiled in those threads too.
+    """
+    
+    HEADER = "x-profile"
+    
+    def __init__(self, enabled: bool = False, sample_rate: float = 0.0,
+                 max_stored: int = 20, profile_dir: Optional[str] = None):
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.max_stored = max_stored
+        self.profile_dir = profile_dir
+        self._profiles: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._active = False
+        self._token = None
+    
+    def should_profile(self, headers) -> bool:
+        """Decide whether to profile a request; cheap when profiling is off"""
+        if not self.enabled:
+            return False
+        if headers.get(self.HEADER, "").lower() in ("1", "true", "yes"):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+    
+    def start(self) -> Optional[cProfile.Profile]:
+        """Start profiling the current request, or return None if another one is being profiled"""
+        with self._lock:
+            if self._active:
+                return None
+            self._active = True
+        self._token = _thread_profilers.set([])
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+    
+    def call_profiled(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Call func, under a profiler of its own when the calling request is being profiled"""
+        thread_profilers = _thread_profilers.get()
+        if thread_profilers is None:
+            return func(*args, **kwargs)
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Python 3.12+ profiles through sys.monitoring, which covers every thread already
+            return func(*args, **kwargs)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profiler.disable()
+            with self._lock:
+                thread_profilers.append(profiler)
+    
+    async def to_thread(self, func: Callable[..., Any], *args, executor: Optional[Executor] = None, **kwargs) -> Any:
+        """
+        asyncio.to_thread that the profile of the calling request follows into the thread.
+        Runs in the given executor instead of the event loop's default one, if any.
+        """
+        if executor is None:
+            return await asyncio.to_thread(self.call_profiled, func, *args, **kwargs)
+        call = functools.partial(copy_context().run, self.call_profiled, func, *args, **kwargs)
+        return await asyncio.get_running_loop().run_in_executor(executor, call)
+    
+    def finish(self, profiler: cProfile.Profile, method: str, path: str, started: float) -> str:
+        """Stop a profiler and store its results, returning the profile ID"""
+        profiler.disable()
+        duration_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            thread_profilers = list(_thread_profilers.get() or [])
+            self._active = False
+        _thread_profilers.reset(self._token)
+        # Loading into pstats.Stats snapshots the profiler again and empties it,
+        # so the stats are serialised from the Stats object instead
+        summary = io.StringIO()
+        stats = pstats.Stats(profiler, stream=summary)
+        for thread_profiler in thread_profilers:
+            stats.add(thread_profiler)
+        pstats_bytes = marshal.dumps(stats.stats)
+        stats.sort_stats("cumulative").print_stats(40)
+        
+        profile_id = uuid.uuid4().hex[:12]
+        record = {
+            'id': profile_id,
+            'method': method,
+            'path': path,
+            'duration_ms': round(duration_ms, 2),
+            'created_at': datetime.utcnow().isoformat(),
+            'pstats': pstats_bytes,
+            'summary': summary.getvalue()
+        }
+        
+        if self.profile_dir:
+            try:
+                os.makedirs(self.profile_dir, exist_ok=True)
+                with open(os.path.join(self.profile_dir, f"{profile_id}.pstats"), "wb") as f:
+                    f.write(pstats_bytes)
+            except OSError as e:
+                logger.error(f"❌ Failed to write profile {profile_id}: {e}")
+        
+        with self._lock:
+            self._profiles[profile_id] = record
+            while len(self._profiles) > self.max_stored:
+                self._profiles.popitem(last=False)
+        
+        logger.info(f"🔬 Profiled {method} {path} in {duration_ms:.0f} ms (profile {profile_id})")
+        return profile_id
+    
+    def list_profiles(self) -> List[Dict[str, Any]]:
+        """Metadata of the stored profiles, newest first"""
+        with self._lock:
+            records = list(self._profiles.values())
+        return [
+            {key: record[key] for key in ('id', 'method', 'path', 'duration_ms', 'created_at')}
+            for record in reversed(records)
+        ]
+    
+    def get_profile(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._profiles.get(profile_id)
@@ -1,35 +1,169 @@
-import openai
 import os
+import re
+import time
+import logging
+from functools import lru_cache
+from typing import List, Dict, Any, Tuple
+import tiktoken
 from dotenv import load_dotenv
+from config import config
 from constants import FILE_CONSTANTS, MESSAGES
+from services.lazy import Lazy
+from services.llm import LLMClient
+from services.metrics import API_ERRORS
+from services.rate_limit import RateLimitTimeout, chat_limiter
 
 load_dotenv()
 
-# Initialize the client
-client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+logger = logging.getLogger(__name__)
+
+def _create_client():
+    # The openai package is imported on first use to keep API startup fast
+    import openai
+    return openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+
+# Initialize the client lazily
+client = Lazy(_create_client, "OpenAI chat client")
+
+# Deadlines, hedging and fallback for chat completions
+llm = LLMClient(
+    client,
+    chat_limiter,
+    config.OPENAI_MODEL,
+    fallback_model=config.OPENAI_FALLBACK_MODEL,
+    timeout=config.LLM_TIMEOUT,
+    hedging=config.LLM_HEDGING,
+    hedge_delay=config.LLM_HEDGE_DELAY,
+)
+
+# Sentence boundaries used when a chunk has to be trimmed to fit the budget
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+')
+CONTEXT_SEPARATOR = "\n\n"
+# Seconds to estimate token counts after a tokenizer failed to load, before trying again
+ENCODING_RETRY_SECONDS = 60
+
+# When each model's tokenizer last failed to load
+_encoding_failures: Dict[str, float] = {}
+
+
+@lru_cache(maxsize=None)
+def _load_encoding(model: str):
+    """Load the tokenizer for a model (errors are raised, so they are not cached)"""
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def _get_encoding(model: str):
+    """The tokenizer for a model, or None while it cannot be loaded"""
+    failed_at = _encoding_failures.get(model)
+    if failed_at is not None and time.monotonic() - failed_at < ENCODING_RETRY_SECONDS:
+        return None
+    try:
+        encoding = _load_encoding(model)
+    except Exception as e:
+        # Encodings are downloaded on first use; without network access fall back to an estimate
+        if failed_at is None:
+            logger.warning(f"⚠️ Could not load tokenizer for {model}, estimating token counts: {e}")
+        _encoding_failures[model] = time.monotonic()
+        return None
+    _encoding_failures.pop(model, None)
+    return encoding
+
+
+def count_tokens(text: str, model: str = config.OPENAI_MODEL) -> int:
+    """Count the tokens in text with the model's tokenizer"""
+    encoding = _get_encoding(model)
+    if encoding is None:
+        # Roughly four characters per token for English text
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text))
+
+
+def _trim_to_sentences(text: str, token_budget: int, model: str) -> Tuple[str, int]:
+    """Keep as many leading whole sentences of text as fit in token_budget"""
+    # Each sentence and the space joining it are counted once; tokens rarely merge across
+    # the space, so the total matches counting the joined text, or slightly overestimates it
+    space_tokens = count_tokens(" ", model)
+    kept = []
+    tokens_used = 0
+    for sentence in SENTENCE_BOUNDARY.split(text):
+        sentence_tokens = count_tokens(sentence, model) + (space_tokens if kept else 0)
+        if tokens_used + sentence_tokens > token_budget:
+            break
+        kept.append(sentence)
+        tokens_used += sentence_tokens
+    return " ".join(kept), tokens_used
+
+
+def pack_context(context_chunks: List[Dict[str, Any]], token_budget: int = config.CONTEXT_TOKEN_BUDGET,
+                 model: str = config.OPENAI_MODEL) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Fill a token budget with context chunks in relevance order.
+    
+    Chunks are taken whole while they fit. The first chunk that does not fit is
+    trimmed at a sentence boundary to use up the remaining budget, and packing stops.
+    
+    Args:
+        context_chunks: Retrieved chunks, most relevant first
+        token_budget: Maximum number of context tokens
+        model: Model whose tokenizer is used for counting
+        
+    Returns:
+        Tuple of (chunks that fit, possibly with the last one trimmed, tokens used)
+    """
+    separator_tokens = count_tokens(CONTEXT_SEPARATOR, model)
+    packed = []
+    tokens_used = 0
+    
+    for chunk in context_chunks:
+        remaining = token_budget - tokens_used - (separator_tokens if packed else 0)
+        if remaining <= 0:
+            break
+        
+        chunk_tokens = count_tokens(chunk['content'], model)
+        if chunk_tokens <= remaining:
+            packed.append(chunk)
+            tokens_used += chunk_tokens + (separator_tokens if len(packed) > 1 else 0)
+            continue
+        
+        trimmed, trimmed_tokens = _trim_to_sentences(chunk['content'], remaining, model)
+        if trimmed:
+            packed.append({**chunk, 'content': trimmed, 'trimmed': True})
+            tokens_used += trimmed_tokens + (separator_tokens if len(packed) > 1 else 0)
+        break
+    
+    return packed, tokens_used
 
 
 def generate_rag_answer(prompt: str) -> str:
     """
     Send the RAG prompt to OpenAI's completion API and get back an answer.
+    Raises RateLimitTimeout if the chat rate limiter can't admit the call in time;
+    an answer that misses LLM_TIMEOUT comes back as the RAG error message.
     """
     try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",  
-            messages=[
+        # The quota counts the prompt and the most the answer can take
+        return llm.complete(
+            [
                 {
                     "role": "user",
                     "content": prompt
                 }
             ],
+            count_tokens(prompt) + FILE_CONSTANTS["MAX_TOKENS"],
             max_tokens=FILE_CONSTANTS["MAX_TOKENS"],  # Limit response length
             temperature=FILE_CONSTANTS["TEMPERATURE"]  # Balance between creativity and accuracy
         )
         
-        return response.choices[0].message.content.strip()
-        
+    except RateLimitTimeout:
+        API_ERRORS.labels("chat_completion").inc()
+        raise
     except Exception as e:
         print(f"Error generating RAG answer: {e}")
+        API_ERRORS.labels("chat_completion").inc()
         return MESSAGES["RAG_ERROR"]
 
 
@@ -38,7 +172,7 @@ def create_rag_prompt(question: str, context_chunks: list) -> str:
     Create a prompt for the LLM that includes the question and relevant context.
     """
     # Combine all context chunks into one context string
-    context = "\n\n".join([chunk['content'] for chunk in context_chunks])
+    context = CONTEXT_SEPARATOR.join([chunk['content'] for chunk in context_chunks])
     
     prompt = f"""You are a helpful assistant that answers questions based on the provided context. Use the context below to answer the question. 
 
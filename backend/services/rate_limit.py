@@ -0,0 +1,206 @@
+# services/rate_limit.py
+import time
+import heapq
+import itertools
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from config import config
+from services.metrics import OPENAI_QUEUE_DEPTH, OPENAI_QUEUE_WAIT, OPENAI_RATE_LIMITED
+
+logger = logging.getLogger(__name__)
+
+# Lower rank is admitted first: user-facing calls never queue behind bulk ingestion
+PRIORITIES = {"interactive": 0, "bulk": 1}
+
+
+class RateLimitTimeout(Exception):
+    """A call could not be admitted before its deadline"""
+    
+    def __init__(self, limiter: str, priority: str, retry_after: float):
+        super().__init__(f"{limiter} rate limit: {priority} call not admitted before its deadline")
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Refills at rate_per_minute, holding at most burst_seconds worth"""
+    
+    def __init__(self, rate_per_minute: float, burst_seconds: float):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(self.rate * burst_seconds, 1.0)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+    
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    def time_until(self, amount: float, now: float) -> float:
+        """Seconds until amount can be taken (a call larger than the bucket waits for a full bucket)"""
+        self._refill(now)
+        needed = min(amount, self.capacity)
+        return max(0.0, (needed - self.level) / self.rate)
+    
+    def take(self, amount: float, now: float):
+        # May go negative for oversized calls; the debt delays the calls after it
+        self._refill(now)
+        self.level -= amount
+
+
+class RateLimiter:
+    """
+    Client-side admission control for one OpenAI quota: token buckets for requests and
+    tokens per minute, and a priority queue in front of them. Callers block until their call
+    fits the budget, interactive before bulk (first come, first served within a priority),
+    or raise RateLimitTimeout once their deadline can no longer be met.
+    
+    A 429 from the API pauses the whole limiter for its Retry-After, since the server's
+    view of the quota (shared with other clients of the key) is the one that counts.
+    
+    Limiters are per process and don't coordinate, so the module-level ones below each get
+    1/OPENAI_RATE_LIMIT_PROCESSES of the configured limits; 429s catch any overshoot.
+    """
+    
+    def __init__(self, name: str, requests_per_minute: float, tokens_per_minute: float,
+                 burst_seconds: float = 10.0):
+        self.name = name
+        self.requests = TokenBucket(requests_per_minute, burst_seconds) if requests_per_minute > 0 else None
+        self.tokens = TokenBucket(tokens_per_minute, burst_seconds) if tokens_per_minute > 0 else None
+        self.paused_until = 0.0
+        self.condition = threading.Condition()
+        self.waiting = []  # Heap of (priority rank, arrival) of queued calls
+        self.arrivals = itertools.count()
+        self.admitted = {priority: 0 for priority in PRIORITIES}
+        self.timed_out = {priority: 0 for priority in PRIORITIES}
+    
+    def _time_until_admitted(self, tokens: int, now: float) -> float:
+        wait = max(0.0, self.paused_until - now)
+        if self.requests:
+            wait = max(wait, self.requests.time_until(1, now))
+        if self.tokens:
+            wait = max(wait, self.tokens.time_until(tokens, now))
+        return wait
+    
+    def acquire(self, tokens: int, priority: str = "interactive", deadline: Optional[float] = None) -> float:
+        """
+        Wait until a call of this many tokens may be sent
+        
+        Args:
+            tokens: Estimated tokens the call consumes
+            priority: "interactive" or "bulk"
+            deadline: time.monotonic() by which the call must be admitted (None waits forever)
+        
+        Returns:
+            float: Seconds spent waiting
+        """
+        entry = (PRIORITIES[priority], next(self.arrivals))
+        started = time.monotonic()
+        with self.condition:
+            heapq.heappush(self.waiting, entry)
+            OPENAI_QUEUE_DEPTH.labels(self.name, priority).inc()
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = None  # Not first in line: sleep until the queue moves
+                    if self.waiting[0] == entry:
+                        wait = self._time_until_admitted(tokens, now)
+                        if wait <= 0:
+                            if self.requests:
+                                self.requests.take(1, now)
+                            if self.tokens:
+                                self.tokens.take(tokens, now)
+                            self.admitted[priority] += 1
+                            OPENAI_QUEUE_WAIT.labels(self.name, priority).observe(now - started)
+                            return now - started
+                    if deadline is not None:
+                        remaining = deadline - now
+                        # Fail fast when the budget can't free up in time anyway
+                        if remaining <= 0 or (wait is not None and wait > remaining):
+                            self.timed_out[priority] += 1
+                            raise RateLimitTimeout(self.name, priority, max(0.0, wait if wait is not None else remaining))
+                        wait = remaining if wait is None else wait
+                    self.condition.wait(wait)
+            finally:
+                self.waiting.remove(entry)
+                heapq.heapify(self.waiting)
+                OPENAI_QUEUE_DEPTH.labels(self.name, priority).dec()
+                self.condition.notify_all()
+    
+    def pause(self, seconds: float):
+        """Admit nothing for a while, e.g. after the API answered 429"""
+        with self.condition:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.condition.notify_all()
+    
+    def stats(self) -> Dict[str, Any]:
+        with self.condition:
+            now = time.monotonic()
+            queued = {priority: 0 for priority in PRIORITIES}
+            ranks = {rank: priority for priority, rank in PRIORITIES.items()}
+            for rank, _ in self.waiting:
+                queued[ranks[rank]] += 1
+            for bucket in (self.requests, self.tokens):
+                if bucket:
+                    bucket.time_until(0, now)  # Refill, so the levels below are current
+            return {
+                "queue_depth": queued,
+                "admitted": dict(self.admitted),
+                "timed_out": dict(self.timed_out),
+                "requests_available": round(self.requests.level, 2) if self.requests else None,
+                "tokens_available": round(self.tokens.level, 2) if self.tokens else None,
+                "paused_for": round(max(0.0, self.paused_until - now), 2),
+            }
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Retry-After of a 429 response, if the API sent one"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def call_with_limit(limiter: RateLimiter, tokens: int, call: Callable[[], Any],
+                    priority: str = "interactive", timeout: Optional[float] = None) -> Any:
+    """
+    Run an OpenAI call once the limiter admits it. A 429 pauses the limiter and the call
+    is queued again, until it succeeds or its deadline passes (RateLimitTimeout).
+    
+    Args:
+        timeout: Seconds the call may wait in total (default: OPENAI_INTERACTIVE_DEADLINE
+            or OPENAI_BULK_DEADLINE, by priority)
+    """
+    if timeout is None:
+        timeout = config.OPENAI_INTERACTIVE_DEADLINE if priority == "interactive" else config.OPENAI_BULK_DEADLINE
+    deadline = time.monotonic() + timeout
+    attempt = 0
+    while True:
+        limiter.acquire(tokens, priority, deadline)
+        try:
+            return call()
+        except Exception as e:
+            if getattr(e, "status_code", None) != 429:
+                raise
+            attempt += 1
+            delay = _retry_after(e) or min(2 ** attempt, 30)
+            OPENAI_RATE_LIMITED.labels(limiter.name).inc()
+            logger.warning(f"⚠️ OpenAI {limiter.name} rate limited, pausing {delay:.1f}s (attempt {attempt})")
+            limiter.pause(delay)
+
+
+# This process's share of the key's quota
+embedding_limiter = RateLimiter(
+    "embeddings",
+    config.OPENAI_EMBEDDING_REQUESTS_PER_MINUTE / config.OPENAI_RATE_LIMIT_PROCESSES,
+    config.OPENAI_EMBEDDING_TOKENS_PER_MINUTE / config.OPENAI_RATE_LIMIT_PROCESSES,
+    config.OPENAI_RATE_BURST_SECONDS,
+)
+chat_limiter = RateLimiter(
+    "chat",
+    config.OPENAI_CHAT_REQUESTS_PER_MINUTE / config.OPENAI_RATE_LIMIT_PROCESSES,
+    config.OPENAI_CHAT_TOKENS_PER_MINUTE / config.OPENAI_RATE_LIMIT_PROCESSES,
+    config.OPENAI_RATE_BURST_SECONDS,
+)
@@ -0,0 +1,62 @@
+# services/recompress.py
+import time
+import logging
+import threading
+from typing import Any, Dict
+
+from services.db import DatabaseService
+
+logger = logging.getLogger(__name__)
+
+# Advisory lock key so only one process (of many workers) recompresses at a time
+RECOMPRESS_LOCK_KEY = 0x756E626F7A
+
+
+class RecompressionJob:
+    """
+    Compresses the chunks and files stored uncompressed (or, with rewrite, with an older
+    dictionary) in the background, one committed batch at a time.
+    
+    A stopped or crashed job loses at most one batch: compressed rows are skipped when it
+    runs again. Only one job runs at a time across all workers (Postgres advisory lock).
+    """
+    
+    def __init__(self, db_service: DatabaseService):
+        self.db = db_service
+        self.stop_event = threading.Event()
+        self.state: Dict[str, Any] = {"status": "idle"}
+    
+    @property
+    def running(self) -> bool:
+        return self.state.get("status") in ("starting", "running")
+    
+    def stop(self):
+        self.stop_event.set()
+    
+    def run(self, rewrite: bool) -> Dict[str, Any]:
+        """Run the job to completion, until stopped, or until it fails"""
+        self.stop_event.clear()
+        self.state = {"status": "starting", "rewrite": rewrite}
+        lock_conn = self.db.get_connection()
+        try:
+            cur = lock_conn.cursor()
+            cur.execute("SELECT pg_try_advisory_lock(%s)", (RECOMPRESS_LOCK_KEY,))
+            if not cur.fetchone()[0]:
+                self.state.update(status="idle", error="A recompression job is already running in another process")
+                return self.state
+            
+            started = time.time()
+            self.state.update(status="running", chunks=0, files=0, started_at=started)
+            
+            def progress(counts: Dict[str, int]):
+                self.state.update(counts, chunks_per_second=round(counts['chunks'] / max(time.time() - started, 1e-6), 2))
+            
+            self.db.compress_stored_data(rewrite=rewrite, stop_event=self.stop_event, progress=progress)
+            self.state.update(status="stopped" if self.stop_event.is_set() else "completed", finished_at=time.time())
+            return self.state
+        except Exception as e:
+            logger.error(f"❌ Recompression failed: {e}")
+            self.state.update(status="failed", error=str(e))
+            return self.state
+        finally:
+            lock_conn.close()  # Also releases the advisory lock
@@ -0,0 +1,160 @@
+# services/reembed.py
+import time
+import logging
+import threading
+from typing import Any, Dict
+
+from psycopg2.errors import LockNotAvailable
+
+from services.db import DatabaseService
+from services.embedding import get_embeddings
+from services.rag import count_tokens
+from services.rate_limit import RateLimitTimeout
+
+logger = logging.getLogger(__name__)
+
+# Advisory lock key so only one process (of many workers) runs the job at a time
+REEMBED_LOCK_KEY = 0x756E626F78  # "unbox"
+
+
+class RateBudget:
+    """Paces API calls to stay within a requests-per-minute and tokens-per-minute budget"""
+    
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.next_allowed = 0.0
+    
+    def wait(self, tokens: int, stop_event: threading.Event):
+        """Block until a call of this many tokens fits the budget (or the job is stopped)"""
+        delay = self.next_allowed - time.monotonic()
+        if delay > 0:
+            stop_event.wait(delay)
+        interval = 0.0
+        if self.requests_per_minute > 0:
+            interval = max(interval, 60.0 / self.requests_per_minute)
+        if self.tokens_per_minute > 0:
+            interval = max(interval, 60.0 * tokens / self.tokens_per_minute)
+        self.next_allowed = time.monotonic() + interval
+
+
+class ReembeddingJob:
+    """
+    Re-embeds every chunk with a new model into the staging columns of a building
+    embedding version, then switches search and ingestion over to it atomically.
+    
+    Progress is checkpointed with every batch, so a stopped or crashed job resumes where
+    it left off. Only one job runs at a time across all workers (Postgres advisory lock).
+    """
+    
+    def __init__(self, db_service: DatabaseService):
+        self.db = db_service
+        self.stop_event = threading.Event()
+        self.state: Dict[str, Any] = {"status": "idle"}
+    
+    @property
+    def running(self) -> bool:
+        return self.state.get("status") in ("starting", "running", "switching")
+    
+    def stop(self):
+        self.stop_event.set()
+    
+    def run(self, model: str, dimensions: int, storage: str, requests_per_minute: int,
+            tokens_per_minute: int, batch_size: int, max_switch_attempts: int = 10) -> Dict[str, Any]:
+        """Run (or resume) the job to completion, until stopped, or until it fails"""
+        self.stop_event.clear()
+        self.state = {"status": "starting", "model": model, "dimensions": dimensions, "storage": storage}
+        lock_conn = self.db.get_connection()
+        try:
+            cur = lock_conn.cursor()
+            cur.execute("SELECT pg_try_advisory_lock(%s)", (REEMBED_LOCK_KEY,))
+            if not cur.fetchone()[0]:
+                self.state.update(status="idle", error="A re-embedding job is already running in another process")
+                return self.state
+            
+            version = self.db.begin_embedding_version(model, dimensions, storage)
+            self.state.update(status="running", version=version['version'],
+                              embedded_chunks=version['embedded_chunks'], started_at=time.time())
+            self._embed_and_switch(version, RateBudget(requests_per_minute, tokens_per_minute),
+                                   batch_size, max_switch_attempts)
+            return self.state
+        except Exception as e:
+            logger.error(f"❌ Re-embedding failed: {e}")
+            self.state.update(status="failed", error=str(e))
+            return self.state
+        finally:
+            lock_conn.close()  # Also releases the advisory lock
+    
+    def _embed_and_switch(self, version: Dict[str, Any], budget: RateBudget,
+                          batch_size: int, max_switch_attempts: int):
+        checkpoint = version['last_chunk_id']
+        failures = 0
+        switch_attempts = 0
+        lock_timeouts = 0
+        index_built = False
+        started = time.time()
+        embedded_this_run = 0
+        
+        while not self.stop_event.is_set():
+            batch = self.db.fetch_chunks_to_reembed(checkpoint, batch_size)
+            
+            if not batch:
+                if not index_built:
+                    self.db.build_next_embedding_index(version)
+                    index_built = True
+                self.state["status"] = "switching"
+                try:
+                    switched = self.db.switch_embedding_version(version)
+                except LockNotAvailable:
+                    # Long queries held the table past EMBEDDING_SWITCH_LOCK_TIMEOUT_MS; the
+                    # embedding work is all done, so just try again once they are through
+                    lock_timeouts += 1
+                    if lock_timeouts >= max_switch_attempts:
+                        raise RuntimeError(f"Gave up switching after {lock_timeouts} lock timeouts; "
+                                           "start the job again to retry the switch")
+                    backoff = min(60, 2 ** lock_timeouts)
+                    logger.warning(f"⚠️ Embedding version switch timed out waiting for locks, retrying in {backoff}s")
+                    self.state["last_error_at"] = time.time()
+                    self.stop_event.wait(backoff)
+                    continue
+                if switched:
+                    self.state.update(status="completed", finished_at=time.time())
+                    return
+                # Chunks arrived (or were missed) meanwhile: sweep again from the start
+                switch_attempts += 1
+                if switch_attempts >= max_switch_attempts:
+                    raise RuntimeError(f"Gave up switching after {switch_attempts} attempts; new chunks keep arriving")
+                self.state["status"] = "running"
+                checkpoint = 0
+                continue
+            
+            texts = [content for _, content in batch]
+            budget.wait(sum(count_tokens(text) for text in texts), self.stop_event)
+            if self.stop_event.is_set():
+                break
+            
+            try:
+                embeddings = get_embeddings(texts, version['model'], version['dimensions'], priority="bulk")
+            except RateLimitTimeout:
+                embeddings = []  # Quota taken by live traffic; back off like any failed batch
+            if len(embeddings) != len(batch):
+                failures += 1
+                backoff = min(60, 2 ** failures)
+                logger.warning(f"⚠️ Re-embedding batch failed ({failures} in a row), retrying in {backoff}s")
+                self.state["last_error_at"] = time.time()
+                self.stop_event.wait(backoff)
+                continue
+            failures = 0
+            
+            self.db.store_reembedded_chunks(version, [(chunk_id, embedding) for (chunk_id, _), embedding
+                                                      in zip(batch, embeddings)])
+            checkpoint = batch[-1][0]
+            embedded_this_run += len(batch)
+            self.state.update(
+                embedded_chunks=self.state.get("embedded_chunks", 0) + len(batch),
+                last_chunk_id=checkpoint,
+                chunks_per_second=round(embedded_this_run / max(time.time() - started, 1e-6), 2),
+            )
+        
+        self.state["status"] = "paused"
+        logger.info(f"⏸️ Re-embedding into {version['version']} paused at chunk {checkpoint}")
@@ -0,0 +1,45 @@
+# services/singleflight.py
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+from services.metrics import REQUESTS_COALESCED
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one execution: the first caller
+    starts it, later callers await the same result (or exception) until it finishes.
+    Nothing is cached afterwards; the next call with the key runs again.
+    
+    The work runs as its own task, so a caller that disconnects (is cancelled) doesn't
+    cancel it for the others. Coalescing is per process, i.e. per worker.
+    """
+    
+    def __init__(self, name: str):
+        self.name = name
+        self.in_flight: Dict[Hashable, "asyncio.Task[Any]"] = {}
+    
+    async def do(self, key: Hashable, work: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Run work() for this key, or join the run already in flight
+        
+        Returns:
+            Tuple of (result, whether it was shared from another caller's run)
+        """
+        task = self.in_flight.get(key)
+        shared = task is not None
+        if shared:
+            REQUESTS_COALESCED.labels(self.name).inc()
+        else:
+            task = asyncio.ensure_future(work())
+            self.in_flight[key] = task
+            task.add_done_callback(lambda finished: self._finished(key, finished))
+        return await asyncio.shield(task), shared
+    
+    def _finished(self, key: Hashable, task: "asyncio.Task[Any]"):
+        self.in_flight.pop(key, None)
+        if not task.cancelled():
+            task.exception()  # Mark it retrieved, in case every caller went away meanwhile
+    
+    def stats(self) -> Dict[str, int]:
+        return {"in_flight": len(self.in_flight)}
@@ -1,18 +1,58 @@
 import re
 import hashlib
 import logging
-from typing import Dict, Tuple, List
-import spacy
+from typing import Dict, Tuple, List, Optional
+
+from config import config
+from services.ner_cache import NerCache
 
 logger = logging.getLogger(__name__)
 
+# NER runs per paragraph, or per sentence for paragraphs longer than this, so that each
+# segment can be looked up in the NER cache on its own
+NER_SEGMENT_MAX_CHARS = 1000
+PARAGRAPH_BREAK = re.compile(r'\n\s*\n')
+SENTENCE_BREAK = re.compile(r'(?<=[.!?])\s+')
+
+
+def split_segments(text: str, max_chars: int = NER_SEGMENT_MAX_CHARS) -> List[Tuple[int, int]]:
+    """(start, end) offsets of the non-blank paragraphs of text, long ones split into sentences"""
+    segments = []
+    
+    def add(start: int, end: int):
+        if text[start:end].strip():
+            segments.append((start, end))
+    
+    breaks = [(m.start(), m.end()) for m in PARAGRAPH_BREAK.finditer(text)]
+    breaks.append((len(text), len(text)))
+    
+    paragraph_start = 0
+    for paragraph_end, next_start in breaks:
+        if paragraph_end - paragraph_start <= max_chars:
+            add(paragraph_start, paragraph_end)
+        else:
+            sentence_start = paragraph_start
+            for m in SENTENCE_BREAK.finditer(text, paragraph_start, paragraph_end):
+                add(sentence_start, m.start())
+                sentence_start = m.end()
+            add(sentence_start, paragraph_end)
+        paragraph_start = next_start
+    return segments
+
 class SpacyAnonymizer:
     """
     Advanced anonymizer using spaCy's Named Entity Recognition (NER)
     for more accurate detection of sensitive data
+    
+    Instances hold no per-document state: every call gets and returns its own
+    mapping, so one instance (and one loaded model) can serve concurrent requests.
+    The only shared state is the NER cache, which is thread-safe.
     """
     
-    def __init__(self):
+    def __init__(self, ner_cache: Optional[NerCache] = None):
+        # Imported here rather than at module level: importing spaCy alone takes about a second
+        import spacy
+        
         # Load spaCy model
         try:
             self.nlp = spacy.load("en_core_web_sm")
@@ -21,6 +61,11 @@ class SpacyAnonymizer:
             print("❌ spaCy model not found. Please run: python -m spacy download en_core_web_sm")
             raise
         
+        # Cached entities are only valid for the model (and spaCy version) that found them
+        meta = self.nlp.meta
+        self.model_version = f"{meta.get('lang')}_{meta.get('name')}-{meta.get('version')}/spacy-{spacy.__version__}"
+        self.ner_cache = ner_cache if ner_cache is not None else NerCache(config.NER_CACHE_SIZE, config.NER_CACHE_PATH)
+        
         # Patterns for additional sensitive data types
         self.patterns = {
             'EMAIL': r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b',
@@ -51,10 +96,6 @@ class SpacyAnonymizer:
             'ORDINAL': 'ORDINAL',
             'CARDINAL': 'CARDINAL',
         }
-        
-        # Store mappings for de-anonymization
-        self.alias_mapping = {}
-        self.reverse_mapping = {}
     
     def _generate_alias(self, original_value: str, data_type: str) -> str:
         """Generate a consistent alias for a value"""
@@ -63,6 +104,35 @@ class SpacyAnonymizer:
         hash_hex = hash_object.hexdigest()[:8]
         return f"[{data_type}_{hash_hex}]"
     
+    def _find_entities(self, text: str) -> List[Tuple[int, int, str, str]]:
+        """
+        Named entities of text as (start_char, end_char, label, text), running spaCy only on
+        the segments the NER cache doesn't know yet
+        """
+        segments = split_segments(text)
+        keys = [NerCache.key(text[start:end], self.model_version) for start, end in segments]
+        cached = self.ner_cache.get_many(keys)
+        
+        # Each distinct unseen segment goes through the model once, batched with nlp.pipe
+        unseen = {}
+        for (start, end), key in zip(segments, keys):
+            if key not in cached and key not in unseen:
+                unseen[key] = text[start:end]
+        found = {}
+        for key, doc in zip(unseen, self.nlp.pipe(unseen.values())):
+            found[key] = tuple((ent.start_char, ent.end_char, ent.label_) for ent in doc.ents)
+        self.ner_cache.put_many(found)
+        cached.update(found)
+        
+        if self.ner_cache.enabled:
+            print(f"🔍 NER cache: {len(segments) - len(unseen)}/{len(segments)} segments cached")
+        
+        entities = []
+        for (start, _), key in zip(segments, keys):
+            for ent_start, ent_end, label in cached[key]:
+                entities.append((start + ent_start, start + ent_end, label, text[start + ent_start:start + ent_end]))
+        return entities
+    
     def anonymize_text(self, text: str) -> Tuple[str, Dict[str, str]]:
         """
         Anonymize sensitive data in text using spaCy NER
@@ -90,44 +160,38 @@ class SpacyAnonymizer:
         
         # Process spaCy entities
         print(f"🔍 Processing spaCy entities...")
-        doc = self.nlp(anonymized_text)
         
         # Sort entities by start position (descending) to avoid position shifts
-        entities = sorted(doc.ents, key=lambda x: x.start_char, reverse=True)
+        entities = sorted(self._find_entities(anonymized_text), key=lambda ent: ent[0], reverse=True)
         
-        for ent in entities:
-            if ent.label_ in self.entity_types:
-                original_value = ent.text
-                data_type = self.entity_types[ent.label_]
+        for start_char, end_char, label, original_value in entities:
+            if label in self.entity_types:
+                data_type = self.entity_types[label]
                 alias = self._generate_alias(original_value, data_type)
                 
                 # Only add if not already processed
                 if original_value not in all_mappings:
                     all_mappings[original_value] = alias
-                    print(f"   Found {data_type} ({ent.label_}): '{original_value}' → '{alias}'")
+                    print(f"   Found {data_type} ({label}): '{original_value}' → '{alias}'")
                     
                     # Replace in text (from end to start to avoid position shifts)
                     anonymized_text = (
-                        anonymized_text[:ent.start_char] + 
+                        anonymized_text[:start_char] + 
                         alias + 
-                        anonymized_text[ent.end_char:]
+                        anonymized_text[end_char:]
                     )
         
-        # Store mappings for potential de-anonymization later
-        self.alias_mapping.update(all_mappings)
-        self.reverse_mapping.update({v: k for k, v in all_mappings.items()})
-        
         print(f"🔍 Total anonymized items: {len(all_mappings)}")
         logger.info(f"spaCy anonymized {len(all_mappings)} sensitive data points")
         return anonymized_text, all_mappings
     
-    def deanonymize_text(self, text: str) -> str:
-        """Restore original values from aliases"""
+    def deanonymize_text(self, text: str, mapping: Dict[str, str]) -> str:
+        """Restore original values from aliases using a mapping returned by anonymize_text"""
         if not text:
             return text
         
         deanonymized_text = text
-        for alias, original in self.reverse_mapping.items():
+        for original, alias in mapping.items():
             deanonymized_text = deanonymized_text.replace(alias, original)
         
         return deanonymized_text
@@ -196,18 +260,13 @@ class SpacyAnonymizer:
         print(f"🔓 Deanonymized answer (first 100 chars): '{deanonymized_answer[:100]}...'")
         return deanonymized_answer
     
-    def get_mapping_summary(self) -> Dict[str, int]:
-        """Get a summary of anonymized data types"""
+    @staticmethod
+    def get_mapping_summary(mapping: Dict[str, str]) -> Dict[str, int]:
+        """Get a summary of anonymized data types in a mapping returned by anonymize_text"""
         summary = {}
-        for original, alias in self.alias_mapping.items():
+        for original, alias in mapping.items():
             # Extract data type from alias [TYPE_hash]
             if alias.startswith('[') and ']' in alias:
                 data_type = alias[1:alias.find('_')]
                 summary[data_type] = summary.get(data_type, 0) + 1
-        return summary
-    
-    def clear_mappings(self):
-        """Clear stored mappings"""
-        self.alias_mapping.clear()
-        self.reverse_mapping.clear()
-        print("🧹 Cleared anonymization mappings") 
\ No newline at end of file
+        return summary 
\ No newline at end of file
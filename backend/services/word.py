@@ -0,0 +1,264 @@
+# services/word.py
+import io
+import re
+import struct
+import zipfile
+import xml.etree.ElementTree as ET
+from typing import IO, Dict, Iterator, List, Optional
+
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+HEADING_STYLE_NAME = re.compile(r"^heading (\d)$")
+MAX_HEADING_LEVEL = 6
+
+OLE_SIGNATURE = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+ZIP_SIGNATURE = b"PK\x03\x04"
+OLE_FREE_SECTOR = 0xFFFFFFFF
+OLE_END_OF_CHAIN = 0xFFFFFFFE
+
+
+def _heading_styles(archive: zipfile.ZipFile) -> Dict[str, int]:
+    """Heading level of each paragraph style, from word/styles.xml (style IDs are localized, names aren't)"""
+    try:
+        styles = ET.fromstring(archive.read("word/styles.xml"))
+    except KeyError:
+        return {}
+    levels = {}
+    for style in styles.iter(W + "style"):
+        if style.get(W + "type") != "paragraph":
+            continue
+        name = style.find(W + "name")
+        name = (name.get(W + "val") or "").lower() if name is not None else ""
+        outline = style.find(f"{W}pPr/{W}outlineLvl")
+        match = HEADING_STYLE_NAME.match(name)
+        if name == "title":
+            levels[style.get(W + "styleId")] = 1
+        elif match:
+            levels[style.get(W + "styleId")] = int(match.group(1))
+        elif outline is not None and outline.get(W + "val", "").isdigit() and int(outline.get(W + "val")) < 9:
+            levels[style.get(W + "styleId")] = int(outline.get(W + "val")) + 1
+    return levels
+
+
+def _paragraph_text(paragraph: ET.Element) -> str:
+    parts = []
+    for node in paragraph.iter():
+        if node.tag == W + "t":
+            parts.append(node.text or "")
+        elif node.tag == W + "tab":
+            parts.append("\t")
+        elif node.tag in (W + "br", W + "cr"):
+            parts.append("\n")
+        elif node.tag == W + "noBreakHyphen":
+            parts.append("-")
+    return "".join(parts).strip()
+
+
+def _heading_level(paragraph: ET.Element, heading_styles: Dict[str, int]) -> int:
+    properties = paragraph.find(W + "pPr")
+    if properties is None:
+        return 0
+    outline = properties.find(W + "outlineLvl")
+    if outline is not None and outline.get(W + "val", "").isdigit() and int(outline.get(W + "val")) < 9:
+        return int(outline.get(W + "val")) + 1
+    style = properties.find(W + "pStyle")
+    return heading_styles.get(style.get(W + "val"), 0) if style is not None else 0
+
+
+def iter_docx_paragraphs(document: IO[bytes], heading_styles: Dict[str, int]) -> Iterator[str]:
+    """
+    Paragraphs of a word/document.xml stream, in order. Headings come out as Markdown
+    headings and each table row as one paragraph with its cells separated by " | ".
+    
+    The XML is read incrementally and every paragraph and table is dropped as soon as it
+    has been read, so memory stays flat however long the document is.
+    """
+    stack: List[ET.Element] = []
+    rows: List[List[List[str]]] = []  # Cells of the table rows being read, innermost table last
+    for event, element in ET.iterparse(document, events=("start", "end")):
+        if event == "start":
+            stack.append(element)
+            if element.tag == W + "tr":
+                rows.append([])
+            elif element.tag == W + "tc" and rows:
+                rows[-1].append([])
+            continue
+        
+        stack.pop()
+        if element.tag == W + "p":
+            text = _paragraph_text(element)
+            if rows and rows[-1]:
+                if text:
+                    rows[-1][-1].append(text)
+            elif text:
+                level = min(_heading_level(element, heading_styles), MAX_HEADING_LEVEL)
+                yield f"{'#' * level} {text}" if level else text
+            element.clear()
+        elif element.tag == W + "tr" and rows:
+            row = " | ".join(" ".join(cell) for cell in rows.pop())
+            if rows and rows[-1]:
+                rows[-1][-1].append(row)  # A table nested in a cell
+            elif row.strip(" |"):
+                yield row
+        
+        # Children of w:body are done with once they end
+        if len(stack) == 2 and stack[-1].tag == W + "body":
+            stack[-1].remove(element)
+
+
+def extract_docx_text(file_content: bytes) -> str:
+    """Text of a .docx file, with paragraphs separated by blank lines"""
+    with zipfile.ZipFile(io.BytesIO(file_content)) as archive:
+        heading_styles = _heading_styles(archive)
+        with archive.open("word/document.xml") as document:
+            return "\n\n".join(iter_docx_paragraphs(document, heading_styles))
+
+
+class OleFile:
+    """Just enough of the OLE2 compound file format to read the streams of a Word 97-2003 file"""
+    
+    def __init__(self, data: bytes):
+        if data[:8] != OLE_SIGNATURE:
+            raise ValueError("Not an OLE2 compound file")
+        self.data = data
+        self.sector_size = 1 << struct.unpack_from("<H", data, 0x1E)[0]
+        self.mini_sector_size = 1 << struct.unpack_from("<H", data, 0x20)[0]
+        (fat_sectors, first_directory, _, self.mini_cutoff, first_mini_fat, mini_fat_sectors,
+         first_difat, difat_sectors) = struct.unpack_from("<IIIIIIII", data, 0x2C)
+        
+        fat_sector_ids = [sid for sid in struct.unpack_from("<109I", data, 0x4C) if sid != OLE_FREE_SECTOR]
+        sid = first_difat
+        for _ in range(difat_sectors):
+            entries = struct.unpack_from(f"<{self.sector_size // 4}I", data, self._offset(sid))
+            fat_sector_ids.extend(entry for entry in entries[:-1] if entry != OLE_FREE_SECTOR)
+            sid = entries[-1]
+        self.fat = []
+        for sid in fat_sector_ids[:fat_sectors]:
+            self.fat.extend(struct.unpack_from(f"<{self.sector_size // 4}I", data, self._offset(sid)))
+        
+        self.entries = {}
+        directory = self._read_chain(first_directory)
+        root = None
+        for offset in range(0, len(directory) - 127, 128):
+            name_length, entry_type = struct.unpack_from("<HB", directory, offset + 64)
+            start, size = struct.unpack_from("<II", directory, offset + 116)
+            name = directory[offset:offset + max(0, name_length - 2)].decode("utf-16-le", "replace")
+            if entry_type == 5:
+                root = (start, size)
+            elif entry_type == 2:
+                self.entries.setdefault(name, (start, size))
+        
+        self.mini_fat = []
+        if mini_fat_sectors:
+            mini_fat = self._read_chain(first_mini_fat)
+            self.mini_fat = list(struct.unpack_from(f"<{len(mini_fat) // 4}I", mini_fat))
+        self.mini_stream = self._read_chain(root[0])[:root[1]] if root else b""
+    
+    def _offset(self, sid: int) -> int:
+        return (sid + 1) * self.sector_size
+    
+    def _read_chain(self, sid: int, size: Optional[int] = None, mini: bool = False) -> bytes:
+        """Follow a sector chain through the FAT (or the mini FAT, within the mini stream)"""
+        table = self.mini_fat if mini else self.fat
+        source = self.mini_stream if mini else self.data
+        sector_size = self.mini_sector_size if mini else self.sector_size
+        base = 0 if mini else 1  # The header takes the place of sector -1
+        parts = []
+        seen = set()
+        while sid not in (OLE_END_OF_CHAIN, OLE_FREE_SECTOR) and sid < len(table) and sid not in seen:
+            seen.add(sid)  # A corrupt file must not loop forever
+            start = (sid + base) * sector_size
+            parts.append(source[start:start + sector_size])
+            sid = table[sid]
+        data = b"".join(parts)
+        return data[:size] if size is not None else data
+    
+    def read_stream(self, name: str) -> bytes:
+        if name not in self.entries:
+            raise KeyError(name)
+        start, size = self.entries[name]
+        if size < self.mini_cutoff:
+            return self._read_chain(start, size=size, mini=True)
+        return self._read_chain(start, size=size)
+
+
+# Word 97 control characters in the main text: paragraph and cell ends become line breaks,
+# field codes (between 0x13 and 0x14) are dropped and the field result kept
+DOC_CHARACTERS = {
+    "\r": "\n", "\x07": "\n", "\x0b": "\n", "\x0c": "\n",
+    "\x1e": "-", "\x1f": "", "\xa0": " ",
+    "\x01": "", "\x02": "", "\x05": "", "\x08": "",
+}
+
+
+def extract_doc_text(file_content: bytes) -> str:
+    """
+    Text of a Word 97-2003 .doc file: the main document text from its piece table,
+    one paragraph per block. The binary format stores styles separately and they are
+    not read, so headings come out as plain paragraphs.
+    """
+    ole = OleFile(file_content)
+    word_document = ole.read_stream("WordDocument")
+    identifier, flags = struct.unpack_from("<H8xH", word_document, 0)
+    if identifier != 0xA5EC:
+        raise ValueError("Not a Word 97-2003 document")
+    if flags & 0x0100:
+        raise ValueError("Encrypted Word documents are not supported")
+    table = ole.read_stream("1Table" if flags & 0x0200 else "0Table")
+    
+    # FIB: fibBase, then the counted fibRgW, fibRgLw and fibRgFcLcb arrays
+    csw = struct.unpack_from("<H", word_document, 32)[0]
+    lw_offset = 34 + csw * 2
+    cslw = struct.unpack_from("<H", word_document, lw_offset)[0]
+    main_text_length = struct.unpack_from("<I", word_document, lw_offset + 2 + 3 * 4)[0]  # ccpText
+    fc_lcb_offset = lw_offset + 2 + cslw * 4 + 2
+    clx_offset, clx_length = struct.unpack_from("<II", word_document, fc_lcb_offset + 33 * 8)
+    clx = table[clx_offset:clx_offset + clx_length]
+    
+    # Skip the Prc formatting entries to the piece table (Pcdt)
+    position = 0
+    while position < len(clx) and clx[position] == 0x01:
+        position += 3 + struct.unpack_from("<h", clx, position + 1)[0]
+    if position >= len(clx) or clx[position] != 0x02:
+        raise ValueError("Word document has no piece table")
+    piece_table_length = struct.unpack_from("<I", clx, position + 1)[0]
+    pieces = (piece_table_length - 4) // 12
+    character_positions = struct.unpack_from(f"<{pieces + 1}I", clx, position + 5)
+    descriptors = position + 5 + (pieces + 1) * 4
+    
+    parts = []
+    remaining = main_text_length
+    for i in range(pieces):
+        if remaining <= 0:
+            break
+        count = min(character_positions[i + 1] - character_positions[i], remaining)
+        remaining -= count
+        fc = struct.unpack_from("<I", clx, descriptors + i * 8 + 2)[0]
+        if fc & 0x40000000:
+            start = (fc & ~0x40000000) // 2
+            parts.append(word_document[start:start + count].decode("cp1252", "replace"))
+        else:
+            parts.append(word_document[fc:fc + 2 * count].decode("utf-16-le", "replace"))
+    
+    text = []
+    in_code = []  # Per open field: whether its code (before the separator) is being read
+    for character in "".join(parts):
+        if character == "\x13":
+            in_code.append(True)
+        elif character == "\x14" and in_code:
+            in_code[-1] = False
+        elif character == "\x15" and in_code:
+            in_code.pop()
+        elif not (in_code and in_code[-1]):
+            text.append(DOC_CHARACTERS.get(character, character))
+    
+    paragraphs = (paragraph.strip() for paragraph in "".join(text).split("\n"))
+    return "\n\n".join(paragraph for paragraph in paragraphs if paragraph)
+
+
+def extract_word_text(file_content: bytes) -> str:
+    """Text of a Word file of either format (.doc uploads are often really .docx)"""
+    if file_content[:4] == ZIP_SIGNATURE:
+        return extract_docx_text(file_content)
+    if file_content[:8] == OLE_SIGNATURE:
+        return extract_doc_text(file_content)
+    raise ValueError("Not a Word document (neither .docx nor Word 97-2003)")
@@ -13,6 +13,8 @@ import os
 import psycopg2
 import sys
 from dotenv import load_dotenv
+from config import config
+from services.db import DatabaseService
 
 # Load environment variables
 load_dotenv()
@@ -50,16 +52,21 @@ def setup_database_schema():
         with open('database_schema.sql', 'r') as f:
             schema_sql = f.read()
         
-        # Split by semicolon and execute each statement
-        statements = schema_sql.split(';')
-        for statement in statements:
-            statement = statement.strip()
-            if statement and not statement.startswith('--'):
-                cur.execute(statement)
+        # Execute the whole script at once: splitting on semicolons breaks
+        # $$-quoted function bodies and drops statements preceded by comments
+        cur.execute(schema_sql)
         
         conn.commit()
         print("✅ Database schema created successfully!")
         
+        # Match the embedding column and index to EMBEDDING_STORAGE / EMBEDDING_DIMENSIONS.
+        # A changed column drops the view built on it, so the schema is applied once more.
+        print(f"📐 Embedding storage: {config.EMBEDDING_STORAGE}({config.EMBEDDING_DIMENSIONS})")
+        if DatabaseService().sync_embedding_column():
+            cur.execute(schema_sql)
+            conn.commit()
+            print("✅ Embedding column and index updated")
+        
         # Test the tables
         cur.execute("SELECT COUNT(*) FROM files")
         file_count = cur.fetchone()[0]
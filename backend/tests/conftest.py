@@ -0,0 +1,24 @@
+"""
+pytest setup for the unit tests. Run from the backend directory:
+
+    python -m pytest -q tests
+
+The other test_*.py scripts here drive a running server (python main.py) with requests
+as soon as they are imported, so pytest leaves them alone; run those directly.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# main.py and DatabaseService want these set, but the unit tests never connect
+os.environ.setdefault("DATABASE_URL", "postgresql://localhost/unboxed_test")
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+
+collect_ignore = [
+    "test_delete_functionality.py",
+    "test_file_specific_privacy.py",
+    "test_name_detection.py",
+    "test_privacy_mode.py",
+    "test_two_way_anonymization.py",
+]
@@ -0,0 +1,79 @@
+import random
+
+from services.chunk import MIN_BOUNDARY_FILL, chunk_text, content_hash, diff_chunks, sanitize_text
+
+WORDS = "the of and data report customer invoice quarter revenue contract office team review".split()
+
+
+def sentences(count: int, seed: int = 0) -> list:
+    rnd = random.Random(seed)
+    return [" ".join(rnd.choice(WORDS) for _ in range(rnd.randint(6, 24))).capitalize() for _ in range(count)]
+
+
+def test_chunks_respect_max_size():
+    text = ". ".join(sentences(500)) + "."
+    chunks = chunk_text(text, 1000)
+    assert all(len(chunk) <= 1000 for chunk in chunks)
+
+
+def test_chunks_keep_every_sentence_in_order():
+    parts = sentences(300)
+    chunks = chunk_text(". ".join(parts) + ".", 500)
+    rejoined = " ".join(chunks)
+    position = 0
+    for sentence in parts:
+        position = rejoined.index(sentence, position)
+
+
+def test_paragraphs_end_sentences_and_headings_start_chunks():
+    text = "Intro without full stop\n\nSecond paragraph. Still second\n\n# Heading\n\nBody text."
+    chunks = chunk_text(text, 1000, paragraphs=True)
+    assert chunks[0] == "Intro without full stop Second paragraph. Still second"
+    assert chunks[1].startswith("# Heading")
+    # Other file types chunk as before, so their stored chunks need no re-embedding
+    assert chunk_text(text, 1000) == ["Intro without full stop Second paragraph. Still second # Heading Body text.."]
+
+
+def test_content_defined_boundaries_survive_an_edit():
+    parts = sentences(600, seed=1)
+    original = chunk_text(". ".join(parts) + ".", 1000, content_defined=True)
+    edited_parts = list(parts)
+    edited_parts[10] = "An inserted sentence that changes the beginning of the document"
+    edited = chunk_text(". ".join(edited_parts) + ".", 1000, content_defined=True)
+    
+    # Only the chunks up to the first content-picked boundary after the edit change
+    changed = set(edited) - set(original)
+    assert 0 < len(changed) <= 3
+    assert original[-5:] == edited[-5:]
+
+
+def test_content_defined_chunks_stay_close_to_max_size():
+    text = ". ".join(sentences(2000, seed=2)) + "."
+    plain = chunk_text(text, 1000)
+    content_defined = chunk_text(text, 1000, content_defined=True)
+    assert all(len(chunk) <= 1000 for chunk in content_defined)
+    # Boundaries only end chunks that are MIN_BOUNDARY_FILL full
+    assert min(len(chunk) for chunk in content_defined[:-1]) >= 1000 * MIN_BOUNDARY_FILL - 250
+    average = sum(map(len, content_defined)) / len(content_defined)
+    assert average >= 0.85 * sum(map(len, plain)) / len(plain)
+
+
+def test_sanitize_text():
+    assert sanitize_text("  a\x00b \t\n c  ") == "ab c"
+
+
+def test_diff_chunks_matches_by_hash():
+    stored = [(10, 0, content_hash("a")), (11, 1, content_hash("b")), (12, 2, content_hash("c"))]
+    unchanged, added, removed = diff_chunks(stored, [(0, "a"), (1, "x"), (2, "c")])
+    assert unchanged == [(10, 0), (12, 2)]
+    assert added == [(1, "x")]
+    assert removed == [11]
+
+
+def test_diff_chunks_repeated_and_unhashed_chunks():
+    # A chunk stored twice matches twice; rows stored before hashing (None) never match
+    stored = [(1, 0, content_hash("a")), (2, 1, content_hash("a")), (3, 2, None)]
+    unchanged, added, removed = diff_chunks(stored, [(0, "a"), (1, "a"), (2, "a")])
+    assert unchanged == [(1, 0), (2, 1)]
+    assert added == [(2, "a")]
+    assert removed == [3]
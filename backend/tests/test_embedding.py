@@ -0,0 +1,9 @@
+from services.embedding import embedding_request_options
+
+
+def test_dimensions_only_shorten_models_that_support_it():
+    assert embedding_request_options("text-embedding-3-large", 1024) == {"model": "text-embedding-3-large", "dimensions": 1024}
+    assert embedding_request_options("text-embedding-3-small", 1536) == {"model": "text-embedding-3-small"}
+    assert embedding_request_options("text-embedding-ada-002", 1024) == {"model": "text-embedding-ada-002"}
+    # Models we know nothing about get no argument they might reject
+    assert embedding_request_options("in-house-embedder", 768) == {"model": "in-house-embedder"}
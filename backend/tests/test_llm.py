@@ -0,0 +1,86 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from services.llm import MIN_LATENCY_SAMPLES, LLMClient, LLMDeadlineExceeded
+from services.rate_limit import RateLimiter
+
+MESSAGES = [{"role": "user", "content": "question"}]
+
+
+class FakeOpenAI:
+    """Answers chat completions after the delay (or with the error) given per attempt, in call order"""
+    
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = []
+        self.lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+    
+    def with_options(self, timeout, max_retries):
+        self.timeout = timeout
+        return self
+    
+    def create(self, model, messages, **params):
+        with self.lock:
+            attempt = len(self.calls)
+            self.calls.append(model)
+        outcome = self.outcomes[min(attempt, len(self.outcomes) - 1)]
+        if isinstance(outcome, Exception):
+            raise outcome
+        time.sleep(outcome)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=f" answer {attempt} "))])
+
+
+def make_client(openai, **options) -> LLMClient:
+    limiter = RateLimiter("test", requests_per_minute=0, tokens_per_minute=0)
+    return LLMClient(openai, limiter, model="main-model", **options)
+
+
+def test_a_slow_attempt_is_hedged():
+    openai = FakeOpenAI(1.0, 0.01)
+    client = make_client(openai, hedging=True, hedge_delay=0.05)
+    started = time.monotonic()
+    assert client.complete(MESSAGES, 100, timeout=5) == "answer 1"
+    assert time.monotonic() - started < 0.5
+    assert openai.calls == ["main-model", "main-model"]
+
+
+def test_no_hedge_when_the_first_attempt_is_fast():
+    openai = FakeOpenAI(0.01)
+    client = make_client(openai, hedging=True, hedge_delay=0.5)
+    assert client.complete(MESSAGES, 100, timeout=5) == "answer 0"
+    assert openai.calls == ["main-model"]
+
+
+def test_a_failed_attempt_is_retried_once():
+    openai = FakeOpenAI(RuntimeError("server error"), 0.01)
+    assert make_client(openai).complete(MESSAGES, 100, timeout=5) == "answer 1"
+    
+    openai = FakeOpenAI(RuntimeError("server error"))
+    with pytest.raises(RuntimeError):
+        make_client(openai).complete(MESSAGES, 100, timeout=5)
+    assert len(openai.calls) == 2
+
+
+def test_the_deadline_bounds_the_call():
+    openai = FakeOpenAI(1.0)
+    client = make_client(openai, hedging=True, hedge_delay=0.05)
+    started = time.monotonic()
+    with pytest.raises(LLMDeadlineExceeded):
+        client.complete(MESSAGES, 100, timeout=0.2)
+    assert time.monotonic() - started < 0.5
+    assert openai.timeout <= 0.2
+
+
+def test_fallback_model_when_time_is_short():
+    openai = FakeOpenAI(0.01)
+    client = make_client(openai, fallback_model="fast-model")
+    for _ in range(MIN_LATENCY_SAMPLES):
+        client.latencies.record("main-model", 3.0)
+    client.complete(MESSAGES, 100, timeout=1)
+    client.complete(MESSAGES, 100, timeout=5)
+    assert openai.calls == ["fast-model", "main-model"]
+    assert client.stats()["latency"]["main-model"]["p95"] == 3.0
@@ -0,0 +1,47 @@
+import os
+import sqlite3
+
+from services.ner_cache import NerCache
+
+SPANS = ((0, 10, "PERSON"), (15, 21, "GPE"))
+
+
+def test_entries_persist_across_instances(tmp_path):
+    path = str(tmp_path / "ner.sqlite")
+    key = NerCache.key("John Smith in Berlin", "en_core_web_sm-3.7")
+    NerCache(10, path).put_many({key: SPANS})
+    cache = NerCache(10, path)
+    assert cache.get_many([key, b"unknown"]) == {key: SPANS}
+    assert cache.stats()["persistent"]
+
+
+def test_connection_is_opened_lazily_per_process(tmp_path, monkeypatch):
+    path = str(tmp_path / "ner.sqlite")
+    cache = NerCache(10, path)
+    assert not os.path.exists(path)
+    cache.put_many({b"key": SPANS})
+    parent = cache._db
+    
+    # As in a worker forked after the cache was created
+    monkeypatch.setattr(os, "getpid", lambda: -1)
+    cache.entries.clear()
+    assert cache.get_many([b"key"]) == {b"key": SPANS}
+    assert cache._db is not parent
+
+
+def test_read_errors_only_cost_cache_hits(tmp_path):
+    path = str(tmp_path / "ner.sqlite")
+    cache = NerCache(10, path)
+    cache.put_many({b"key": SPANS})
+    cache.entries.clear()
+    with sqlite3.connect(path) as db:
+        db.execute("DROP TABLE ner_spans")
+    assert cache.get_many([b"key"]) == {}
+    assert cache.stats()["misses"] == 1
+
+
+def test_memory_is_bounded():
+    cache = NerCache(2)
+    cache.put_many({b"a": SPANS, b"b": SPANS, b"c": SPANS})
+    assert cache.get_many([b"a", b"b", b"c"]) == {b"b": SPANS, b"c": SPANS}
+    assert not cache.stats()["persistent"]
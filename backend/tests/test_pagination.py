@@ -0,0 +1,18 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from services.db import decode_files_cursor, encode_files_cursor
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2026, 3, 1, 12, 30, 5, 123456, tzinfo=timezone.utc)
+    cursor = encode_files_cursor(created_at, 42)
+    assert "=" not in cursor  # Safe in a query string as it is
+    assert decode_files_cursor(cursor) == (created_at, 42)
+
+
+@pytest.mark.parametrize("cursor", ["", "not-a-cursor", encode_files_cursor(datetime(2026, 1, 1), 1)[:-3]])
+def test_malformed_cursors_raise_value_error(cursor):
+    with pytest.raises(ValueError):
+        decode_files_cursor(cursor)
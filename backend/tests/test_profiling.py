@@ -0,0 +1,101 @@
+import asyncio
+import marshal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from services.profiling import RequestProfiler
+
+
+def busy_work(n: int) -> int:
+    return sum(i * i for i in range(n))
+
+
+def profiled(profiler: RequestProfiler, work) -> dict:
+    """Profile work() like the middleware profiles a request, returning the stored pstats"""
+    async def request():
+        cprofile = profiler.start()
+        try:
+            await work()
+        finally:
+            profile_id = profiler.finish(cprofile, "POST", "/ingest", time.perf_counter())
+        return profile_id
+    
+    profile_id = asyncio.run(request())
+    return marshal.loads(profiler.get_profile(profile_id)["pstats"])
+
+
+def functions(stats: dict) -> set:
+    return {name for _, _, name in stats}
+
+
+def test_work_in_threads_is_profiled():
+    profiler = RequestProfiler(enabled=True)
+    stats = profiled(profiler, lambda: profiler.to_thread(busy_work, 1000))
+    assert "busy_work" in functions(stats)
+
+
+def test_work_in_a_given_executor_is_profiled():
+    profiler = RequestProfiler(enabled=True)
+    with ThreadPoolExecutor(1, thread_name_prefix="bulk") as executor:
+        thread_names = []
+        
+        def work(n):
+            thread_names.append(threading.current_thread().name)
+            return busy_work(n)
+        
+        stats = profiled(profiler, lambda: profiler.to_thread(work, 1000, executor=executor))
+    assert thread_names[0].startswith("bulk")
+    assert "busy_work" in functions(stats)
+
+
+def test_a_full_executor_does_not_block_the_default_one():
+    profiler = RequestProfiler(enabled=True)
+    release = threading.Event()
+    
+    async def run():
+        with ThreadPoolExecutor(1) as executor:
+            waiting = [asyncio.ensure_future(profiler.to_thread(release.wait, 5, executor=executor)) for _ in range(3)]
+            result = await asyncio.wait_for(profiler.to_thread(busy_work, 10), timeout=1)
+            release.set()
+            await asyncio.gather(*waiting)
+            return result
+    
+    assert asyncio.run(run()) == 285
+
+
+def test_threads_outside_a_profiled_request_are_not_profiled():
+    profiler = RequestProfiler(enabled=True)
+    assert asyncio.run(profiler.to_thread(busy_work, 10)) == 285
+    stats = profiled(profiler, lambda: asyncio.sleep(0))
+    assert "busy_work" not in functions(stats)
+
+
+def test_one_profile_per_process():
+    profiler = RequestProfiler(enabled=True)
+    first = profiler.start()
+    assert profiler.start() is None
+    profiler.finish(first, "POST", "/ask", time.perf_counter())
+    second = profiler.start()
+    assert second is not None
+    profiler.finish(second, "POST", "/ask", time.perf_counter())
+    assert len(profiler.list_profiles()) == 2
+
+
+def test_ingest_profiles_include_anonymization(monkeypatch):
+    spacy = pytest.importorskip("spacy")
+    from services.ner_cache import NerCache
+    from services.spacy_anonymizer import SpacyAnonymizer
+    
+    try:
+        spacy.load("en_core_web_sm")
+    except OSError:
+        monkeypatch.setattr(spacy, "load", lambda name: spacy.blank("en"))
+    anonymizer = SpacyAnonymizer(ner_cache=NerCache(0))
+    profiler = RequestProfiler(enabled=True)
+    # /ingest anonymizes off the event loop, as here
+    text = "John Smith lives in Berlin. Mail john@example.com or call 555-123-4567.\n\n" * 20
+    stats = profiled(profiler, lambda: profiler.to_thread(anonymizer.anonymize_text, text))
+    assert any(filename.endswith("spacy_anonymizer.py") and name == "anonymize_text" for filename, _, name in stats)
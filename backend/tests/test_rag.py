@@ -0,0 +1,62 @@
+import re
+from types import SimpleNamespace
+
+import services.rag as rag
+from services.rag import _trim_to_sentences, count_tokens, pack_context
+
+
+class WordEncoding:
+    """Counts one token per word (and one per run of whitespace), and how often it is called"""
+    
+    def __init__(self):
+        self.calls = 0
+    
+    def encode(self, text: str) -> list:
+        self.calls += 1
+        return re.findall(r"\S+|\s+", text)
+
+
+def use_encoding(monkeypatch, encoding):
+    monkeypatch.setattr(rag, "_get_encoding", lambda model: encoding)
+
+
+def test_trimming_counts_each_sentence_once(monkeypatch):
+    encoding = WordEncoding()
+    use_encoding(monkeypatch, encoding)
+    text = " ".join(f"Sentence number {i} ends here." for i in range(200))
+    
+    trimmed, tokens = _trim_to_sentences(text, 100, "model")
+    assert tokens == count_tokens(trimmed, "model") <= 100
+    assert trimmed.endswith("here.") and len(trimmed.split(". ")) == 10
+    # One call per sentence tried, the space and the check above: not one per prefix
+    assert encoding.calls == 11 + 1 + 1
+
+
+def test_pack_context_trims_the_chunk_that_does_not_fit(monkeypatch):
+    use_encoding(monkeypatch, WordEncoding())
+    chunks = [{'content': "One two three."}, {'content': "Four five. Six seven eight nine ten."}]
+    packed, tokens = pack_context(chunks, token_budget=12, model="model")
+    assert [chunk['content'] for chunk in packed] == ["One two three.", "Four five."]
+    assert packed[1]['trimmed'] and tokens == 5 + 1 + 3
+
+
+def test_tokenizer_failures_are_retried(monkeypatch):
+    loads = []
+    
+    def load(model):
+        loads.append(model)
+        if len(loads) == 1:
+            raise ConnectionError("offline")
+        return "encoding"
+    
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(rag, "_load_encoding", load)
+    monkeypatch.setattr(rag.time, "monotonic", lambda: clock.now)
+    monkeypatch.setattr(rag, "_encoding_failures", {})
+    
+    assert rag._get_encoding("model") is None
+    assert count_tokens("abcdefgh", "model") == 2  # Estimated while the failure is recent
+    assert len(loads) == 1
+    clock.now += rag.ENCODING_RETRY_SECONDS
+    assert rag._get_encoding("model") == "encoding"
+    assert rag._encoding_failures == {}
@@ -0,0 +1,100 @@
+import threading
+import time
+
+import pytest
+
+from services.rate_limit import RateLimiter, RateLimitTimeout, TokenBucket, call_with_limit
+
+
+class RateLimited(Exception):
+    status_code = 429
+    
+    def __init__(self, retry_after: str):
+        super().__init__("429")
+        self.response = type("Response", (), {"headers": {"retry-after": retry_after}})()
+
+
+def test_token_bucket_refills_up_to_capacity():
+    bucket = TokenBucket(rate_per_minute=60, burst_seconds=5)  # 1 per second, 5 at most
+    bucket.take(5, bucket.updated)
+    assert bucket.time_until(2, bucket.updated) == pytest.approx(2.0)
+    assert bucket.time_until(1, bucket.updated + 100) == 0.0
+    assert bucket.level == 5
+    # A call bigger than the bucket waits for a full bucket, then leaves a debt
+    assert bucket.time_until(8, bucket.updated) == 0.0
+    bucket.take(8, bucket.updated)
+    assert bucket.time_until(1, bucket.updated) == pytest.approx(4.0)
+
+
+def test_interactive_calls_are_admitted_before_bulk():
+    limiter = RateLimiter("test", requests_per_minute=600, tokens_per_minute=0, burst_seconds=0.1)  # One every 0.1s
+    limiter.acquire(1)
+    order = []
+    
+    def call(priority):
+        limiter.acquire(1, priority)
+        order.append(priority)
+    
+    threads = [threading.Thread(target=call, args=("bulk",)) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.02)  # Both bulk calls are queued before the interactive one arrives
+    threads.append(threading.Thread(target=call, args=("interactive",)))
+    threads[-1].start()
+    for thread in threads:
+        thread.join(5)
+    assert order == ["interactive", "bulk", "bulk"]
+    assert limiter.stats()["admitted"] == {"interactive": 2, "bulk": 2}
+
+
+def test_a_call_that_cannot_make_its_deadline_fails_fast():
+    limiter = RateLimiter("test", requests_per_minute=60, tokens_per_minute=0, burst_seconds=1)  # One per second
+    limiter.acquire(1)
+    started = time.monotonic()
+    with pytest.raises(RateLimitTimeout) as error:
+        limiter.acquire(1, "bulk", deadline=started + 0.1)
+    assert time.monotonic() - started < 0.05
+    assert error.value.retry_after == pytest.approx(1.0, abs=0.05)
+    assert limiter.stats()["timed_out"]["bulk"] == 1
+
+
+def test_token_budget_limits_large_calls():
+    limiter = RateLimiter("test", requests_per_minute=0, tokens_per_minute=60_000, burst_seconds=1)  # 1000 tokens/s
+    limiter.acquire(1000)
+    with pytest.raises(RateLimitTimeout):
+        limiter.acquire(500, deadline=time.monotonic() + 0.2)
+    assert limiter.acquire(100, deadline=time.monotonic() + 0.5) == pytest.approx(0.1, abs=0.05)
+
+
+def test_429_pauses_the_limiter_and_retries():
+    limiter = RateLimiter("test", requests_per_minute=0, tokens_per_minute=0)
+    attempts = []
+    
+    def call():
+        attempts.append(time.monotonic())
+        if len(attempts) == 1:
+            raise RateLimited(retry_after="0.2")
+        return "ok"
+    
+    assert call_with_limit(limiter, 10, call, timeout=5) == "ok"
+    assert attempts[1] - attempts[0] >= 0.2
+
+
+def test_429_past_the_deadline_times_out():
+    limiter = RateLimiter("test", requests_per_minute=0, tokens_per_minute=0)
+    
+    def call():
+        raise RateLimited(retry_after="10")
+    
+    with pytest.raises(RateLimitTimeout):
+        call_with_limit(limiter, 10, call, timeout=0.5)
+
+
+def test_other_errors_are_not_retried():
+    limiter = RateLimiter("test", requests_per_minute=0, tokens_per_minute=0)
+    
+    def call():
+        raise ValueError("bad request")
+    
+    with pytest.raises(ValueError):
+        call_with_limit(limiter, 10, call, timeout=5)
@@ -0,0 +1,46 @@
+import pytest
+from psycopg2.errors import LockNotAvailable
+
+from services.reembed import RateBudget, ReembeddingJob
+
+
+class FakeDB:
+    """No chunks left to embed; the switch fails with the given outcomes first, then succeeds"""
+    
+    def __init__(self, *switch_failures):
+        self.switch_failures = list(switch_failures)
+        self.switch_calls = 0
+    
+    def fetch_chunks_to_reembed(self, after_id, limit):
+        return []
+    
+    def build_next_embedding_index(self, version):
+        pass
+    
+    def switch_embedding_version(self, version):
+        self.switch_calls += 1
+        if self.switch_failures:
+            raise self.switch_failures.pop(0)
+        return True
+
+
+def run_switch(db: FakeDB, max_switch_attempts: int = 10) -> ReembeddingJob:
+    job = ReembeddingJob(db)
+    job.stop_event.wait = lambda timeout=None: None  # No backoff in tests
+    version = {"version": "new", "last_chunk_id": 0}
+    job._embed_and_switch(version, RateBudget(0, 0), 10, max_switch_attempts)
+    return job
+
+
+def test_a_lock_timeout_during_the_switch_is_retried():
+    db = FakeDB(LockNotAvailable("lock timeout"), LockNotAvailable("lock timeout"))
+    job = run_switch(db)
+    assert job.state["status"] == "completed"
+    assert db.switch_calls == 3
+
+
+def test_repeated_lock_timeouts_give_up():
+    db = FakeDB(*[LockNotAvailable("lock timeout")] * 3)
+    with pytest.raises(RuntimeError, match="lock timeouts"):
+        run_switch(db, max_switch_attempts=3)
+    assert db.switch_calls == 3
@@ -0,0 +1,59 @@
+"""
+Needs a database set up with setup_database.py: TEST_DATABASE_URL=postgresql://... python -m pytest -q tests
+Skipped without one.
+"""
+import os
+import random
+
+import pytest
+
+from services.db import DatabaseService
+
+pytestmark = pytest.mark.skipif(not os.getenv("TEST_DATABASE_URL"), reason="TEST_DATABASE_URL is not set")
+
+
+def embedding(text: str) -> list:
+    rnd = random.Random(text)
+    return [rnd.uniform(-1, 1) for _ in range(1536)]
+
+
+def chunks(*texts) -> list:
+    return [{"content": text, "embedding": embedding(text), "index": i} for i, text in enumerate(texts)]
+
+
+@pytest.fixture
+def db(monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", os.environ["TEST_DATABASE_URL"])
+    db = DatabaseService()
+    yield db
+    conn = db.get_connection()
+    with conn, conn.cursor() as cur:
+        cur.execute("SELECT id FROM files WHERE filename LIKE 'test-replace-aliases-%%'")
+        file_ids = [row[0] for row in cur.fetchall()]
+    conn.close()
+    db.delete_files(file_ids)
+
+
+def test_replacing_a_file_keeps_what_its_aliases_contain(db):
+    old = b"version one"
+    original_id = db.insert_files_with_chunks([{
+        "filename": "test-replace-aliases-original.txt", "content_type": "text/plain", "file_size": len(old),
+        "word_count": 2, "original_file_bytes": old, "chunks": chunks("First chunk.", "Second chunk."),
+    }])[0]
+    alias_ids = [db.insert_file_alias(original_id, f"test-replace-aliases-copy{i}.txt") for i in range(2)]
+    
+    stored = db.get_file_chunk_hashes(original_id)
+    new = b"version two, longer"
+    db.replace_file_chunks(
+        original_id, stored["updated_at"], filename="test-replace-aliases-original.txt", content_type="text/plain",
+        file_size=len(new), word_count=3, original_file_bytes=new, anonymized=False, anonymization_mapping=None,
+        metadata=None, unchanged=[(stored["chunks"][0][0], 0)], new_chunks=chunks("First chunk.", "New chunk.")[1:],
+        removed_ids=[stored["chunks"][1][0]]
+    )
+    
+    assert db.get_file_content(original_id) == "First chunk.\nNew chunk."
+    assert db.get_original_file(original_id) == new
+    for alias_id in alias_ids:
+        assert db.get_file_content(alias_id) == "First chunk.\nSecond chunk."
+        assert db.get_original_file(alias_id) == old
+    assert db.reconcile_corpus_stats() == {"file_count": 0, "chunk_count": 0, "total_words": 0}
@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+
+from models.api_models import QuestionRequest
+from services.singleflight import SingleFlight
+
+V1, V2 = "text-embedding-3-small:1536:vector", "text-embedding-3-large:1024:halfvec"
+
+
+def test_concurrent_calls_with_one_key_run_once():
+    calls = []
+    
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "answer"
+    
+    async def run():
+        flights = SingleFlight("test")
+        return await asyncio.gather(*(flights.do("key", work) for _ in range(5)))
+    
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert [result for result, _ in results] == ["answer"] * 5
+    assert [shared for _, shared in results] == [False, True, True, True, True]
+
+
+def test_different_keys_and_later_calls_run_again():
+    calls = []
+    
+    async def run():
+        flights = SingleFlight("test")
+        
+        async def work(key):
+            calls.append(key)
+            await asyncio.sleep(0.01)
+            return key
+        
+        await asyncio.gather(flights.do("a", lambda: work("a")), flights.do("b", lambda: work("b")))
+        await flights.do("a", lambda: work("a"))
+        return flights.stats()
+    
+    assert asyncio.run(run()) == {"in_flight": 0}
+    assert calls == ["a", "b", "a"]
+
+
+def test_errors_reach_every_caller():
+    async def work():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+    
+    async def run():
+        flights = SingleFlight("test")
+        return await asyncio.gather(flights.do("key", work), flights.do("key", work), return_exceptions=True)
+    
+    assert all(isinstance(result, ValueError) for result in asyncio.run(run()))
+
+
+def test_a_cancelled_caller_does_not_cancel_the_others():
+    async def work():
+        await asyncio.sleep(0.05)
+        return "answer"
+    
+    async def run():
+        flights = SingleFlight("test")
+        first = asyncio.ensure_future(flights.do("key", work))
+        second = asyncio.ensure_future(flights.do("key", work))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+    
+    assert asyncio.run(run()) == ("answer", True)
+
+
+def test_ask_flight_key():
+    from main import ask_flight_key
+    
+    request = QuestionRequest(question="What is  the Revenue?")
+    key = ask_flight_key("What is  the Revenue?", 7, V1, request)
+    # Case and spacing don't matter, the question's options, corpus and model version do
+    assert key == ask_flight_key("what is the revenue? ", 7, V1, QuestionRequest(question="other"))
+    assert key != ask_flight_key("What is the revenue?", 8, V1, request)
+    assert key != ask_flight_key("What is the revenue?", 7, V2, request)
+    assert key != ask_flight_key("What is the revenue?", 7, V1, QuestionRequest(question="x", context_limit=3))
+    assert key != ask_flight_key("What is the profit?", 7, V1, request)
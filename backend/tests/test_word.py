@@ -0,0 +1,142 @@
+import io
+import struct
+import zipfile
+
+import pytest
+
+from services.word import OleFile, extract_doc_text, extract_docx_text, extract_word_text
+
+W = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+STYLES = f"""<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<w:styles xmlns:w="{W}">
+<w:style w:type="paragraph" w:styleId="berschrift1"><w:name w:val="heading 1"/></w:style>
+<w:style w:type="paragraph" w:styleId="Heading2"><w:name w:val="heading 2"/></w:style>
+<w:style w:type="paragraph" w:styleId="Normal"><w:name w:val="Normal"/></w:style>
+</w:styles>"""
+SECTOR = 512
+MINI_SECTOR = 64
+FREE, END_OF_CHAIN, FAT_SECTOR = 0xFFFFFFFF, 0xFFFFFFFE, 0xFFFFFFFD
+
+
+def paragraph(text: str, style: str = None) -> str:
+    properties = f'<w:pPr><w:pStyle w:val="{style}"/></w:pPr>' if style else ""
+    return f'<w:p>{properties}<w:r><w:t xml:space="preserve">{text}</w:t></w:r></w:p>'
+
+
+def table(rows) -> str:
+    cells = lambda row: "".join(f"<w:tc>{paragraph(cell)}</w:tc>" for cell in row)
+    return "<w:tbl>" + "".join(f"<w:tr>{cells(row)}</w:tr>" for row in rows) + "</w:tbl>"
+
+
+def make_docx(body: str) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("word/styles.xml", STYLES)
+        archive.writestr("word/document.xml", f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                                              f'<w:document xmlns:w="{W}"><w:body>{body}<w:sectPr/></w:body></w:document>')
+    return buffer.getvalue()
+
+
+def make_ole(streams: dict) -> bytes:
+    """A version 3 compound file: streams under 4096 bytes go in the mini stream, larger ones in sectors"""
+    sectors, chains, entries, mini, mini_fat = [], [], [], b"", []
+    for name, data in streams.items():
+        if len(data) < 4096:
+            count = (len(data) + MINI_SECTOR - 1) // MINI_SECTOR
+            start = len(mini) // MINI_SECTOR
+            mini += data.ljust(count * MINI_SECTOR, b"\0")
+            mini_fat += [start + i + 1 if i < count - 1 else END_OF_CHAIN for i in range(count)]
+        else:
+            count = (len(data) + SECTOR - 1) // SECTOR
+            start = len(sectors)
+            sectors += [data[i * SECTOR:(i + 1) * SECTOR].ljust(SECTOR, b"\0") for i in range(count)]
+            chains.append((start, count))
+        entries.append((name, start, len(data)))
+    
+    def add_chain(data: bytes) -> int:
+        start, count = len(sectors), max(1, (len(data) + SECTOR - 1) // SECTOR)
+        sectors.extend(data[i * SECTOR:(i + 1) * SECTOR].ljust(SECTOR, b"\0") for i in range(count))
+        chains.append((start, count))
+        return start
+    
+    def directory_entry(name: str, kind: int, start: int, size: int, child=FREE, right=FREE) -> bytes:
+        encoded = (name + "\0").encode("utf-16-le")
+        return (encoded.ljust(64, b"\0") + struct.pack("<HBB", len(encoded), kind, 1)
+                + struct.pack("<III", FREE, right, child) + b"\0" * 36 + struct.pack("<II", start, size) + b"\0" * 4)
+    
+    mini_start = add_chain(mini) if mini else END_OF_CHAIN
+    mini_fat_start = add_chain(struct.pack(f"<{len(mini_fat)}I", *mini_fat).ljust(SECTOR, b"\xff")) if mini_fat else END_OF_CHAIN
+    directory = directory_entry("Root Entry", 5, mini_start, len(mini), child=1)
+    for i, (name, start, size) in enumerate(entries):
+        directory += directory_entry(name, 2, start, size, right=i + 2 if i + 1 < len(entries) else FREE)
+    directory_start = add_chain(directory)
+    
+    fat_start = len(sectors)
+    fat = [FREE] * (SECTOR // 4)
+    for start, count in chains:
+        for i in range(count):
+            fat[start + i] = start + i + 1 if i < count - 1 else END_OF_CHAIN
+    fat[fat_start] = FAT_SECTOR
+    sectors.append(struct.pack(f"<{SECTOR // 4}I", *fat))
+    
+    header = (b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1" + b"\0" * 16 + struct.pack("<HHHHH", 0x3E, 3, 0xFFFE, 9, 6) + b"\0" * 6
+              + struct.pack("<IIIIIIIII", 0, 1, directory_start, 0, 4096, mini_fat_start, 1 if mini_fat else 0,
+                            END_OF_CHAIN, 0)
+              + struct.pack("<109I", fat_start, *[FREE] * 108))
+    return header + b"".join(sectors)
+
+
+def make_doc(text: str, unicode: bool = False, pad_to: int = 0) -> bytes:
+    """A Word 97 file holding text (paragraphs end with \\r) in one piece"""
+    csw, cslw, cbfc = 14, 22, 93
+    fib_length = 32 + 2 + csw * 2 + 2 + cslw * 4 + 2 + cbfc * 8
+    encoded = text.encode("utf-16-le") if unicode else text.encode("cp1252")
+    text_offset = fib_length + 64
+    word_document = bytearray(text_offset) + encoded
+    struct.pack_into("<H", word_document, 0, 0xA5EC)
+    struct.pack_into("<H", word_document, 10, 0x0200)  # Table stream is 1Table
+    struct.pack_into("<H", word_document, 32, csw)
+    lw_offset = 34 + csw * 2
+    struct.pack_into("<H", word_document, lw_offset, cslw)
+    struct.pack_into("<I", word_document, lw_offset + 2 + 3 * 4, len(text))  # ccpText
+    fc_lcb_offset = lw_offset + 2 + cslw * 4
+    struct.pack_into("<H", word_document, fc_lcb_offset, cbfc)
+    
+    fc = text_offset if unicode else (text_offset * 2) | 0x40000000
+    piece_table = struct.pack("<II", 0, len(text)) + struct.pack("<HIH", 0, fc, 0)
+    clx = b"\x01" + struct.pack("<h", 2) + b"\0\0" + b"\x02" + struct.pack("<I", len(piece_table)) + piece_table
+    struct.pack_into("<II", word_document, fc_lcb_offset + 2 + 33 * 8, 16, len(clx))
+    return make_ole({"WordDocument": bytes(word_document).ljust(pad_to, b"\0"), "1Table": b"\0" * 16 + clx})
+
+
+def test_docx_headings_tables_and_paragraphs():
+    body = (paragraph("Titel", "berschrift1") + paragraph("Intro text.") + paragraph("Sub", "Heading2")
+            + table([["Name", "Role"], ["Ada", "Engineer"]]) + paragraph("") + paragraph("Last."))
+    text = extract_docx_text(make_docx(body))
+    assert text.split("\n\n") == ["# Titel", "Intro text.", "## Sub", "Name | Role", "Ada | Engineer", "Last."]
+
+
+def test_docx_nested_table_stays_in_its_cell():
+    inner = table([["a", "b"]])
+    body = f"<w:tbl><w:tr><w:tc>{paragraph('outer')}{inner}</w:tc><w:tc>{paragraph('x')}</w:tc></w:tr></w:tbl>"
+    assert extract_docx_text(make_docx(body)) == "outer a | b | x"
+
+
+@pytest.mark.parametrize("unicode", [False, True])
+def test_doc_text_in_the_mini_stream(unicode):
+    text = "First paragraph\rSecond \x13 HYPERLINK x \x14link\x15 end\x07\r"
+    assert extract_doc_text(make_doc(text, unicode)) == "First paragraph\n\nSecond link end"
+
+
+def test_doc_text_in_regular_sectors():
+    text = "Long paragraph. " * 400 + "\r"
+    data = make_doc(text, pad_to=10000)
+    assert len(OleFile(data).read_stream("WordDocument")) == 10000
+    assert extract_doc_text(data) == text.strip()
+
+
+def test_word_text_detects_the_format():
+    assert extract_word_text(make_docx(paragraph("Docx"))) == "Docx"
+    assert extract_word_text(make_doc("Doc\r")) == "Doc"
+    with pytest.raises(ValueError):
+        extract_word_text(b"plain text")
@@ -13,6 +13,9 @@ export default function FileGrid() {
     files: [],
     loading: true,
     error: null,
+    nextCursor: null,
+    total: 0,
+    loadingMore: false,
   });
   const [selectedFile, setSelectedFile] = useState<{
     id: number;
@@ -25,16 +28,45 @@ export default function FileGrid() {
     try {
       setState(prev => ({ ...prev, loading: true, error: null }));
       const response = await apiService.getFiles();
-      setState({ files: response.files, loading: false, error: null });
+      setState({
+        files: response.files,
+        loading: false,
+        error: null,
+        nextCursor: response.next_cursor ?? null,
+        total: response.total,
+        loadingMore: false,
+      });
     } catch (error) {
       setState({
         files: [],
         loading: false,
         error: error instanceof Error ? error.message : 'Failed to load files',
+        nextCursor: null,
+        total: 0,
+        loadingMore: false,
       });
     }
   };
 
+  // /files returns one page at a time; the next one starts at next_cursor
+  const loadMoreFiles = async () => {
+    if (!state.nextCursor) return;
+    try {
+      setState(prev => ({ ...prev, loadingMore: true }));
+      const response = await apiService.getFiles({ cursor: state.nextCursor });
+      setState(prev => ({
+        ...prev,
+        files: [...prev.files, ...response.files],
+        nextCursor: response.next_cursor ?? null,
+        total: response.total,
+        loadingMore: false,
+      }));
+    } catch (error) {
+      console.error('Failed to load more files:', error);
+      setState(prev => ({ ...prev, loadingMore: false }));
+    }
+  };
+
   useEffect(() => {
     fetchFiles();
   }, [refreshTrigger]);
@@ -160,7 +192,7 @@ export default function FileGrid() {
   return (
     <div className="bg-gray-800 rounded-xl p-4 shadow-xl border border-gray-700 h-full flex flex-col">
       <div className="flex items-center justify-between mb-6 flex-shrink-0">
-        <h3 className="text-lg font-semibold text-white">All Files ({state.files.length})</h3>
+        <h3 className="text-lg font-semibold text-white">All Files ({state.total})</h3>
       </div>
       
       {state.files.length === 0 ? (
@@ -237,6 +269,15 @@ export default function FileGrid() {
             </div>
           ))}
           </div>
+          {state.nextCursor && (
+            <button
+              onClick={loadMoreFiles}
+              disabled={state.loadingMore}
+              className="mt-3 w-full text-xs bg-gray-700 hover:bg-gray-600 disabled:bg-gray-600 text-gray-300 px-2 py-2 rounded-lg"
+            >
+              {state.loadingMore ? 'Loading...' : `Load more (${state.files.length} of ${state.total})`}
+            </button>
+          )}
           <div className="h-8"></div>
         </div>
       )}
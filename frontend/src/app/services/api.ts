@@ -23,14 +23,31 @@ export interface FileInfo {
   created_at: string;
 }
 
+export interface FilesQuery {
+  limit?: number;
+  cursor?: string;
+  fields?: (keyof FileInfo)[];
+}
+
+export interface StatsBreakdown {
+  content_type: string;
+  anonymized: boolean;
+  file_count: number;
+  chunk_count: number;
+  total_words: number;
+}
+
 export interface StatsResponse {
   file_count: number;
   chunk_count: number;
   total_words: number;
+  breakdown?: StatsBreakdown[];
 }
 
 export interface FilesResponse {
   files: FileInfo[];
+  next_cursor?: string;
+  total: number;
 }
 
 export interface HealthResponse {
@@ -95,8 +112,16 @@ class ApiService {
     return response.json();
   }
 
-  async getFiles(): Promise<FilesResponse> {
-    const response = await fetch(`${this.baseUrl}/files`);
+  async getFiles(query: FilesQuery = {}): Promise<FilesResponse> {
+    const params = new URLSearchParams();
+    if (query.limit) params.set("limit", query.limit.toString());
+    if (query.cursor) params.set("cursor", query.cursor);
+    if (query.fields) params.set("fields", query.fields.join(","));
+
+    const queryString = params.toString();
+    const response = await fetch(
+      `${this.baseUrl}/files${queryString ? `?${queryString}` : ""}`
+    );
 
     if (!response.ok) {
       throw new Error("Failed to fetch files");
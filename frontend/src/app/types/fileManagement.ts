@@ -4,6 +4,9 @@ export interface FileGridState {
   files: FileInfo[];
   loading: boolean;
   error: string | null;
+  nextCursor: string | null; // Set while more pages of files can be loaded
+  total: number;
+  loadingMore: boolean;
 }
 
 export interface FileListState {